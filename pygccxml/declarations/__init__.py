@@ -66,6 +66,7 @@ from .cpptypes import free_function_type_t
 from .cpptypes import member_function_type_t
 from .cpptypes import member_variable_type_t
 from .cpptypes import declarated_t
+from .cpptypes import lazy_type_t
 from .cpptypes import type_qualifiers_t
 # java types
 from .cpptypes import java_fundamental_t
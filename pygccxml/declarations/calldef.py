@@ -123,6 +123,8 @@ class argument_t(object):
 
     @property
     def decl_type(self):
+        if self._decl_type.__class__ is cpptypes.lazy_type_t:
+            self._decl_type = self._decl_type.resolve()
         return self._decl_type
 
     @decl_type.setter
@@ -295,6 +297,8 @@ class calldef_t(declaration.declaration_t):
         """The type of the return value of the "callable" or None
             (constructors).
             @type: :class:`type_t`"""
+        if self._return_type.__class__ is cpptypes.lazy_type_t:
+            self._return_type = self._return_type.resolve()
         return self._return_type
 
     @return_type.setter
@@ -443,6 +443,9 @@ class class_t(scopedef.scopedef_t, byte_info.byte_info):
         decl.parent = self
         decl.cache.reset()
         decl.cache.access_type = access
+        if self._optimized:
+            self._all_decls_not_recursive.append(decl)
+            self._optimizer_add([decl])
 
     def remove_declaration(self, decl):
         """
@@ -460,6 +463,11 @@ class class_t(scopedef.scopedef_t, byte_info.byte_info):
         else:  # decl.cache.access_type == ACCESS_TYPES.PRVATE
             container = self.private_members
         del container[container.index(decl)]
+        if self._optimized:
+            self._optimizer_remove([decl])
+            self._all_decls_not_recursive = [
+                member for member in self._all_decls_not_recursive
+                if member is not decl]
         decl.cache.reset()
 
     def find_out_member_access_type(self, member):
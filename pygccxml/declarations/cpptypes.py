@@ -26,6 +26,8 @@ class type_t(byte_info.byte_info):
         return res
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, type_t):
             return False
         return self.decl_string == other.decl_string
@@ -895,6 +897,50 @@ class declarated_t(type_t, byte_info.byte_info):
         return declarated_t(self._declaration)
 
 
+##########################################################################
+# lazily linked types:
+
+class lazy_type_t(object):
+
+    """
+    Placeholder of a type that has not been linked yet.
+
+    When the `lazy_linking` configuration option is set, the types of the
+    variables, arguments and return values are stored as instances of this
+    class. They hold the id of the type in the xml file and the function
+    that links it, and are replaced by the linked type on the first access
+    to the `decl_type` or `return_type` property.
+
+    This is not a :class:`type_t`: it never escapes from the properties.
+    When a declaration is pickled or copied, the linked type is stored
+    instead of the placeholder.
+    """
+
+    __slots__ = ("type_id", "link")
+
+    def __init__(self, type_id, link):
+        object.__init__(self)
+        self.type_id = type_id
+        self.link = link
+
+    def resolve(self):
+        """returns the linked type"""
+        return self.link(self.type_id)
+
+    def __reduce__(self):
+        return _linked_type, (self.resolve(),)
+
+
+def _linked_type(type_):
+    """
+    Implementation detail: unpickles a :class:`lazy_type_t` as its
+    linked type.
+
+    """
+
+    return type_
+
+
 class type_qualifiers_t(object):
 
     """contains additional information about type: mutable, static, extern"""
@@ -106,12 +106,18 @@ class declaration_t(object):
 
         """
 
+        if self is other:
+            return True
         if not isinstance(other, self.__class__):
             return False
+        # The names and file names are interned by the scanner, so equal
+        # strings are usually identical, which is the fast path of ==.
+        # The declaration paths are only built for different parents.
         return self.name == other.name \
             and self.location == other.location \
-            and declaration_utils.declaration_path(self.parent) \
-            == declaration_utils.declaration_path(other.parent)
+            and (self.parent is other.parent or
+                 declaration_utils.declaration_path(self.parent) ==
+                 declaration_utils.declaration_path(other.parent))
 
     def __hash__(self):
         return (hash(self.__class__) ^
@@ -143,13 +149,15 @@ class declaration_t(object):
     def _get_name_impl(self):
         return self._name
 
-    def _on_rename(self):
+    def _on_rename(self, previous_name):
         """
-        Placeholder method, is redefined in child class.
+        Called when the declaration is renamed: updates the query optimizer
+        of its scopes. Is extended in child class.
 
         """
 
-        pass
+        if self.parent is not None:
+            self.parent._optimizer_rename(self, previous_name)
 
     @property
     def name(self):
@@ -169,7 +177,7 @@ class declaration_t(object):
         self.cache.reset_name_based()
         if previous_name:
             # There was a reset of the name
-            self._on_rename()
+            self._on_rename(previous_name)
 
     def _get_partial_name_impl(self):
         return self.name
@@ -16,6 +16,8 @@ class location_t(object):
         self._line = line
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, self.__class__):
             return False
         return self.line == other.line \
@@ -68,7 +68,20 @@ class namespace_t(scopedef.scopedef_t):
             declarations (list[declaration_t]): list of declarations
 
         """
-        self._declarations = declarations
+        if self._optimized:
+            # The query optimizer is updated with the declarations that
+            # have been removed and added
+            old_ids = set(id(decl) for decl in self._all_decls_not_recursive)
+            new_ids = set(id(decl) for decl in declarations)
+            self._optimizer_remove([
+                decl for decl in self._all_decls_not_recursive
+                if id(decl) not in new_ids])
+            self._declarations = declarations
+            self._all_decls_not_recursive = declarations
+            self._optimizer_add([
+                decl for decl in declarations if id(decl) not in old_ids])
+        else:
+            self._declarations = declarations
 
     def take_parenting(self, inst):
         """
@@ -81,15 +94,18 @@ class namespace_t(scopedef.scopedef_t):
 
         if self is inst:
             return
-        for decl in inst.declarations:
+        decls = inst.declarations
+        inst.declarations = []
+        for decl in decls:
             decl.parent = self
             self.declarations.append(decl)
-        inst.declarations = []
+        self._optimizer_add(decls)
 
     def adopt_declaration(self, decl):
         self.declarations.append(decl)
         decl.parent = self
         decl.cache.reset()
+        self._optimizer_add([decl])
 
     def remove_declaration(self, decl):
         """
@@ -101,6 +117,7 @@ class namespace_t(scopedef.scopedef_t):
         """
 
         del self.declarations[self.declarations.index(decl)]
+        self._optimizer_remove([decl])
         decl.cache.reset()
         # add more comment about this.
         # if not keep_parent:
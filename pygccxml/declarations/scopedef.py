@@ -5,7 +5,6 @@
 
 """Defines :class:`scopedef_t` class"""
 
-import time
 import warnings
 import collections
 from . import algorithm
@@ -293,7 +292,7 @@ class scopedef_t(declaration.declaration_t):
         if self.name == '::':
             self._logger.debug(
                 "preparing data structures for query optimizer - started")
-        start_time = time.clock()
+        start_time = utils.wall_time()
 
         self.clear_optimizer()
 
@@ -306,7 +305,20 @@ class scopedef_t(declaration.declaration_t):
         self._all_decls_not_recursive = self.declarations
         self._all_decls = make_flatten(
             self._all_decls_not_recursive)
-        for decl in self._all_decls:
+        self.__index_declarations(self._all_decls)
+
+        for decl in self._all_decls_not_recursive:
+            if isinstance(decl, scopedef_t):
+                decl.init_optimizer()
+        if self.name == '::':
+            self._logger.debug((
+                "preparing data structures for query optimizer - " +
+                "done( %f seconds ). "), (utils.wall_time() - start_time))
+        self._optimized = True
+
+    def __index_declarations(self, decls):
+        """implementation details"""
+        for decl in decls:
             types = self.__decl_types(decl)
             for type_ in types:
                 self._type2decls[type_].append(decl)
@@ -321,14 +333,103 @@ class scopedef_t(declaration.declaration_t):
                         name2decls_nr[decl.name] = []
                     name2decls_nr[decl.name].append(decl)
 
-        for decl in self._all_decls_not_recursive:
+    def __optimized_scopes(self):
+        """implementation details"""
+        scope = self
+        while scope is not None:
+            if scope._optimized:
+                yield scope
+            scope = scope.parent
+
+    def _optimizer_add(self, decls):
+        """
+        Add declarations adopted by this scope, and the declarations they
+        contain, to the query optimizer of this scope and of its parents.
+
+        The non recursive list of declarations is not updated.
+
+        """
+
+        if not self._optimized:
+            return
+        for decl in decls:
             if isinstance(decl, scopedef_t):
                 decl.init_optimizer()
-        if self.name == '::':
-            self._logger.debug((
-                "preparing data structures for query optimizer - " +
-                "done( %f seconds ). "), (time.clock() - start_time))
-        self._optimized = True
+        all_decls = make_flatten(decls)
+        for scope in self.__optimized_scopes():
+            scope._all_decls.extend(all_decls)
+            scope.__index_declarations(all_decls)
+
+    def _optimizer_remove(self, decls):
+        """
+        Remove declarations of this scope, and the declarations they
+        contain, from the query optimizer of this scope and of its parents.
+
+        The non recursive list of declarations is not updated.
+
+        """
+
+        all_decls = make_flatten(decls)
+        removed = set(id(decl) for decl in all_decls)
+        decl_types = [(decl, self.__decl_types(decl)) for decl in all_decls]
+        types = set()
+        for _, types_ in decl_types:
+            types.update(types_)
+
+        def remove(decls_):
+            return [decl for decl in decls_ if id(decl) not in removed]
+
+        def remove_named(name2decls, decl):
+            same_name_decls = name2decls.get(decl.name)
+            if same_name_decls is not None:
+                same_name_decls = remove(same_name_decls)
+                if same_name_decls:
+                    name2decls[decl.name] = same_name_decls
+                else:
+                    del name2decls[decl.name]
+
+        for scope in self.__optimized_scopes():
+            scope._all_decls = remove(scope._all_decls)
+            for type_ in types:
+                scope._type2decls[type_] = remove(scope._type2decls[type_])
+                if scope is self:
+                    scope._type2decls_nr[type_] = remove(
+                        scope._type2decls_nr[type_])
+            for decl, types_ in decl_types:
+                for type_ in types_:
+                    remove_named(scope._type2name2decls[type_], decl)
+                    if scope is decl.parent:
+                        remove_named(scope._type2name2decls_nr[type_], decl)
+
+    def _optimizer_rename(self, decl, previous_name):
+        """
+        Move a declaration of this scope renamed from `previous_name` in the
+        query optimizer of this scope and of its parents.
+
+        """
+
+        types = None
+
+        def rename(name2decls):
+            same_name_decls = name2decls.get(previous_name, [])
+            renamed = [
+                same_name_decl for same_name_decl in same_name_decls
+                if same_name_decl is not decl]
+            if len(renamed) == len(same_name_decls):
+                return
+            if renamed:
+                name2decls[previous_name] = renamed
+            else:
+                del name2decls[previous_name]
+            name2decls.setdefault(decl.name, []).append(decl)
+
+        for scope in self.__optimized_scopes():
+            if types is None:
+                types = self.__decl_types(decl)
+            for type_ in types:
+                rename(scope._type2name2decls[type_])
+                if scope is self:
+                    rename(scope._type2name2decls_nr[type_])
 
     @staticmethod
     def _build_operator_function(name, function):
@@ -355,15 +456,10 @@ class scopedef_t(declaration.declaration_t):
             return add_operator(symbol)
         return name  # both name and symbol are None
 
-    def _on_rename(self):
+    def _on_rename(self, previous_name):
+        declaration.declaration_t._on_rename(self, previous_name)
         for decl in self.decls(allow_empty=True):
             decl.cache.reset_name_based()
-        # I am not sure whether to introduce this or not?
-        # It could be very time consuming operation + it changes optimize query
-        # data structures.
-        # if self.parent:
-        #    if self.parent._optimized:
-        #        self.parent.init_optimizer()
 
     @staticmethod
     def __normalize_args(**keywds):
@@ -475,7 +571,7 @@ class scopedef_t(declaration.declaration_t):
     def _find_single(self, match_class, **keywds):
         """implementation details"""
         self._logger.debug('find single query execution - started')
-        start_time = time.clock()
+        start_time = utils.wall_time()
         norm_keywds = self.__normalize_args(**keywds)
         decl_matcher = self.__create_matcher(match_class, **norm_keywds)
         dtype = self.__findout_decl_type(match_class, **norm_keywds)
@@ -484,13 +580,13 @@ class scopedef_t(declaration.declaration_t):
         found = matcher.get_single(decl_matcher, decls, False)
         self._logger.debug(
             'find single query execution - done( %f seconds )',
-            (time.clock() - start_time))
+            (utils.wall_time() - start_time))
         return found
 
     def _find_multiple(self, match_class, **keywds):
         """implementation details"""
         self._logger.debug('find all query execution - started')
-        start_time = time.clock()
+        start_time = utils.wall_time()
         norm_keywds = self.__normalize_args(**keywds)
         decl_matcher = self.__create_matcher(match_class, **norm_keywds)
         dtype = self.__findout_decl_type(match_class, **norm_keywds)
@@ -502,7 +598,7 @@ class scopedef_t(declaration.declaration_t):
         self._logger.debug('%d declaration(s) that match query', len(mfound))
         self._logger.debug(
             'find single query execution - done( %f seconds )',
-            (time.clock() - start_time))
+            (utils.wall_time() - start_time))
         if not mfound and not allow_empty:
             raise RuntimeError(
                 "Multi declaration query returned 0 declarations.")
@@ -368,6 +368,8 @@ def remove_declarated(type_):
 
 def is_same(type1, type2):
     """returns True, if type1 and type2 are same types"""
+    if type1 is type2:
+        return True
     nake_type1 = remove_declarated(type1)
     nake_type2 = remove_declarated(type2)
     return nake_type1 == nake_type2
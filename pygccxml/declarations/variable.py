@@ -7,6 +7,7 @@
 defines class that describes C++ global and member variable declaration
 """
 
+from . import cpptypes
 from . import declaration
 from . import class_declaration
 
@@ -51,6 +52,8 @@ class variable_t(declaration.declaration_t):
     @property
     def decl_type(self):
         """reference to the variable :class:`decl_type <type_t>`"""
+        if self._decl_type.__class__ is cpptypes.lazy_type_t:
+            self._decl_type = self._decl_type.resolve()
         return self._decl_type
 
     @decl_type.setter
@@ -8,6 +8,7 @@
 
 from .config import xml_generator_configuration_t
 from .config import load_xml_generator_configuration
+from .config import location_filter_t
 
 from .project_reader import COMPILATION_MODE
 from .project_reader import project_reader_t
@@ -16,12 +17,18 @@ from .project_reader import create_text_fc
 from .project_reader import create_source_fc
 from .project_reader import create_gccxml_fc
 from .project_reader import create_cached_source_fc
+from .project import project_t
+from .watcher import watcher_t
 
 from .source_reader import source_reader_t
+from .pgx_scanner import create_pgx_file
+from .metrics import metrics_t
+from .type_table import type_table_t
 from .declarations_cache import cache_base_t
 from .declarations_cache import file_cache_t
 from .declarations_cache import dummy_cache_t
 from .directory_cache import directory_cache_t
+from .sqlite_cache import sqlite_cache_t
 # shortcut
 CONTENT_TYPE = file_configuration_t.CONTENT_TYPE
 
@@ -30,7 +37,10 @@ def parse(
         files,
         config=None,
         compilation_mode=COMPILATION_MODE.FILE_BY_FILE,
-        cache=None):
+        cache=None,
+        jobs=None,
+        batch_size=None,
+        metrics=None):
     """
     Parse header files.
 
@@ -43,12 +53,23 @@ def parse(
     :type compilation_mode: :class:`parser.COMPILATION_MODE`
     :param cache: Declaration cache (None=no cache)
     :type cache: :class:`parser.cache_base_t` or str
+    :param jobs: Number of worker processes used by the
+                 PARALLEL_FILE_BY_FILE and BATCHED compilation modes
+                 (None=number of CPUs)
+    :type jobs: int
+    :param batch_size: Number of files compiled together by the BATCHED
+                       compilation mode (None=split the files in `jobs`
+                       batches)
+    :type batch_size: int
+    :param metrics: Timings and counters of the parsing, filled if given
+    :type metrics: :class:`parser.metrics_t`
     :rtype: list of :class:`declarations.declaration_t`
     """
     if not config:
         config = xml_generator_configuration_t()
-    parser = project_reader_t(config=config, cache=cache)
-    answer = parser.read_files(files, compilation_mode)
+    parser = project_reader_t(config=config, cache=cache, metrics=metrics)
+    answer = parser.read_files(
+        files, compilation_mode, jobs, batch_size)
     return answer
 
 
@@ -0,0 +1,396 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+asyncio implementation of the source and project readers.
+
+The coroutines of this module are returned by
+:meth:`source_reader_t.aread_file`, :meth:`source_reader_t.aread_xml_file`,
+:meth:`source_reader_t.aread_string` and
+:meth:`project_reader_t.aread_files`.
+
+The xml generator runs as an asyncio subprocess. The CPU bound steps
+(scanning, linking, joining) and the accesses to the cache (loading,
+updating and flushing it) are run in an executor, so that the event loop
+thread is never blocked. The caches are not thread safe: their accesses
+are serialized by a lock per cache.
+
+When the xml is streamed, the output of CastXML is read by the event loop
+and scanned in the executor while it is being generated.
+
+This module requires Python 3.5 or newer, and is only imported when one of
+these methods is called.
+"""
+
+import os
+import queue
+import asyncio
+import weakref
+import threading
+import multiprocessing
+
+from . import source_reader
+from . import project_reader
+from . import xml_compression
+from . import metrics
+from .. import utils
+
+# Size of the chunks of the xml generator output read by the event loop
+_CHUNK_SIZE = 64 * 1024
+
+# cache -> lock serializing the accesses to the cache
+_cache_locks = weakref.WeakKeyDictionary()
+_cache_locks_lock = threading.Lock()
+
+
+class reader_context_t(object):
+
+    """
+    Gives access to the internals of a :class:`source_reader_t` instance.
+
+    This class is not part of the public API.
+
+    """
+
+    def __init__(
+            self,
+            config,
+            cache,
+            cached_value,
+            file_full_name,
+            create_command_line,
+            parse_xml_file,
+            measure,
+            streams_xml,
+            executor):
+        self.config = config
+        self.cache = cache
+        self.cached_value = cached_value
+        self.file_full_name = file_full_name
+        self.create_command_line = create_command_line
+        self.parse_xml_file = parse_xml_file
+        self.measure = measure
+        self.streams_xml = streams_xml
+        self.executor = executor
+
+    async def run_in_executor(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def run_with_cache(self, func, *args):
+        """Run `func` in the executor, holding the lock of the cache."""
+        return await self.run_in_executor(
+            _with_cache_lock, self.cache, func, *args)
+
+
+def _with_cache_lock(cache, func, *args):
+    with _cache_locks_lock:
+        lock = _cache_locks.get(cache)
+        if lock is None:
+            lock = threading.Lock()
+            _cache_locks[cache] = lock
+    with lock:
+        return func(*args)
+
+
+class _pipe_stream_t(object):
+
+    """
+    File object giving to a scanner, running in an executor thread, the
+    output of a process read by the event loop.
+
+    At most `max_chunks` chunks are buffered: the event loop waits for the
+    scanner before reading more of the output.
+
+    """
+
+    def __init__(self, loop, max_chunks=16):
+        object.__init__(self)
+        self.__loop = loop
+        self.__chunks = queue.Queue()
+        self.__free_chunks = asyncio.Semaphore(max_chunks)
+        self.__buffer = b""
+        self.__eof = False
+        self.__closed = False
+
+    async def feed(self, stream):
+        """
+        Read the `stream` of the process until its end. The rest of the
+        output is discarded once the scanner is closed, so that the process
+        does not block on a full pipe.
+
+        """
+
+        try:
+            while True:
+                await self.__free_chunks.acquire()
+                if self.__closed:
+                    while await stream.read(_CHUNK_SIZE):
+                        pass
+                    break
+                chunk = await stream.read(_CHUNK_SIZE)
+                self.__chunks.put(chunk)
+                if not chunk:
+                    break
+        finally:
+            # The scanner is never left waiting for the end of the stream
+            self.__chunks.put(b"")
+
+    def read(self, size=-1):
+        while not self.__eof and (size < 0 or len(self.__buffer) < size):
+            chunk = self.__chunks.get()
+            self.__loop.call_soon_threadsafe(self.__free_chunks.release)
+            if not chunk:
+                self.__eof = True
+            self.__buffer += chunk
+        if size < 0:
+            size = len(self.__buffer)
+        data = self.__buffer[:size]
+        self.__buffer = self.__buffer[size:]
+        return data
+
+    def close(self):
+        self.__loop.call_soon_threadsafe(self.__close)
+
+    def __close(self):
+        self.__closed = True
+        self.__free_chunks.release()
+
+
+async def run_xml_generator(context, source_file, xml_file):
+    """
+    Run the xml generator and return its standard output.
+
+    :param source_file: full path to the source file that should be parsed.
+    :param xml_file: path to the xml file to be written, or '-' to write
+                     the xml to the standard output
+
+    """
+
+    command_line = context.create_command_line(source_file, xml_file)
+    with context.measure(metrics.metrics_t.XML_GENERATION, source_file):
+        process = await asyncio.create_subprocess_shell(
+            command_line, stdout=asyncio.subprocess.PIPE)
+        output, _ = await process.communicate()
+    return output, process.returncode
+
+
+async def parse_xml_stream(context, source_file):
+    """
+    Coroutine version of :meth:`source_reader_t.__parse_xml_stream`: run
+    CastXML, and scan its output in the executor while it is being
+    generated.
+
+    :param source_file: full path to the source file that should be parsed.
+
+    """
+
+    command_line = context.create_command_line(source_file, '-')
+    loop = asyncio.get_event_loop()
+    stream = _pipe_stream_t(loop)
+
+    def parse():
+        try:
+            return context.parse_xml_file(stream, source_file)
+        finally:
+            stream.close()
+
+    with context.measure(metrics.metrics_t.XML_GENERATION, source_file):
+        process = await asyncio.create_subprocess_shell(
+            command_line, stdout=asyncio.subprocess.PIPE)
+        parsing = loop.run_in_executor(context.executor, parse)
+        await stream.feed(process.stdout)
+        exit_status = await process.wait()
+
+    error = RuntimeError(
+        "Error occurred while running " +
+        context.config.xml_generator.upper() +
+        ": status:%s" % exit_status)
+    try:
+        result = await parsing
+    except Exception:
+        if exit_status:
+            raise error
+        raise
+    if exit_status and not context.config.ignore_gccxml_output:
+        raise error
+    return result
+
+
+async def create_xml_file(context, source_file, destination=None):
+    """
+    Coroutine version of :meth:`source_reader_t.create_xml_file`.
+
+    """
+
+    xml_file = destination
+    if xml_file:
+        utils.remove_file_no_raise(xml_file, context.config)
+    else:
+        xml_file = utils.create_temp_file_name(
+            suffix=xml_compression.xml_file_suffix(context.config))
+
+    ffname = source_file
+    if not os.path.isabs(ffname):
+        ffname = context.file_full_name(source_file)
+
+    compression = xml_compression.file_compression(xml_file)
+    try:
+        if compression and context.config.xml_generator == "castxml":
+            # Compress the xml written by CastXML to its standard output
+            output, exit_status = await run_xml_generator(
+                context, ffname, '-')
+            await context.run_in_executor(
+                xml_compression.write_file, xml_file, output)
+            reports = []
+        else:
+            output, exit_status = await run_xml_generator(
+                context, ffname, xml_file)
+            reports = [
+                line.rstrip() for line in output.splitlines()
+                if line.strip()]
+            if compression and os.path.isfile(xml_file):
+                await context.run_in_executor(
+                    xml_compression.compress_file, xml_file)
+        source_reader.check_xml_generator_output(
+            context.config, xml_file, reports, exit_status)
+    except Exception:
+        utils.remove_file_no_raise(xml_file, context.config)
+        raise
+    return xml_file
+
+
+async def read_cpp_source_file(context, source_file):
+    """
+    Coroutine version of :meth:`source_reader_t.read_cpp_source_file`.
+
+    """
+
+    ffname = context.file_full_name(source_file)
+    decls = await context.run_with_cache(context.cached_value, ffname)
+    if decls:
+        return decls
+
+    if context.streams_xml:
+        # No temporary file is written
+        decls, files = await parse_xml_stream(context, ffname)
+    else:
+        xml_file = await create_xml_file(context, ffname)
+        try:
+            decls, files = await context.run_in_executor(
+                context.parse_xml_file, xml_file, ffname)
+        finally:
+            utils.remove_file_no_raise(xml_file, context.config)
+
+    await context.run_with_cache(
+        context.cache.update, ffname, context.config, decls, files)
+    return decls
+
+
+async def read_xml_file(context, xml_file):
+    """
+    Coroutine version of :meth:`source_reader_t.read_xml_file`.
+
+    """
+
+    ffname = context.file_full_name(xml_file)
+    decls = await context.run_with_cache(context.cached_value, ffname)
+    if not decls:
+        decls, _ = await context.run_in_executor(
+            context.parse_xml_file, ffname)
+        await context.run_with_cache(
+            context.cache.update, ffname, context.config, decls, [])
+    return decls
+
+
+async def read_string(context, content):
+    """
+    Coroutine version of :meth:`source_reader_t.read_string`.
+
+    """
+
+    header_file = utils.create_temp_file_name(suffix='.h')
+    with open(header_file, "w+") as f:
+        f.write(content)
+    try:
+        return await read_cpp_source_file(context, header_file)
+    finally:
+        utils.remove_file_no_raise(header_file, context.config)
+
+
+async def read_file_configuration(reader, file_config, executor):
+    """
+    Coroutine version of :func:`project_reader._read_file_configuration`.
+
+    """
+
+    logger = utils.loggers.cxx_parser
+    header = file_config.data
+    content_type = file_config.content_type
+    fc_types = project_reader.file_configuration_t.CONTENT_TYPE
+    if content_type == fc_types.STANDARD_SOURCE_FILE:
+        logger.info('Parsing source file "%s" ... ', header)
+        return await reader.aread_file(header, executor)
+    elif content_type == fc_types.GCCXML_GENERATED_FILE:
+        logger.info('Parsing xml file "%s" ... ', header)
+        return await reader.aread_xml_file(header, executor)
+    elif content_type == fc_types.CACHED_SOURCE_FILE:
+        if not os.path.exists(file_config.cached_source_file):
+            dir_ = os.path.split(file_config.cached_source_file)[0]
+            if dir_ and not os.path.exists(dir_):
+                os.makedirs(dir_)
+            logger.info(
+                'Creating xml file "%s" from source file "%s" ... ',
+                file_config.cached_source_file, header)
+            await reader.acreate_xml_file(
+                header, file_config.cached_source_file)
+        logger.info(
+            'Parsing xml file "%s" ... ', file_config.cached_source_file)
+        return await reader.aread_xml_file(
+            file_config.cached_source_file, executor)
+    else:
+        return await reader.aread_string(header, executor)
+
+
+async def read_files(
+        files,
+        create_reader,
+        cache,
+        flush_cache,
+        join_namespaces,
+        concurrency,
+        executor):
+    """
+    Coroutine version of :meth:`project_reader_t.read_files`.
+
+    At most `concurrency` files are parsed at the same time. The
+    declarations of the files are joined in the order of `files`.
+
+    :param create_reader: returns the :class:`source_reader_t` and the
+                          :class:`file_configuration_t` instances to be used
+                          for a project file
+    :param cache: the project cache
+    :param flush_cache: flushes the project cache
+    :param join_namespaces: joins the declarations of the files
+
+    """
+
+    if not concurrency:
+        concurrency = multiprocessing.cpu_count()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read(prj_file):
+        reader, file_config = create_reader(prj_file)
+        async with semaphore:
+            return await read_file_configuration(
+                reader, file_config, executor)
+
+    namespaces = await asyncio.gather(*[read(f) for f in files])
+
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(
+        executor, _with_cache_lock, cache, flush_cache)
+    return await loop.run_in_executor(
+        executor, join_namespaces, list(namespaces))
@@ -227,7 +227,14 @@ class xml_generator_configuration_t(parser_configuration_t):
             xml_generator=None,
             keep_xml=False,
             compiler_path=None,
-            flags=None):
+            flags=None,
+            stream_xml=False,
+            xml_scanner="etree",
+            location_filter=None,
+            lazy_linking=False,
+            xml_compression=None,
+            prefix_header=None,
+            pch_compiler_path=None):
 
         parser_configuration_t.__init__(
             self,
@@ -252,6 +259,20 @@ class xml_generator_configuration_t(parser_configuration_t):
 
         self.__ignore_gccxml_output = ignore_gccxml_output
 
+        self.__stream_xml = stream_xml
+
+        self.__xml_scanner = xml_scanner
+
+        self.__location_filter = location_filter
+
+        self.__lazy_linking = lazy_linking
+
+        self.__xml_compression = xml_compression
+
+        self.__prefix_header = prefix_header
+
+        self.__pch_compiler_path = pch_compiler_path
+
     def clone(self):
         return copy.deepcopy(self)
 
@@ -284,6 +305,85 @@ class xml_generator_configuration_t(parser_configuration_t):
     def ignore_gccxml_output(self, val=True):
         self.__ignore_gccxml_output = val
 
+    @property
+    def stream_xml(self):
+        """set this property to True, if you want CastXML to write its
+            output to a pipe that is read while CastXML is still running,
+            instead of writing a temporary xml file. Ignored when the
+            xml files are kept, or with gccxml."""
+        return self.__stream_xml
+
+    @stream_xml.setter
+    def stream_xml(self, stream_xml):
+        self.__stream_xml = stream_xml
+
+    @property
+    def xml_scanner(self):
+        """name of the scanner used to read the xml files: "etree" (the
+            default) or "expat", which is faster on big files"""
+        return self.__xml_scanner
+
+    @xml_scanner.setter
+    def xml_scanner(self, xml_scanner):
+        self.__xml_scanner = xml_scanner
+
+    @property
+    def location_filter(self):
+        """callable that takes the name of a file and returns False if the
+            declarations of the file should not be read, or None to read
+            all the declarations. See :class:`location_filter_t`."""
+        return self.__location_filter
+
+    @location_filter.setter
+    def location_filter(self, location_filter):
+        self.__location_filter = location_filter
+
+    @property
+    def lazy_linking(self):
+        """set this property to True, if you want the types of the
+            variables, arguments and return values to be linked on their
+            first access, instead of when the xml file is read. This only
+            applies to the projects of a single file: joining the
+            declarations of several files links all the types, so they are
+            linked when each file is read"""
+        return self.__lazy_linking
+
+    @lazy_linking.setter
+    def lazy_linking(self, lazy_linking):
+        self.__lazy_linking = lazy_linking
+
+    @property
+    def xml_compression(self):
+        """compression of the xml files that are kept: None (the
+            default), "gz", "bz2" or "xz". The output of CastXML is
+            compressed while it is written."""
+        return self.__xml_compression
+
+    @xml_compression.setter
+    def xml_compression(self, xml_compression):
+        self.__xml_compression = xml_compression
+
+    @property
+    def prefix_header(self):
+        """path to a header that is included before each parsed file.
+            It is precompiled if pch_compiler_path is set."""
+        return self.__prefix_header
+
+    @prefix_header.setter
+    def prefix_header(self, prefix_header):
+        self.__prefix_header = prefix_header
+
+    @property
+    def pch_compiler_path(self):
+        """path to the clang used to precompile the prefix header for
+            CastXML. It must have the version of the clang CastXML is
+            built with. See :mod:`precompiled_header`."""
+        return self.__pch_compiler_path
+
+    @pch_compiler_path.setter
+    def pch_compiler_path(self, pch_compiler_path):
+        self.__pch_compiler_path = pch_compiler_path
+
     def raise_on_wrong_settings(self):
         super(xml_generator_configuration_t, self).raise_on_wrong_settings()
         if self.xml_generator_path is None or \
@@ -292,6 +392,89 @@ class xml_generator_configuration_t(parser_configuration_t):
                 'xml_generator_path("%s") should be set and exist.') \
                 % self.xml_generator_path
             raise RuntimeError(msg)
+        if self.xml_scanner not in ["etree", "expat"]:
+            msg = ('xml_scanner("%s") should either be ' +
+                   '"etree" or "expat".') % self.xml_scanner
+            raise RuntimeError(msg)
+        if self.xml_compression not in [None, "gz", "bz2", "xz"]:
+            msg = ('xml_compression("%s") should either be None, ' +
+                   '"gz", "bz2" or "xz".') % self.xml_compression
+            raise RuntimeError(msg)
+        if self.prefix_header is not None and \
+                not os.path.isfile(self.prefix_header):
+            msg = ('prefix_header("%s") should exist.') % self.prefix_header
+            raise RuntimeError(msg)
+
+
+class location_filter_t(object):
+    """
+    Select the files whose declarations are read, by their directory.
+
+    An instance of this class can be used as the `location_filter` of a
+    configuration. The declarations of a file are read if the file is in
+    one of the `include_directories` (or if this list is empty), and not in
+    one of the `exclude_directories`.
+
+    For example, to skip the declarations of the system headers:
+
+    .. code-block:: python
+
+        config.location_filter = parser.location_filter_t(
+            exclude_directories=["/usr/include"])
+
+    """
+
+    def __init__(self, include_directories=None, exclude_directories=None):
+        """
+        :param include_directories: directories of the files to be read
+        :type include_directories: list of str
+
+        :param exclude_directories: directories of the files to be skipped
+        :type exclude_directories: list of str
+        """
+
+        object.__init__(self)
+        if not include_directories:
+            include_directories = []
+        if not exclude_directories:
+            exclude_directories = []
+        self.__include_directories = [
+            self.__normalize_directory(p) for p in include_directories]
+        self.__exclude_directories = [
+            self.__normalize_directory(p) for p in exclude_directories]
+
+    @property
+    def include_directories(self):
+        """list of the directories of the files to be read"""
+        return self.__include_directories
+
+    @property
+    def exclude_directories(self):
+        """list of the directories of the files to be skipped"""
+        return self.__exclude_directories
+
+    @staticmethod
+    def __normalize_directory(directory):
+        directory = utils.normalize_path(directory)
+        if not directory.endswith(os.sep):
+            directory += os.sep
+        return directory
+
+    def __call__(self, file_name):
+        file_name = utils.normalize_path(file_name)
+        if self.__include_directories and not [
+                p for p in self.__include_directories
+                if file_name.startswith(p)]:
+            return False
+        for directory in self.__exclude_directories:
+            if file_name.startswith(directory):
+                return False
+        return True
+
+    def __repr__(self):
+        # Used in the signature of the configuration, by the caches
+        return "location_filter_t(%r, %r)" % (
+            self.__include_directories, self.__exclude_directories)
 
 
 def load_xml_generator_configuration(configuration, **defaults):
@@ -353,6 +536,18 @@ def load_xml_generator_configuration(configuration, **defaults):
             cfg.xml_generator = value
         elif name == 'keep_xml':
             cfg.keep_xml = value
+        elif name == 'stream_xml':
+            cfg.stream_xml = value
+        elif name == 'xml_scanner':
+            cfg.xml_scanner = value
+        elif name == 'lazy_linking':
+            cfg.lazy_linking = value
+        elif name == 'xml_compression':
+            cfg.xml_compression = value
+        elif name == 'prefix_header':
+            cfg.prefix_header = value
+        elif name == 'pch_compiler_path':
+            cfg.pch_compiler_path = value
         elif name == 'cflags':
             cfg.cflags = value
         elif name == 'flags':
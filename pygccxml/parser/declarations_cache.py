@@ -4,7 +4,9 @@
 # See http://www.boost.org/LICENSE_1_0.txt
 
 import os
-import time
+import mmap
+import stat
+import struct
 import hashlib
 try:
     import cPickle as pickle
@@ -12,26 +14,76 @@ except ImportError:
     import pickle
 from pygccxml import utils
 from . import config as cxx_parsers_cfg
+from . import declarations_serializer
+
+
+# Memo of the file signatures (key: file name / value: stat key, signature)
+_file_signatures = {}
 
 
 def file_signature(filename):
     """
     Return a signature for a file.
 
+    The signature is memoized for the lifetime of the process, it is only
+    recomputed when the modification time, size or inode of the file
+    change.
+
     """
 
-    if not os.path.isfile(filename):
+    try:
+        file_stat = os.stat(filename)
+    except OSError:
         return None
-    if not os.path.exists(filename):
+    if not stat.S_ISREG(file_stat.st_mode):
         return None
 
+    # st_mtime_ns is not available before Python 3.3
+    stat_key = (
+        getattr(file_stat, 'st_mtime_ns', file_stat.st_mtime),
+        file_stat.st_size,
+        file_stat.st_ino)
+    memo = _file_signatures.get(filename)
+    if memo is not None and memo[0] == stat_key:
+        return memo[1]
+
     # Duplicate auto-generated files can be recognized with the sha1 hash.
     sig = hashlib.sha1()
     with open(filename, "rb") as f:
         buf = f.read()
         sig.update(buf)
 
-    return sig.hexdigest()
+    signature = sig.hexdigest()
+    _file_signatures[filename] = (stat_key, signature)
+    return signature
+
+
+def dumps_declarations(declarations, compact=False):
+    """
+    Serialize declarations, to be stored in a cache.
+
+    :param declarations: declarations tree
+    :param compact: if `True`, use the format of
+                    :mod:`declarations_serializer` instead of pickle
+    :rtype: bytes
+    """
+
+    if compact:
+        return declarations_serializer.dumps(declarations)
+    return pickle.dumps(declarations, pickle.HIGHEST_PROTOCOL)
+
+
+def loads_declarations(data):
+    """
+    Load declarations serialized by :func:`dumps_declarations`.
+
+    :param data: serialized declarations
+    :type data: bytes
+    """
+
+    if declarations_serializer.is_serialized(data):
+        return declarations_serializer.loads(data)
+    return pickle.loads(data)
 
 
 def configuration_signature(config):
@@ -58,9 +110,41 @@ def configuration_signature(config):
         sig.update(str(s).encode('utf-8'))
     for u in config.undefine_symbols:
         sig.update(str(u).encode('utf-8'))
+    if isinstance(config, cxx_parsers_cfg.xml_generator_configuration_t) and \
+            config.location_filter is not None:
+        # The persistent caches are only used with the location_filter_t
+        # instances, whose representation is the same in each process (see
+        # checked_cache)
+        sig.update(repr(config.location_filter).encode('utf-8'))
+    if isinstance(config, cxx_parsers_cfg.xml_generator_configuration_t) and \
+            config.prefix_header:
+        sig.update(str(config.prefix_header).encode('utf-8'))
+        sig.update(str(file_signature(config.prefix_header)).encode())
     return sig.hexdigest()
 
 
+def checked_cache(cache, config):
+    """
+    Return `cache`, or a :class:`dummy_cache_t` if the declarations read
+    with `config` can not be stored in the persistent `cache`.
+
+    The location filters that are not :class:`location_filter_t` instances
+    (e.g. functions) have no representation that is the same in each run:
+    the entries cached with them could never be reused.
+
+    """
+
+    location_filter = getattr(config, "location_filter", None)
+    if getattr(cache, "directory", None) is None or \
+            location_filter is None or \
+            isinstance(location_filter, cxx_parsers_cfg.location_filter_t):
+        return cache
+    cache_base_t.logger.warning(
+        "The declarations cache is not used: the location filter %r is " +
+        "not a location_filter_t instance.", location_filter)
+    return dummy_cache_t()
+
+
 class cache_base_t(object):
     logger = utils.loggers.declarations_cache
 
@@ -97,6 +181,17 @@ class cache_base_t(object):
 
         raise NotImplementedError()
 
+    @property
+    def directory(self):
+        """
+        Directory where the cache is stored, or None. The files derived
+        from the configurations, like the precompiled headers, are stored
+        there too.
+
+        """
+
+        return None
+
 
 class record_t(object):
 
@@ -153,6 +248,10 @@ class record_t(object):
     def declarations(self):
         return self.__declarations
 
+    @declarations.setter
+    def declarations(self, declarations):
+        self.__declarations = declarations
+
     @property
     def xml_generator(self):
         return self.__xml_generator
@@ -165,19 +264,46 @@ class file_cache_t(cache_base_t):
         have been 'hit' in the cache and if an entry has not been hit then
         it is deleted at the time of the flush().  This keeps the cache from
         growing larger when files change and are not used again.
+
+        The cache file starts with a header, followed by the pickled
+        declarations of each entry and by an index of the entries. Only the
+        index is loaded when the cache is created; the file is memory-mapped
+        and the declarations of an entry are unpickled on the first hit.
+        flush() appends the new entries and a new index to the file, the
+        file is only rewritten when more than half of the pickled
+        declarations belong to removed entries.
     """
 
-    def __init__(self, name):
+    # Magic string, format version and offset of the index
+    __header = struct.Struct("<8sIQ")
+    __magic = b"PYGCCXML"
+    __version = 1
+
+    def __init__(self, name, compact=False):
         """
         :param name: name of the cache file.
+
+        :param compact: if `True`, the declarations are stored using the
+                        format of :mod:`declarations_serializer` instead of
+                        pickle
         """
 
         cache_base_t.__init__(self)
         self.__name = name  # Name of cache file
+        self.__compact = compact
+        # Memory map of the cache file
+        self.__mmap = None
+        # Map record_key to (offset, length) of the pickled declarations
+        self.__offsets = {}
+        # Keys of the records whose declarations are not loaded yet
+        self.__unloaded = set()
+        # Size of the pickled declarations area of the cache file
+        self.__payloads_size = 0
+        self.__needs_flushed = False
         # Map record_key to record_t
         self.__cache = self.__load(self.__name)
-        self.__needs_flushed = not bool(
-            self.__cache)  # If empty then we need to flush
+        if not self.__cache:  # If empty then we need to flush
+            self.__needs_flushed = True
         for entry in self.__cache.values():  # Clear hit flags
             entry.was_hit = False
             try:
@@ -198,9 +324,8 @@ class file_cache_t(cache_base_t):
                     "generator. Please regenerate it.") % name
                 raise RuntimeError(msg)
 
-    @staticmethod
-    def __load(file_name):
-        """ Load pickled cache from file and return the object. """
+    def __load(self, file_name):
+        """ Load the index of the cache file and return the records. """
 
         if os.path.exists(file_name) and not os.path.isfile(file_name):
             raise RuntimeError(
@@ -208,14 +333,65 @@ class file_cache_t(cache_base_t):
         if not os.path.exists(file_name):
             open(file_name, 'w+b').close()
             return {}
+        with open(file_name, 'rb') as cache_file_obj:
+            magic = cache_file_obj.read(len(self.__magic))
+        if not magic:
+            return {}
+        if magic != self.__magic:
+            cache = self.__load_pickle(file_name)
+            # Convert the cache file to the current format
+            self.__needs_flushed = True
+            return cache
+        try:
+            file_cache_t.logger.info('Loading cache file "%s".', file_name)
+            start_time = utils.wall_time()
+            self.__open_mmap()
+            _, version, index_offset = self.__header.unpack_from(
+                self.__mmap, 0)
+            if version != self.__version:
+                msg = (
+                    "The %s cache file is not compatible with this version " +
+                    "of pygccxml. Please regenerate it.") % file_name
+                raise RuntimeError(msg)
+            index = pickle.loads(self.__mmap[index_offset:])
+            self.__payloads_size = index_offset - self.__header.size
+            file_cache_t.logger.debug(
+                "Cache index has been loaded in %.1f secs",
+                (utils.wall_time() - start_time))
+            file_cache_t.logger.debug(
+                "Found cache in file: [%s]  entries: %s",
+                file_name, len(index))
+        except (pickle.UnpicklingError, AttributeError, EOFError,
+                ImportError, IndexError, struct.error) as error:
+            file_cache_t.logger.exception(
+                "Error occurred while reading cache file: %s",
+                error)
+            file_cache_t.logger.info(
+                "Invalid cache file: [%s]  Regenerating.",
+                file_name)
+            self.__close_mmap()
+            open(file_name, 'w+b').close()   # Create empty file
+            return {}                        # Empty cache
+
+        cache = {}
+        for key, (offset, length, fields) in index.items():
+            cache[key] = record_t(*fields, declarations=None)
+            self.__offsets[key] = (offset, length)
+            self.__unloaded.add(key)
+        return cache
+
+    @staticmethod
+    def __load_pickle(file_name):
+        """ Load pickled cache from file and return the object. """
+
         cache_file_obj = open(file_name, 'rb')
         try:
             file_cache_t.logger.info('Loading cache file "%s".', file_name)
-            start_time = time.clock()
+            start_time = utils.wall_time()
             cache = pickle.load(cache_file_obj)
             file_cache_t.logger.debug(
                 "Cache file has been loaded in %.1f secs",
-                (time.clock() - start_time))
+                (utils.wall_time() - start_time))
             file_cache_t.logger.debug(
                 "Found cache in file: [%s]  entries: %s",
                 file_name, len(list(cache.keys())))
@@ -234,6 +410,26 @@ class file_cache_t(cache_base_t):
             cache_file_obj.close()
         return cache
 
+    def __open_mmap(self):
+        with open(self.__name, 'rb') as cache_file_obj:
+            self.__mmap = mmap.mmap(
+                cache_file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __close_mmap(self):
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+
+    def __load_declarations(self, key):
+        offset, length = self.__offsets[key]
+        self.__cache[key].declarations = loads_declarations(
+            self.__mmap[offset:offset + length])
+        self.__unloaded.discard(key)
+
+    @property
+    def directory(self):
+        return os.path.dirname(os.path.abspath(self.__name))
+
     def flush(self):
         # If not marked as needing flushed, then return immediately
         if not self.__needs_flushed:
@@ -245,14 +441,95 @@ class file_cache_t(cache_base_t):
         for key in list(self.__cache.keys()):
             if not self.__cache[key].was_hit:
                 num_removed += 1
-                del self.__cache[key]
+                self.__remove(key)
         if num_removed > 0:
             self.logger.debug(
                 "There are %s removed entries from cache.",
                 num_removed)
+
         # Save out the cache to disk
-        with open(self.__name, "w+b") as cache_file:
-            pickle.dump(self.__cache, cache_file, pickle.HIGHEST_PROTOCOL)
+        # Rewrite the file when more than half of the declarations area
+        # is used by removed entries.
+        used_size = sum(length for _, length in self.__offsets.values())
+        if self.__mmap is None or used_size < self.__payloads_size // 2:
+            self.__rewrite()
+        else:
+            self.__append()
+        self.__needs_flushed = False
+
+    def __rewrite(self):
+        """ Write all the entries to a new cache file. """
+
+        payloads = {}
+        for key in self.__offsets:
+            offset, length = self.__offsets[key]
+            payloads[key] = self.__mmap[offset:offset + length]
+        self.__close_mmap()
+        self.__offsets = {}
+
+        # Write to a temporary file, so that the cache file is not truncated
+        # under the feet of another file_cache_t instance using it.
+        temp_name = self.__name + ".tmp"
+        with open(temp_name, "w+b") as cache_file:
+            cache_file.write(self.__header.pack(self.__magic, 0, 0))
+            for key, record in self.__cache.items():
+                if key in payloads:
+                    payload = payloads[key]
+                else:
+                    payload = dumps_declarations(
+                        record.declarations, self.__compact)
+                self.__offsets[key] = (cache_file.tell(), len(payload))
+                cache_file.write(payload)
+            self.__write_index(cache_file)
+        utils.replace_file(temp_name, self.__name)
+        self.__open_mmap()
+
+    def __append(self):
+        """ Append the new entries and the index to the cache file. """
+
+        self.__close_mmap()
+        with open(self.__name, "r+b") as cache_file:
+            cache_file.seek(0, os.SEEK_END)
+            for key, record in self.__cache.items():
+                if key in self.__offsets:
+                    continue
+                payload = dumps_declarations(
+                    record.declarations, self.__compact)
+                self.__offsets[key] = (cache_file.tell(), len(payload))
+                cache_file.write(payload)
+            self.__write_index(cache_file)
+        self.__open_mmap()
+
+    def __write_index(self, cache_file):
+        """
+        Write the index at the current position of `cache_file`, and point
+        the header to it.
+
+        """
+
+        index = {}
+        for key, record in self.__cache.items():
+            fields = (
+                record.xml_generator,
+                record.source_signature,
+                record.config_signature,
+                record.included_files,
+                record.included_files_signature)
+            index[key] = self.__offsets[key] + (fields,)
+        index_offset = cache_file.tell()
+        self.__payloads_size = index_offset - self.__header.size
+        pickle.dump(index, cache_file, pickle.HIGHEST_PROTOCOL)
+        cache_file.flush()
+        # The header is written last, the previous index stays valid until
+        # the new one is complete.
+        cache_file.seek(0)
+        cache_file.write(
+            self.__header.pack(self.__magic, self.__version, index_offset))
+
+    def __remove(self, key):
+        del self.__cache[key]
+        self.__offsets.pop(key, None)
+        self.__unloaded.discard(key)
 
     def update(self, source_file, configuration, declarations, included_files):
         """ Update a cached record with the current key and value contents. """
@@ -269,6 +546,8 @@ class file_cache_t(cache_base_t):
             declarations=declarations)
         # Switched over to holding full record in cache so we don't have
         # to keep creating records in the next method.
+        if record.key() in self.__cache:
+            self.__remove(record.key())
         self.__cache[record.key()] = record
         self.__cache[record.key()].was_hit = True
         self.__needs_flushed = True
@@ -287,10 +566,12 @@ class file_cache_t(cache_base_t):
             return None
         record = self.__cache[key]
         if self.__is_valid_signature(record):
+            if key in self.__unloaded:
+                self.__load_declarations(key)
             record.was_hit = True  # Record cache hit
             return record.declarations
         else:  # some file has been changed
-            del self.__cache[key]
+            self.__remove(key)
             return None
 
     @staticmethod
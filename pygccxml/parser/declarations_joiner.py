@@ -42,50 +42,92 @@ def join_declarations(namespace):
 
 def _join_namespaces(namespace):
     ddhash = {}
+    join_keys = {}
     decls = []
 
     for decl in namespace.declarations:
-        _fill_declarations(ddhash, decls, decl)
+        _fill_declarations(ddhash, join_keys, decls, decl)
 
     class_t = declarations.class_t
     class_declaration_t = declarations.class_declaration_t
     if class_t in ddhash and class_declaration_t in ddhash:
         # If there is a class and its forward declaration in the namespace,
         # Remove the second one from the declaration tree
-        _remove_second_class(ddhash, decls, class_t, class_declaration_t)
+        decls = _remove_second_class(
+            ddhash, decls, class_t, class_declaration_t)
 
     namespace.declarations = decls
 
 
-def _fill_declarations(ddhash, decls, decl):
-    if decl.__class__ not in ddhash:
-        ddhash[decl.__class__] = {decl.name: [decl]}
+def _fill_declarations(ddhash, join_keys, decls, decl):
+    """
+    Add a declaration to the declarations of a namespace, unless it is
+    already there.
+
+    The declarations of the namespace are indexed by class and name in
+    `ddhash`. The declarations that can have the same name (functions,
+    unnamed enums and classes) are also indexed by their :func:`_join_key`
+    in `join_keys`, which is only filled for the names declared several
+    times.
+
+    """
+
+    joined_decls = ddhash.setdefault(decl.__class__, {})
+    same_name_decls = joined_decls.get(decl.name)
+    if same_name_decls is None:
         decls.append(decl)
-    else:
-        joined_decls = ddhash[decl.__class__]
-        if decl.name not in joined_decls:
+        joined_decls[decl.name] = [decl]
+    elif isinstance(decl, declarations.namespace_t):
+        same_name_decls[0].take_parenting(decl)
+    elif isinstance(decl, declarations.calldef_t) or (
+            # unnamed enums and classes
+            not decl.name and isinstance(
+                decl, (declarations.enumeration_t, declarations.class_t))):
+        keys = join_keys.get((decl.__class__, decl.name))
+        if keys is None:
+            # Computing the keys links the lazy types of the functions
+            keys = set(_join_key(joined) for joined in same_name_decls)
+            join_keys[(decl.__class__, decl.name)] = keys
+        key = _join_key(decl)
+        if key not in keys:
+            # functions has overloading
+            keys.add(key)
             decls.append(decl)
-            joined_decls[decl.name] = [decl]
-        else:
-            if isinstance(decl, declarations.calldef_t):
-                if decl not in joined_decls[decl.name]:
-                    # functions has overloading
-                    decls.append(decl)
-                    joined_decls[decl.name].append(decl)
-            elif isinstance(decl, declarations.enumeration_t):
-                # unnamed enums
-                if not decl.name and decl not in \
-                        joined_decls[decl.name]:
-                    decls.append(decl)
-                    joined_decls[decl.name].append(decl)
-            elif isinstance(decl, declarations.class_t):
-                # unnamed classes
-                if not decl.name and decl not in \
-                        joined_decls[decl.name]:
-                    decls.append(decl)
-                    joined_decls[decl.name].append(decl)
-            elif isinstance(decl, declarations.namespace_t):
-                joined_decls[decl.name][0].take_parenting(decl)
+            same_name_decls.append(decl)
+
+
+def _join_key(decl):
+    """
+    Return a key of a declaration, equal for the declarations of the same
+    namespace that have the same class and name and are equal.
+
+    """
+
+    if isinstance(decl, declarations.calldef_t):
+        key = [
+            decl.location,
+            _type_key(decl.return_type),
+            tuple(
+                (argument.name,
+                 argument.default_value,
+                 _type_key(argument.decl_type))
+                for argument in decl.arguments),
+            decl.has_extern,
+            decl.does_throw]
+        if "GCC" in utils.xml_generator:
+            key.append(decl.demangled_name)
+        if isinstance(decl, declarations.member_calldef_t):
+            key.extend([decl.virtuality, decl.has_static, decl.has_const])
+        return tuple(key)
+    elif isinstance(decl, declarations.enumeration_t):
+        return decl.location, tuple(decl.values)
+    return decl.location, decl.class_type, decl.is_abstract
+
+
+def _type_key(type_):
+    if type_ is None:
+        return None
+    return type_.decl_string
 
 
 def _remove_second_class(ddhash, decls, class_t, class_declaration_t):
@@ -98,6 +140,7 @@ def _remove_second_class(ddhash, decls, class_t, class_declaration_t):
         elif "CastXML" in utils.xml_generator:
             class_names.add(same_name_classes[0].name)
 
+    removed = set()
     class_declarations = ddhash[class_declaration_t]
     for name, same_name_class_declarations in \
             class_declarations.items():
@@ -107,8 +150,11 @@ def _remove_second_class(ddhash, decls, class_t, class_declaration_t):
             if "GCC" in utils.xml_generator:
                 if class_declaration.mangled and \
                                 class_declaration.mangled in class_names:
-                    decls.remove(class_declaration)
+                    removed.add(id(class_declaration))
             elif "CastXML" in utils.xml_generator:
                 if class_declaration.name and \
                                 class_declaration.name in class_names:
-                    decls.remove(class_declaration)
+                    removed.add(id(class_declaration))
+    if not removed:
+        return decls
+    return [decl for decl in decls if id(decl) not in removed]
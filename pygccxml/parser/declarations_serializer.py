@@ -0,0 +1,386 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Compact serialization of declarations trees.
+
+The :func:`dumps` function flattens a declarations tree into a few tables:
+
+* a table of the strings (names, file names, ...) found in the tree,
+
+* a table of the other constants (numbers, booleans, None),
+
+* the class of each declaration and type object,
+
+* the shapes of the objects, the names of their attributes, shared by all
+  the objects with the same attributes,
+
+* a stream of integers that contains the shape and the attribute values of
+  each object. The references to other objects (`declarated_t.declaration`,
+  `hierarchy_info_t.related_class`, parents, ...) are stored as ids.
+
+The type objects are deduplicated: all the equivalent types of a tree are
+written, and loaded, as a single shared object. The transient state of the
+objects (the algorithms caches, the query optimizer of the scopes) is not
+written; it is recreated when the tree is loaded.
+
+The tree is walked without recursion, so that deep trees do not reach the
+recursion limit, and the tables are written after a versioned header.
+
+The caches use this format when they are created with `compact=True`.
+"""
+
+import sys
+import struct
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .. import declarations
+from ..declarations import algorithms_cache
+
+# The magic string and the version of the format
+_header = struct.Struct("<8sI")
+_magic = b"PYGCCXMD"
+_version = 1
+
+# The tags of the encoded values, stored in the three lowest bits
+_TAG_CONSTANT = 0
+_TAG_STRING = 1
+_TAG_OBJECT = 2
+_TAG_LIST = 3
+_TAG_TUPLE = 4
+_TAG_DICT = 5
+_TAG_PICKLE = 6
+_TAG_BITS = 3
+_TAG_MASK = 7
+
+# The attributes that are not serialized, and a factory for their value
+# after loading
+_transient_attributes = {
+    declarations.declaration_t: {
+        '_cache': algorithms_cache.declaration_algs_cache_t},
+    declarations.type_t: {
+        'cache': algorithms_cache.type_algs_cache_t},
+    declarations.hierarchy_info_t: {
+        '_declaration_path': lambda: None,
+        '_declaration_path_hash': lambda: None},
+    declarations.scopedef_t: {
+        '_type2decls': dict,
+        '_type2name2decls': dict,
+        '_type2decls_nr': dict,
+        '_type2name2decls_nr': dict,
+        '_all_decls': lambda: None,
+        '_all_decls_not_recursive': list},
+}
+
+# Per class cache of the transient attributes
+_class_transient_attributes = {}
+
+# Per class cache of _is_object
+_object_classes = {}
+
+
+def is_serialized(data):
+    """
+    Return True if `data` was created by :func:`dumps`.
+
+    :param data: serialized data
+    :type data: bytes
+    """
+
+    return data[:len(_magic)] == _magic
+
+
+def dumps(obj):
+    """
+    Serialize a declarations tree.
+
+    :param obj: a declaration, a type or a list of declarations
+    :rtype: bytes
+    """
+
+    return _writer_t().dumps(obj)
+
+
+def loads(data):
+    """
+    Load a declarations tree serialized by :func:`dumps`.
+
+    :param data: serialized data
+    :type data: bytes
+    """
+
+    magic, version = _header.unpack_from(data, 0)
+    if magic != _magic:
+        raise RuntimeError("The data is not a serialized declarations tree.")
+    if version != _version:
+        raise RuntimeError((
+            "The declarations tree was serialized with an incompatible " +
+            "version (%s) of pygccxml.") % version)
+    tables = pickle.loads(data[_header.size:])
+    return _reader_t(*tables).loads()
+
+
+def _transient(class_):
+    """Return the transient attributes of the instances of `class_`."""
+
+    attributes = _class_transient_attributes.get(class_)
+    if attributes is None:
+        attributes = {}
+        for base in reversed(class_.__mro__):
+            attributes.update(_transient_attributes.get(base, {}))
+        _class_transient_attributes[class_] = attributes
+    return attributes
+
+
+def _is_object(value):
+    """
+    Return True if `value` is a declaration, a type or another pygccxml
+    object that is serialized attribute by attribute.
+
+    The instances of the subclasses of the pygccxml classes, like the
+    declarations created by a custom declarations factory, are serialized
+    attribute by attribute too.
+
+    """
+
+    class_ = type(value)
+    is_object = _object_classes.get(class_)
+    if is_object is None:
+        is_object = hasattr(value, '__dict__') and \
+            not isinstance(value, type) and \
+            any(base.__module__.startswith('pygccxml.')
+                for base in class_.__mro__)
+        _object_classes[class_] = is_object
+    return is_object
+
+
+class _writer_t(object):
+
+    def __init__(self):
+        object.__init__(self)
+        self.strings = []
+        self.string_ids = {}
+        self.constants = []
+        self.constant_ids = {}
+        self.pickles = []
+        self.shapes = []
+        self.shape_ids = {}
+        # The class (string id) and the encoded attributes of each object
+        self.classes = []
+        self.records = []
+        # Map id(object) to the object id
+        self.object_ids = {}
+        # Map the encoded types to their object id
+        self.type_ids = {}
+        # Keep the objects alive, so that their id() is not reused
+        self.objects = []
+        # Objects waiting for their attributes to be encoded
+        self.pending = []
+
+    def dumps(self, obj):
+        root = []
+        self.encode(obj, root)
+        while self.pending:
+            obj, object_id = self.pending.pop()
+            self.records[object_id] = self.encode_attributes(obj)
+
+        data = []
+        for record in self.records:
+            data.extend(record)
+        tables = (
+            self.strings,
+            self.constants,
+            self.pickles,
+            self.classes,
+            self.shapes,
+            data,
+            root)
+        return _header.pack(_magic, _version) + \
+            pickle.dumps(tables, pickle.HIGHEST_PROTOCOL)
+
+    def string_id(self, value):
+        id_ = self.string_ids.get(value)
+        if id_ is None:
+            id_ = len(self.strings)
+            self.string_ids[value] = id_
+            self.strings.append(value)
+        return id_
+
+    def class_id(self, class_):
+        return self.string_id(class_.__module__ + ':' + class_.__name__)
+
+    def encode(self, value, out):
+        """Append the encoding of `value` to the `out` array."""
+
+        value_type = type(value)
+        if value_type is declarations.lazy_type_t:
+            # Store the linked type
+            value = value.resolve()
+            value_type = type(value)
+        if value is None or value_type in (bool, int, float) or \
+                value_type.__name__ == 'long':
+            # Do not mix 1, 1.0 and True
+            key = (value_type, value)
+            id_ = self.constant_ids.get(key)
+            if id_ is None:
+                id_ = len(self.constants)
+                self.constant_ids[key] = id_
+                self.constants.append(value)
+            out.append(id_ << _TAG_BITS | _TAG_CONSTANT)
+        elif isinstance(value, str) or value_type.__name__ == 'unicode':
+            out.append(self.string_id(value) << _TAG_BITS | _TAG_STRING)
+        elif value_type in (list, tuple):
+            tag = _TAG_LIST if value_type is list else _TAG_TUPLE
+            out.append(len(value) << _TAG_BITS | tag)
+            for item in value:
+                self.encode(item, out)
+        elif value_type is dict:
+            out.append(len(value) << _TAG_BITS | _TAG_DICT)
+            for key, item in value.items():
+                self.encode(key, out)
+                self.encode(item, out)
+        elif _is_object(value):
+            out.append(self.object_id(value) << _TAG_BITS | _TAG_OBJECT)
+        else:
+            out.append(len(self.pickles) << _TAG_BITS | _TAG_PICKLE)
+            self.pickles.append(value)
+
+    def encode_attributes(self, obj):
+        transient = _transient(type(obj))
+        names = tuple(sorted(
+            name for name in obj.__dict__ if name not in transient))
+        shape_id = self.shape_ids.get(names)
+        if shape_id is None:
+            shape_id = len(self.shapes)
+            self.shape_ids[names] = shape_id
+            self.shapes.append(tuple(self.string_id(name) for name in names))
+
+        record = [shape_id]
+        attributes = obj.__dict__
+        for name in names:
+            self.encode(attributes[name], record)
+        return record
+
+    def object_id(self, obj):
+        object_id = self.object_ids.get(id(obj))
+        if object_id is not None:
+            return object_id
+
+        self.objects.append(obj)
+        if isinstance(obj, declarations.type_t):
+            # The attributes of a type are encoded right away, to find an
+            # equivalent type that was already encoded. A type only refers
+            # to other types and to declarations, so that the recursion is
+            # bounded by the nesting of the types.
+            record = self.encode_attributes(obj)
+            key = (type(obj), tuple(record))
+            object_id = self.type_ids.get(key)
+            if object_id is None:
+                object_id = self.new_object(obj, record)
+                self.type_ids[key] = object_id
+        else:
+            object_id = self.new_object(obj, None)
+            self.pending.append((obj, object_id))
+        self.object_ids[id(obj)] = object_id
+        return object_id
+
+    def new_object(self, obj, record):
+        object_id = len(self.classes)
+        self.classes.append(self.class_id(type(obj)))
+        self.records.append(record)
+        return object_id
+
+
+class _reader_t(object):
+
+    def __init__(
+            self, strings, constants, pickles, classes, shapes, data, root):
+        object.__init__(self)
+        self.strings = strings
+        self.constants = constants
+        self.pickles = pickles
+        self.classes = [self.load_class(strings[id_]) for id_ in classes]
+        self.shapes = [
+            [strings[id_] for id_ in shape] for shape in shapes]
+        self.data = data
+        self.root = root
+        self.objects = []
+
+    @staticmethod
+    def load_class(name):
+        module_name, class_name = name.split(':')
+        __import__(module_name)
+        return getattr(sys.modules[module_name], class_name)
+
+    def loads(self):
+        # Create all the objects first, so that the references between the
+        # objects can be resolved while their attributes are loaded.
+        self.objects = [class_.__new__(class_) for class_ in self.classes]
+
+        data = self.data
+        position = 0
+        for obj in self.objects:
+            shape = self.shapes[data[position]]
+            position += 1
+            attributes = obj.__dict__
+            for name in shape:
+                attributes[name], position = self.decode(data, position)
+            for name, factory in _transient(type(obj)).items():
+                attributes[name] = factory()
+
+        self.restore_optimizers()
+        value, _ = self.decode(self.root, 0)
+        return value
+
+    def decode(self, data, position):
+        """
+        Decode the value at `position`, return the value and the position
+        of the next value.
+
+        """
+
+        code = data[position]
+        tag = code & _TAG_MASK
+        index = code >> _TAG_BITS
+        position += 1
+        if tag == _TAG_STRING:
+            return self.strings[index], position
+        elif tag == _TAG_OBJECT:
+            return self.objects[index], position
+        elif tag == _TAG_CONSTANT:
+            return self.constants[index], position
+        elif tag == _TAG_PICKLE:
+            return self.pickles[index], position
+        elif tag == _TAG_DICT:
+            value = {}
+            for _ in range(index):
+                key, position = self.decode(data, position)
+                value[key], position = self.decode(data, position)
+            return value, position
+        else:
+            items = []
+            for _ in range(index):
+                item, position = self.decode(data, position)
+                items.append(item)
+            if tag == _TAG_TUPLE:
+                return tuple(items), position
+            return items, position
+
+    def restore_optimizers(self):
+        """Initialize the query optimizer of the optimized scopes."""
+
+        optimized = []
+        for obj in self.objects:
+            if isinstance(obj, declarations.scopedef_t) and obj._optimized:
+                obj._optimized = False
+                optimized.append(obj)
+        optimized_ids = set(id(scope) for scope in optimized)
+        for scope in optimized:
+            # init_optimizer() also initializes the children scopes
+            if id(scope.parent) not in optimized_ids:
+                scope.init_optimizer()
@@ -14,11 +14,20 @@ files, stored in a dedicated cache directory, to store the cached contents.
 
 The :class:`parser.directory_cache_t` class instance could be passed as the
 `cache` argument of the :func:`parser.parse` function.
+
+Several processes can use the same cache directory: the files are written
+to a temporary file which is then renamed, and the index is merged with the
+index written by the other processes while holding a lock.
+
+The size of the cache can be bounded: the least recently used entries are
+evicted when the index is saved.
 """
 
 import os
 import os.path
 import gzip
+import time
+import uuid
 import hashlib
 import warnings
 try:
@@ -42,20 +51,33 @@ class index_entry_t(object):
     This class is a helper class for the directory_cache_t class.
     """
 
-    def __init__(self, filesigs, configsig):
+    def __init__(
+            self, filesigs, configsig, cachefile=None, last_hit=0, size=None):
         """
         :param filesigs: a list of tuples( `fileid`, `sig`)...
         :param configsig: the signature of the configuration object.
+        :param cachefile: the name of the .cache file of the entry.
+        :param last_hit: the time the entry was last created or used.
+        :param size: the size of the .cache file, in bytes.
         """
 
         self.filesigs = filesigs
         self.configsig = configsig
+        self.cachefile = cachefile
+        self.last_hit = last_hit
+        self.size = size
 
     def __getstate__(self):
-        return self.filesigs, self.configsig
+        return (
+            self.filesigs, self.configsig, self.cachefile, self.last_hit,
+            self.size)
 
     def __setstate__(self, state):
-        self.filesigs, self.configsig = state
+        # Entries written by older versions have no cache file name, no
+        # last hit time and no size
+        state += (None, 0, None)[len(state) - 2:]
+        (self.filesigs, self.configsig, self.cachefile, self.last_hit,
+         self.size) = state
 
 
 # pylint: disable=W0622
@@ -70,11 +92,17 @@ class directory_cache_t(declarations_cache.cache_base_t):
     a .cache file is still valid or not (by checking if one of the dependent
     files (i.e. the header file itself and all included files) have been
     modified since the last run).
+
+    When `max_entries` or `max_bytes` is set, the least recently used
+    entries are removed when the index is saved, until the cache fits in
+    these limits. The :meth:`gc` method removes the files that are not
+    referenced by the index anymore.
     """
 
     def __init__(
             self, dir="cache", directory="cache",
-            compression=False, sha1_sigs=True):
+            compression=False, sha1_sigs=True, compact=False,
+            max_entries=None, max_bytes=None):
         """
         :param dir: cache directory path, it is created, if it does not exist
 
@@ -84,6 +112,16 @@ class directory_cache_t(declarations_cache.cache_base_t):
         :param sha1_sigs: `sha1_sigs` determines whether file modifications is
                          checked by computing a `sha1` digest or by checking
                          the modification date
+
+        :param compact: if `True`, the declarations are stored using the
+                        format of :mod:`declarations_serializer` instead of
+                        pickle
+
+        :param max_entries: maximum number of entries in the cache, or `None`
+                            for no limit
+
+        :param max_bytes: maximum size of the .cache files, in bytes, or
+                          `None` for no limit
         """
 
         if dir != "cache":
@@ -103,6 +141,13 @@ class directory_cache_t(declarations_cache.cache_base_t):
         # Flag that determines whether the cache files will be compressed
         self.__compression = compression
 
+        # Flag that determines whether the declarations are pickled
+        self.__compact = compact
+
+        # Limits of the cache size
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+
         # Flag that determines whether the signature is a sha1 digest or
         # the modification time
         # (this flag is passed to the filename_repository_t class)
@@ -119,6 +164,13 @@ class directory_cache_t(declarations_cache.cache_base_t):
         # Flag that indicates whether the index was modified
         self.__modified_flag = False
 
+        # Keys of the index entries that were added or removed since the
+        # index was saved
+        self.__modified_keys = set()
+
+        # Keys of the index entries that were used since the index was saved
+        self.__hit_keys = set()
+
         # Check if dir refers to an existing file...
         if os.path.isfile(self.__dir):
             raise ValueError((
@@ -130,7 +182,16 @@ class directory_cache_t(declarations_cache.cache_base_t):
             self._load()
         else:
             # Create the cache directory...
-            os.mkdir(self.__dir)
+            try:
+                os.mkdir(self.__dir)
+            except OSError:
+                # Another process may have created it in the meantime
+                if not os.path.isdir(self.__dir):
+                    raise
+
+    @property
+    def directory(self):
+        return self.__dir
 
     def flush(self):
         """Save the index table to disk."""
@@ -174,14 +235,17 @@ class directory_cache_t(declarations_cache.cache_base_t):
             id_, sig = self.__filename_rep.acquire_filename(filename)
             filesigs.append((id_, sig))
 
+        # Write the declarations into the cache file...
+        cachefilename = self._create_cache_filename(source_file)
+        self._write_file(cachefilename, declarations, self.__compact)
+
         configsig = self._create_config_signature(configuration)
-        entry = index_entry_t(filesigs, configsig)
+        entry = index_entry_t(
+            filesigs, configsig, os.path.basename(cachefilename),
+            time.time(), os.path.getsize(cachefilename))
         self.__index[key] = entry
         self.__modified_flag = True
-
-        # Write the declarations into the cache file...
-        cachefilename = self._create_cache_filename(source_file)
-        self._write_file(cachefilename, declarations)
+        self.__modified_keys.add(key)
 
     def cached_value(self, source_file, configuration):
         """Return the cached declarations or None.
@@ -223,8 +287,23 @@ class directory_cache_t(declarations_cache.cache_base_t):
                 return None
 
         # Load and return the cached declarations
-        cachefilename = self._create_cache_filename(source_file)
-        decls = self._read_file(cachefilename)
+        if entry.cachefile is None:
+            return None
+        cachefilename = os.path.join(self.__dir, entry.cachefile)
+        try:
+            decls = self._read_file(cachefilename)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            # The entry was removed by another process
+            return None
+
+        # Remember the hit, for the eviction of the least recently used
+        # entries. The hits are only worth saving the index when the size
+        # of the cache is bounded: a run which only reads the cache does
+        # not write (nor lock) the index.
+        entry.last_hit = time.time()
+        self.__hit_keys.add(key)
+        if self.__max_entries is not None or self.__max_bytes is not None:
+            self.__modified_flag = True
 
         # print "CACHE: Using cached decls for",source_file
         return decls
@@ -254,38 +333,195 @@ class directory_cache_t(declarations_cache.cache_base_t):
             self.__filename_rep = filename_repository_t(self.__sha1_sigs)
 
         # Read the xml generator from the cache and set it
-        with open(os.path.join(self.__dir, "gen.dat"), "r") as gen_file:
-            utils.xml_generator = gen_file.read()
+        genfilename = os.path.join(self.__dir, "gen.dat")
+        if os.path.exists(genfilename):
+            with open(genfilename, "r") as gen_file:
+                utils.xml_generator = gen_file.read()
 
         self.__modified_flag = False
+        self.__modified_keys = set()
+        self.__hit_keys = set()
 
     def _save(self):
         """
         save the cache index, in case it was modified.
 
         Saves the index table and the file name repository in the file
-        `index.dat`
+        `index.dat`. The entries added or removed by other processes since
+        the index was loaded are kept.
         """
 
         if self.__modified_flag:
-            self.__filename_rep.update_id_counter()
-            indexfilename = os.path.join(self.__dir, "index.dat")
-            self._write_file(
-                indexfilename,
-                (self.__index,
-                 self.__filename_rep))
+            with utils.file_lock_t(os.path.join(self.__dir, "index.lock")):
+                self._merge_index()
+                self._evict()
+                self._write_index()
 
-            # Read the xml generator from the cache and set it
-            with open(os.path.join(self.__dir, "gen.dat"), "w") as gen_file:
-                gen_file.write(utils.xml_generator)
+    def gc(self, min_age=3600):
+        """
+        Remove the files and the file names that are not used anymore.
+
+        The .cache files that are not referenced by the index (for example
+        the files of a process that was killed before saving the index) and
+        the temporary files are removed. The reference counts of the file
+        names are recomputed from the index, the file names that are not
+        referenced anymore are removed from the index.
+
+        :param min_age: the files modified less than `min_age` seconds ago
+                        are kept, as they may belong to a process that did
+                        not save the index yet
+        :type min_age: float
+        :rtype: the number of removed files
+        """
+
+        removed = 0
+        with utils.file_lock_t(os.path.join(self.__dir, "index.lock")):
+            self._merge_index()
+            self._evict()
+
+            used_files = set(
+                entry.cachefile for entry in self.__index.values())
+            now = time.time()
+            for name in os.listdir(self.__dir):
+                if name in used_files or not (
+                        name.endswith(".cache") or name.endswith(".tmp")):
+                    continue
+                filename = os.path.join(self.__dir, name)
+                try:
+                    if now - os.path.getmtime(filename) < min_age:
+                        continue
+                except OSError:
+                    # Removed by another process
+                    continue
+                self._remove_file(filename)
+                removed += 1
+
+            ref_counts = {}
+            for entry in self.__index.values():
+                for id_, _ in entry.filesigs:
+                    ref_counts[id_] = ref_counts.get(id_, 0) + 1
+            self.__filename_rep.set_ref_counts(ref_counts)
+            self._write_index()
+        return removed
+
+    def _write_index(self):
+        """
+        Write the index table and the file name repository.
 
-            self.__modified_flag = False
+        This method must be called while holding the index lock.
+        """
+
+        self.__filename_rep.update_id_counter()
+        indexfilename = os.path.join(self.__dir, "index.dat")
+        self._write_file(
+            indexfilename,
+            (self.__index,
+             self.__filename_rep))
+
+        # Write the xml generator used to create the cache
+        genfilename = os.path.join(self.__dir, "gen.dat")
+        tempfilename = self._create_temp_filename(genfilename)
+        with open(tempfilename, "w") as gen_file:
+            gen_file.write(utils.xml_generator)
+        utils.replace_file(tempfilename, genfilename)
+
+        self.__modified_flag = False
+        self.__modified_keys = set()
+        self.__hit_keys = set()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries, until the cache fits in the
+        `max_entries` and `max_bytes` limits.
+
+        This method must be called while holding the index lock.
+        """
+
+        if self.__max_entries is None and self.__max_bytes is None:
+            return
+
+        entries = sorted(
+            self.__index.items(), key=lambda item: item[1].last_hit)
+        count = len(entries)
+        size = sum(self._get_entry_size(entry) for _, entry in entries)
+        for key, entry in entries:
+            if (self.__max_entries is None or
+                    count <= self.__max_entries) and \
+                    (self.__max_bytes is None or size <= self.__max_bytes):
+                break
+            self._remove_entry(None, key)
+            count -= 1
+            size -= entry.size
+
+    def _get_entry_size(self, entry):
+        """Return the size of the cache file of an entry."""
+
+        if entry.size is None:
+            # Entry written by an older version
+            entry.size = 0
+            if entry.cachefile is not None:
+                try:
+                    entry.size = os.path.getsize(
+                        os.path.join(self.__dir, entry.cachefile))
+                except OSError:
+                    pass
+        return entry.size
+
+    def _merge_index(self):
+        """
+        Merge the modified entries into the index currently saved on disk.
+
+        The index and the file name repository are replaced by the merged
+        ones. This method must be called while holding the index lock.
+        """
+
+        indexfilename = os.path.join(self.__dir, "index.dat")
+        if not os.path.exists(indexfilename):
+            return
+        index, filename_rep = self._read_file(indexfilename)
+        if filename_rep._sha1_sigs != self.__sha1_sigs:
+            # The signatures can not be merged, overwrite the saved index
+            return
+
+        for key in self.__modified_keys:
+            entry = self.__index.get(key)
+            saved_entry = index.pop(key, None)
+            if saved_entry is not None:
+                for id_, _ in saved_entry.filesigs:
+                    filename_rep.release_filename(id_)
+                if saved_entry.cachefile is not None and (
+                        entry is None or
+                        entry.cachefile != saved_entry.cachefile):
+                    # The cache file was replaced by this process
+                    self._remove_file(
+                        os.path.join(self.__dir, saved_entry.cachefile))
+            if entry is None:
+                continue
+            filesigs = []
+            for id_, sig in entry.filesigs:
+                name = self.__filename_rep.get_filename(id_)
+                filesigs.append((filename_rep.acquire_filename(name)[0], sig))
+            index[key] = index_entry_t(
+                filesigs, entry.configsig, entry.cachefile, entry.last_hit,
+                entry.size)
+
+        for key in self.__hit_keys - self.__modified_keys:
+            entry = self.__index.get(key)
+            saved_entry = index.get(key)
+            if entry is not None and saved_entry is not None and \
+                    entry.cachefile == saved_entry.cachefile:
+                saved_entry.last_hit = max(
+                    saved_entry.last_hit, entry.last_hit)
+
+        self.__index = index
+        self.__filename_rep = filename_rep
 
     def _read_file(self, filename):
         """
         read a Python object from a cache file.
 
-        Reads a pickled object from disk and returns it.
+        Reads a pickled object (or a declarations tree serialized by
+        :mod:`declarations_serializer`) from disk and returns it.
 
         :param filename: Name of the file that should be read.
         :type filename: str
@@ -296,11 +532,11 @@ class directory_cache_t(declarations_cache.cache_base_t):
             f = gzip.GzipFile(filename, "rb")
         else:
             f = open(filename, "rb")
-        res = pickle.load(f)
+        res = declarations_cache.loads_declarations(f.read())
         f.close()
         return res
 
-    def _write_file(self, filename, data):
+    def _write_file(self, filename, data, compact=False):
         """Write a data item into a file.
 
         The data object is written to a file using the pickle mechanism.
@@ -308,14 +544,23 @@ class directory_cache_t(declarations_cache.cache_base_t):
         :param filename: Output file name
         :type filename: str
         :param data: A Python object that will be pickled
+        :param compact: if `True`, `data` is a declarations tree, written
+                        using the format of :mod:`declarations_serializer`
+        :type compact: bool
         """
 
+        # Write to a temporary file that is renamed, so that the other
+        # processes never read a partially written file.
+        tempfilename = self._create_temp_filename(filename)
         if self.__compression:
-            f = gzip.GzipFile(filename, "wb")
+            f = gzip.GzipFile(tempfilename, "wb")
         else:
-            f = open(filename, "wb")
-        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
-        f.close()
+            f = open(tempfilename, "wb")
+        try:
+            f.write(declarations_cache.dumps_declarations(data, compact))
+        finally:
+            f.close()
+        utils.replace_file(tempfilename, filename)
 
     def _remove_entry(self, source_file, key):
         """Remove an entry from the cache.
@@ -345,13 +590,21 @@ class directory_cache_t(declarations_cache.cache_base_t):
         # Remove the cache entry...
         del self.__index[key]
         self.__modified_flag = True
+        self.__modified_keys.add(key)
 
         # Delete the corresponding cache file...
-        cachefilename = self._create_cache_filename(source_file)
+        if entry.cachefile is not None:
+            self._remove_file(os.path.join(self.__dir, entry.cachefile))
+
+    @staticmethod
+    def _remove_file(filename):
+        """Remove a cache file, which may have been removed already."""
+
         try:
-            os.remove(cachefilename)
+            os.remove(filename)
         except OSError as e:
-            print("Could not remove cache file (%s)" % e)
+            if os.path.exists(filename):
+                print("Could not remove cache file (%s)" % e)
 
     @staticmethod
     def _create_cache_key(source_file):
@@ -363,27 +616,42 @@ class directory_cache_t(declarations_cache.cache_base_t):
         :rtype: str
         """
         path, name = os.path.split(source_file)
-        return name + str(hash(path))
+        # The built-in hash() of a string changes between processes
+        return name + "_" + hashlib.sha1(path.encode("utf-8")).hexdigest()
 
     def _create_cache_filename(self, source_file):
         """
-        return the cache file name for a header file.
+        return a new cache file name for a header file.
 
         :param source_file: Header file name
         :type source_file: str
         :rtype: str
         """
-        res = self._create_cache_key(source_file) + ".cache"
+        # The name is unique, so that a cache file that is being read is
+        # not replaced by another process.
+        res = "%s_%s.cache" % (
+            self._create_cache_key(source_file), uuid.uuid4().hex[:8])
         return os.path.join(self.__dir, res)
 
+    @staticmethod
+    def _create_temp_filename(filename):
+        """
+        return a unique temporary file name, used to write `filename`.
+
+        :param filename: File name
+        :type filename: str
+        :rtype: str
+        """
+        return "%s.%s.tmp" % (filename, uuid.uuid4().hex[:8])
+
     @staticmethod
     def _create_config_signature(config):
         """
         return the signature for a config object.
 
         The signature is computed as sha1 digest of the contents of
-        working_directory, include_paths, define_symbols and
-        undefine_symbols.
+        working_directory, include_paths, define_symbols,
+        undefine_symbols, cflags and location_filter.
 
         :param config: Configuration object
         :type config: :class:`parser.xml_generator_configuration_t`
@@ -399,6 +667,8 @@ class directory_cache_t(declarations_cache.cache_base_t):
             m.update(p.encode("utf-8"))
         for p in config.cflags:
             m.update(p.encode("utf-8"))
+        if config.location_filter is not None:
+            m.update(repr(config.location_filter).encode("utf-8"))
         return m.digest()
 
 
@@ -537,6 +807,27 @@ class filename_repository_t(object):
 
         return filesig != signature
 
+    def get_filename(self, id_):
+        """Return the file name referred to by `id_`.
+        """
+
+        entry = self.__entries.get(id_)
+        if entry is None:
+            raise ValueError("Invalid filename id_ (%d)" % id_)
+        return entry.filename
+
+    def set_ref_counts(self, ref_counts):
+        """Set the reference counts of the file names.
+
+        The file names that are not in `ref_counts` are removed.
+        """
+
+        for id_, entry in list(self.__entries.items()):
+            entry.refcount = ref_counts.get(id_, 0)
+            if entry.refcount == 0:
+                del self.__entries[id_]
+                del self.__id_lut[entry.filename]
+
     def update_id_counter(self):
         """Update the `id_` counter so that it doesn't grow forever.
         """
@@ -552,15 +843,7 @@ class filename_repository_t(object):
 
         if self._sha1_sigs:
             # return sha1 digest of the file content...
-            if not os.path.exists(entry.filename):
-                return None
-            try:
-                with open(entry.filename, "r") as f:
-                    data = f.read()
-                    return hashlib.sha1(data.encode("utf-8")).digest()
-            except IOError as e:
-                print("Cannot determine sha1 digest:", e)
-                return None
+            return declarations_cache.file_signature(entry.filename)
         else:
             # return file modification date...
             try:
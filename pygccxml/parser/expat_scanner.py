@@ -0,0 +1,53 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import xml.parsers.expat
+
+from . import scanner
+
+
+class expat_scanner_t(scanner.scanner_t):
+
+    """
+    Scanner built directly on the expat parser.
+
+    The elements are dispatched by expat to the scanner, without building
+    the element tree of :class:`ietree_scanner_t`: the handlers of the
+    scanner are bound to the parser, and the attributes of an element are
+    passed as the dictionary built by expat.
+
+    There are no per tag handlers: expat calls a single start handler for
+    all the elements, so that a table of handlers by tag would need the
+    same dictionary lookup as the table of readers of the scanner, which
+    is done once per element.
+
+    On Python 2, `returns_unicode` is disabled: the names and attributes
+    are byte strings, UTF-8 encoded when they are not ASCII (ElementTree
+    returns unicode strings for them).
+
+    This scanner is used when the `xml_scanner` configuration option is
+    set to "expat".
+    """
+
+    def __init__(self, xml_file, decl_factory, *args):
+        scanner.scanner_t.__init__(self, xml_file, decl_factory, *args)
+
+    def read(self):
+        parser = xml.parsers.expat.ParserCreate()
+        if hasattr(parser, "returns_unicode"):
+            # Python 2: return byte strings, like ElementTree does for
+            # ascii strings (the other strings are UTF-8 encoded)
+            parser.returns_unicode = False
+        # Text is not used by the scanner: buffer it to avoid many calls
+        parser.buffer_text = True
+        parser.StartElementHandler = self.startElement
+        parser.EndElementHandler = self.endElement
+
+        if hasattr(self.xml_file, "read"):
+            parser.ParseFile(self.xml_file)
+        else:
+            with open(self.xml_file, "rb") as xml_file:
+                parser.ParseFile(xml_file)
+        self.endDocument()
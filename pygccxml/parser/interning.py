@@ -0,0 +1,70 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Interning of the strings of the declarations trees.
+
+A strings table is a dictionary that maps each string to its first
+occurrence. The scanner looks the names, file names, mangled and demangled
+names and attributes up in the table, so that a string which is repeated
+in the xml file (`std::allocator<...>`, the name of a header...) is stored
+once, and its hash is computed once.
+
+:class:`project_reader_t` creates a table for each call of `read_files`, and
+shares it between the files. The declarations loaded from a cache are
+interned with :func:`intern_declarations`, so that they share the strings of
+the declarations read from the xml files.
+"""
+
+from .. import declarations
+
+
+def intern_string(strings, value):
+    """
+    Return the interned copy of a string.
+
+    :param strings: the strings table
+    :type strings: dict
+
+    :param value: the string, or None
+    :type value: str
+
+    """
+
+    if value is None:
+        return None
+    return strings.setdefault(value, value)
+
+
+def intern_declarations(decls, strings):
+    """
+    Replace the strings of a declarations tree by their interned copy.
+
+    :param decls: declarations tree
+    :type decls: list of :class:`declaration_t`
+
+    :param strings: the strings table
+    :type strings: dict
+
+    """
+
+    for decl in declarations.make_flatten(decls):
+        # The private attributes are used: the setter of the name resets
+        # the caches, and the getters of the mangled and demangled names
+        # raise with CastXML.
+        decl._name = intern_string(strings, decl._name)
+        decl._mangled = intern_string(strings, decl._mangled)
+        decl._demangled = intern_string(strings, decl._demangled)
+        decl._attributes = intern_string(strings, decl._attributes)
+        if decl.location is not None:
+            decl.location.file_name = intern_string(
+                strings, decl.location.file_name)
+        if isinstance(decl, declarations.calldef_t):
+            for argument in decl.arguments:
+                argument.name = intern_string(strings, argument.name)
+                argument.default_value = intern_string(
+                    strings, argument.default_value)
+                argument.attributes = intern_string(
+                    strings, argument.attributes)
@@ -12,7 +12,8 @@ class linker_t(
         declarations.type_visitor_t,
         object):
 
-    def __init__(self, decls, types, access, membership, files):
+    def __init__(
+            self, decls, types, access, membership, files, lazy=False):
         declarations.decl_visitor_t.__init__(self)
         declarations.type_visitor_t.__init__(self)
         object.__init__(self)
@@ -24,6 +25,13 @@ class linker_t(
         self.__files = files
         self.__inst = None
 
+        # In lazy mode, the types are only linked when they are used: the
+        # types of the variables, arguments and return values are set to
+        # lazy_type_t placeholders, which call link_type.
+        self.__lazy = lazy
+        # ids of the types already linked in lazy mode
+        self.__linked_types = set()
+
     @property
     def instance(self):
         return self.__inst
@@ -49,7 +57,14 @@ class linker_t(
             # destructor
             return None
         elif type_id in self.__types:
-            return self.__types[type_id]
+            type_ = self.__types[type_id]
+            if self.__lazy and id(type_) not in self.__linked_types:
+                self.__linked_types.add(id(type_))
+                inst = self.__inst
+                self.__inst = type_
+                declarations.apply_visitor(self, type_)
+                self.__inst = inst
+            return type_
         elif type_id in self.__decls:
             base = declarations.declarated_t(declaration=self.__decls[type_id])
             self.__types[type_id] = base
@@ -59,6 +74,21 @@ class linker_t(
         else:
             return declarations.unknown_t()
 
+    def link_type(self, type_id):
+        """
+        Return the linked type of an id of the xml file.
+
+        In lazy mode, the type and the types it uses are linked.
+
+        """
+
+        return self.__link_type(type_id)
+
+    def __lazy_type(self, type_id):
+        if not self.__lazy or type_id is None:
+            return self.__link_type(type_id)
+        return declarations.lazy_type_t(type_id, self.link_type)
+
     def __link_compound_type(self):
         self.__inst.base = self.__link_type(self.__inst.base)
 
@@ -78,14 +108,17 @@ class linker_t(
                 self.__inst.adopt_declaration(decl)
 
     def __link_calldef(self):
-        self.__inst.return_type = self.__link_type(self.__inst.return_type)
         if isinstance(self.__inst, declarations.type_t):
+            self.__inst.return_type = self.__link_type(
+                self.__inst.return_type)
             linked_args = [
                 self.__link_type(arg) for arg in self.__inst.arguments_types]
             self.__inst.arguments_types = linked_args
         else:
+            self.__inst.return_type = self.__lazy_type(
+                self.__inst.return_type)
             for arg in self.__inst.arguments:
-                arg.decl_type = self.__link_type(arg.decl_type)
+                arg.decl_type = self.__lazy_type(arg.decl_type)
             for i, exception in enumerate(self.__inst.exceptions):
                 try:
                     self.__inst.exceptions[i] = self.__decls[exception]
@@ -157,10 +190,12 @@ class linker_t(
         self.__link_members()
 
     def visit_typedef(self):
+        # The typedefs are always linked: their byte size is the one of
+        # their type, and the aliases of the classes are bound right away.
         self.__inst.decl_type = self.__link_type(self.__inst.decl_type)
 
     def visit_variable(self):
-        self.__inst.decl_type = self.__link_type(self.__inst.decl_type)
+        self.__inst.decl_type = self.__lazy_type(self.__inst.decl_type)
 
     def visit_void(self):
         pass
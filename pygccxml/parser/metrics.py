@@ -0,0 +1,272 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import threading
+
+from .. import utils
+
+
+class phase_metrics_t(object):
+
+    """Time spent in a phase of the parsing."""
+
+    def __init__(self, name):
+        object.__init__(self)
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.calls = 0
+
+    def add(self, wall_time, cpu_time, calls=1):
+        self.wall_time += wall_time
+        self.cpu_time += cpu_time
+        self.calls += calls
+
+    def __repr__(self):
+        return "phase_metrics_t(%r, wall_time=%f, cpu_time=%f, calls=%d)" % (
+            self.name, self.wall_time, self.cpu_time, self.calls)
+
+
+class file_metrics_t(object):
+
+    """Time spent on a file, and size of its declarations tree."""
+
+    def __init__(self, file_name):
+        object.__init__(self)
+        self.file_name = file_name
+        # Number of declarations and of types read from the xml file
+        self.declarations = 0
+        self.types = 0
+        # phase name -> phase_metrics_t
+        self.phases = {}
+
+    @property
+    def wall_time(self):
+        return sum(phase.wall_time for phase in self.phases.values())
+
+    @property
+    def cpu_time(self):
+        return sum(phase.cpu_time for phase in self.phases.values())
+
+    def __repr__(self):
+        return (
+            "file_metrics_t(%r, declarations=%d, types=%d, " +
+            "wall_time=%f, cpu_time=%f)") % (
+                self.file_name, self.declarations, self.types,
+                self.wall_time, self.cpu_time)
+
+
+class metrics_t(object):
+
+    """
+    Timings and counters of the parsing.
+
+    An instance is given to :func:`parse`, :class:`project_reader_t` or
+    :class:`source_reader_t`, which fill it: the wall and CPU time spent in
+    each phase, in total (:attr:`phases`) and for each file (:attr:`files`),
+    and the number of declarations and types read from each file.
+
+    The `callback`, if any, is called at the end of each measured phase
+    with the name of the phase, the name of the file (or None for the
+    phases of the whole project), the wall time and the CPU time.
+
+    The CPU time is the one of the python process: the CPU time of the
+    xml generator is not included, and the CPU time of the phases run
+    concurrently (see :meth:`project_reader_t.aread_files`) overlap.
+
+    The metrics can be updated from several threads (like the executor
+    threads of the coroutines); the callback is called by the thread which
+    measured the phase.
+    """
+
+    XML_GENERATION = "xml generation"
+    SCANNING = "scanning"
+    LINKING = "linking"
+    PATCHING = "patching"
+    NAMESPACES_JOINING = "namespaces joining"
+    CLASS_HIERARCHY_JOINING = "class hierarchy joining"
+    RELINKING = "relinking"
+    CACHE_LOAD = "cache load"
+    CACHE_FLUSH = "cache flush"
+
+    PHASES = (
+        XML_GENERATION,
+        SCANNING,
+        LINKING,
+        PATCHING,
+        NAMESPACES_JOINING,
+        CLASS_HIERARCHY_JOINING,
+        RELINKING,
+        CACHE_LOAD,
+        CACHE_FLUSH)
+
+    def __init__(self, callback=None):
+        object.__init__(self)
+        self.callback = callback
+        self.phases = dict(
+            (name, phase_metrics_t(name)) for name in self.PHASES)
+        # file name -> file_metrics_t
+        self.files = {}
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # The metrics of the worker processes are sent back to the parent
+        # process, without their lock
+        state = self.__dict__.copy()
+        del state['_metrics_t__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def measure(self, phase, file_name=None):
+        """
+        Return a context manager that measures a phase.
+
+        :param phase: one of the names of :attr:`PHASES`
+        :type phase: str
+
+        :param file_name: the file being parsed, or None
+        :type file_name: str
+
+        """
+
+        return _measure_t(self, phase, file_name)
+
+    def add(self, phase, wall_time, cpu_time, file_name=None, calls=1):
+        """Record the time spent in a phase."""
+
+        with self.__lock:
+            self.phases[phase].add(wall_time, cpu_time, calls)
+            if file_name is not None:
+                file_metrics = self.__file(file_name)
+                if phase not in file_metrics.phases:
+                    file_metrics.phases[phase] = phase_metrics_t(phase)
+                file_metrics.phases[phase].add(wall_time, cpu_time, calls)
+        if self.callback is not None:
+            self.callback(phase, file_name, wall_time, cpu_time)
+
+    def file(self, file_name):
+        """Return the metrics of a file, created if needed."""
+
+        with self.__lock:
+            return self.__file(file_name)
+
+    def __file(self, file_name):
+        file_metrics = self.files.get(file_name)
+        if file_metrics is None:
+            file_metrics = file_metrics_t(file_name)
+            self.files[file_name] = file_metrics
+        return file_metrics
+
+    def count(self, file_name, declarations_count, types_count):
+        """Record the number of declarations and types of a file."""
+
+        with self.__lock:
+            file_metrics = self.__file(file_name)
+            file_metrics.declarations += declarations_count
+            file_metrics.types += types_count
+
+    def merge(self, other):
+        """
+        Add the metrics of the files measured by another instance, e.g. in
+        a worker process. The callback is called once for each phase of
+        each file.
+
+        """
+
+        for file_metrics in other.files.values():
+            for phase in file_metrics.phases.values():
+                self.add(
+                    phase.name,
+                    phase.wall_time,
+                    phase.cpu_time,
+                    file_metrics.file_name,
+                    phase.calls)
+            self.count(
+                file_metrics.file_name,
+                file_metrics.declarations,
+                file_metrics.types)
+
+    def report(self, files_count=10):
+        """
+        Return a text report: the time spent in each phase, and the files
+        that took the longest time.
+
+        """
+
+        with self.__lock:
+            lines = [
+                "%-24s %10s %10s %8s" % ("phase", "wall", "cpu", "calls")]
+            for name in self.PHASES:
+                phase = self.phases[name]
+                lines.append("%-24s %10.3f %10.3f %8d" % (
+                    name, phase.wall_time, phase.cpu_time, phase.calls))
+            files = sorted(
+                self.files.values(),
+                key=lambda file_metrics: file_metrics.wall_time,
+                reverse=True)
+        if files:
+            lines.append("")
+            lines.append("%10s %10s %8s %8s  %s" % (
+                "wall", "cpu", "decls", "types", "file"))
+        for file_metrics in files[:files_count]:
+            lines.append("%10.3f %10.3f %8d %8d  %s" % (
+                file_metrics.wall_time, file_metrics.cpu_time,
+                file_metrics.declarations, file_metrics.types,
+                file_metrics.file_name))
+        return os.linesep.join(lines)
+
+
+def measure(metrics, phase, file_name=None):
+    """
+    Return a context manager that measures a phase, or does nothing if
+    `metrics` is None.
+
+    """
+
+    if metrics is None:
+        return _no_measure
+    return metrics.measure(phase, file_name)
+
+
+class _measure_t(object):
+
+    """Implementation detail: measure a phase in a `with` statement."""
+
+    def __init__(self, metrics, phase, file_name):
+        object.__init__(self)
+        self.__metrics = metrics
+        self.__phase = phase
+        self.__file_name = file_name
+        self.__wall_time = None
+        self.__cpu_time = None
+
+    def __enter__(self):
+        self.__wall_time = utils.wall_time()
+        self.__cpu_time = utils.cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__metrics.add(
+            self.__phase,
+            utils.wall_time() - self.__wall_time,
+            utils.cpu_time() - self.__cpu_time,
+            self.__file_name)
+        return False
+
+
+class _no_measure_t(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_no_measure = _no_measure_t()
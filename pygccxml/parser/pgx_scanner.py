@@ -0,0 +1,227 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Binary format of the xml files generated by GCC-XML or CastXML.
+
+A .pgx file holds the elements of an xml file in a compact form, which is
+read without tokenizing the xml text again. It is created once from an xml
+file with :func:`create_pgx_file`, and can then be used wherever an xml
+file is expected (`read_xml_file`, `CONTENT_TYPE.GCCXML_GENERATED_FILE`).
+
+All the integers are 32 bits unsigned little endian values. The file is
+made of:
+
+* the header: the magic string, the size of the strings table (without
+  its padding), and the number of items of the three columns,
+* the strings table: the distinct tags, attribute names and attribute
+  values, separated by null characters (which can not appear in an xml
+  document), padded to a multiple of 4 bytes,
+* the events column: one item per start or end of an element, the index of
+  the tag in the strings table shifted left by one, or'ed with 1 for the
+  end of an element,
+* the counts column: the number of attributes of each element,
+* the attributes column: the index of the name and of the value of each
+  attribute.
+"""
+
+import array
+import itertools
+import mmap
+import struct
+import sys
+import xml.parsers.expat
+
+from . import scanner
+from .. import utils
+
+PGX_MAGIC = b"PGX1"
+
+# magic, strings size, number of events, of elements and of attributes
+# indexes
+_header = struct.Struct("<4sIIII")
+
+if array.array("I").itemsize == 4:
+    _uint32 = "I"
+else:
+    _uint32 = "L"
+
+
+def is_pgx_file(file_name):
+    """
+    Return True if a file is a .pgx file.
+
+    :param file_name: path to the file
+    :type file_name: str
+
+    :rtype: bool
+
+    """
+
+    if not utils.is_str(file_name):
+        return False
+    try:
+        with open(file_name, "rb") as pgx_file:
+            return pgx_file.read(len(PGX_MAGIC)) == PGX_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def create_pgx_file(xml_file, pgx_file=None):
+    """
+    Convert an xml file generated by GCC-XML or CastXML to a .pgx file.
+
+    :param xml_file: path to the xml file, or file-like object
+    :type xml_file: str
+
+    :param pgx_file: path to the .pgx file. If None, the extension of the
+                     xml file is replaced by ".pgx".
+    :type pgx_file: str
+
+    :rtype: path to the .pgx file
+
+    """
+
+    if pgx_file is None:
+        if not utils.is_str(xml_file):
+            raise RuntimeError(
+                "The name of the .pgx file is needed to convert a stream")
+        if xml_file.endswith(".xml"):
+            pgx_file = xml_file[:-len(".xml")] + ".pgx"
+        else:
+            pgx_file = xml_file + ".pgx"
+
+    strings = {}
+    events = array.array(_uint32)
+    counts = array.array(_uint32)
+    attributes = array.array(_uint32)
+
+    def start_element(name, attrs):
+        events.append(strings.setdefault(name, len(strings)) << 1)
+        counts.append(len(attrs) // 2)
+        attributes.extend(
+            [strings.setdefault(value, len(strings)) for value in attrs])
+
+    def end_element(name):
+        events.append((strings.setdefault(name, len(strings)) << 1) | 1)
+
+    parser = xml.parsers.expat.ParserCreate()
+    if hasattr(parser, "returns_unicode"):
+        parser.returns_unicode = False
+    parser.buffer_text = True
+    # The attributes are given as a list of names and values
+    parser.ordered_attributes = True
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    if hasattr(xml_file, "read"):
+        parser.ParseFile(xml_file)
+    else:
+        with open(xml_file, "rb") as xml_stream:
+            parser.ParseFile(xml_stream)
+
+    table = [None] * len(strings)
+    for value, index in strings.items():
+        if not isinstance(value, bytes):
+            value = value.encode("utf-8")
+        table[index] = value
+    table = b"\0".join(table)
+
+    if sys.byteorder == "big":
+        for column in (events, counts, attributes):
+            column.byteswap()
+
+    with open(pgx_file, "wb") as pgx_stream:
+        pgx_stream.write(_header.pack(
+            PGX_MAGIC, len(table), len(events), len(counts),
+            len(attributes)))
+        pgx_stream.write(table + b"\0" * _padding(len(table)))
+        for column in (events, counts, attributes):
+            pgx_stream.write(_to_bytes(column))
+    return pgx_file
+
+
+def _padding(size):
+    return -size % 4
+
+
+def _to_bytes(column):
+    if hasattr(column, "tobytes"):
+        return column.tobytes()
+    return column.tostring()
+
+
+def _column(data, start, count):
+    """Implementation detail: read a column of a memory-mapped file."""
+
+    column = array.array(_uint32)
+    end = start + count * column.itemsize
+    if hasattr(column, "frombytes"):
+        column.frombytes(data[start:end])
+    else:
+        column.fromstring(data[start:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+class pgx_scanner_t(scanner.scanner_t):
+
+    """
+    Scanner of the .pgx files created by :func:`create_pgx_file`.
+
+    The file is memory-mapped, and its elements are dispatched to the
+    scanner like the ones of an xml file. The strings of a file are decoded
+    once: the elements that have the same attribute values share them.
+
+    This scanner is used by :class:`source_reader_t` when the file given
+    as an xml file is a .pgx file.
+    """
+
+    def __init__(self, xml_file, decl_factory, *args):
+        scanner.scanner_t.__init__(self, xml_file, decl_factory, *args)
+
+    def read(self):
+        with open(self.xml_file, "rb") as pgx_file:
+            data = mmap.mmap(pgx_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            strings, events, counts, attributes = self.__read_columns(data)
+        finally:
+            data.close()
+
+        start_element = self.startElement
+        end_element = self.endElement
+        counts = iter(counts)
+        values = iter([strings[index] for index in attributes])
+        for event in events:
+            if event & 1:
+                end_element(strings[event >> 1])
+                continue
+            # zip takes the names and the values alternately
+            pairs = itertools.islice(values, 2 * next(counts))
+            start_element(strings[event >> 1], dict(zip(pairs, pairs)))
+        self.endDocument()
+
+    def __read_columns(self, data):
+        if len(data) < _header.size:
+            raise RuntimeError("'%s' is not a .pgx file" % self.xml_file)
+        magic, strings_size, events_count, counts_count, attributes_count = \
+            _header.unpack(data[:_header.size])
+        if magic != PGX_MAGIC:
+            raise RuntimeError("'%s' is not a .pgx file" % self.xml_file)
+
+        start = _header.size
+        size = start + strings_size + _padding(strings_size) + 4 * (
+            events_count + counts_count + attributes_count)
+        if size != len(data):
+            raise RuntimeError("'%s' is truncated" % self.xml_file)
+
+        strings = data[start:start + strings_size].split(b"\0")
+        if sys.version_info[0] > 2:
+            strings = [value.decode("utf-8") for value in strings]
+        start += strings_size + _padding(strings_size)
+        events, start = _column(data, start, events_count)
+        counts, start = _column(data, start, counts_count)
+        attributes, start = _column(data, start, attributes_count)
+        return strings, events, counts, attributes
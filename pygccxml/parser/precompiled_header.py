@@ -0,0 +1,194 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Precompiled prefix header.
+
+The `prefix_header` configuration option names a header that is included
+before each parsed file. When the `pch_compiler_path` option is also set,
+CastXML does not parse the prefix header again for each file: the header
+is compiled once into a Clang precompiled header, which CastXML loads with
+`-include-pch`.
+
+CastXML can not create precompiled headers itself. They are created by the
+`pch_compiler_path` clang, which must have the version of the clang
+CastXML is built with (see `castxml --version`). When CastXML can not load
+a precompiled header, the prefix header is included as a regular header.
+
+The precompiled headers are stored in the directory of the declarations
+cache (in a temporary directory if the cache has none), and are named after
+the signature of the configuration. They are compiled again when the
+prefix header, or one of the files it includes, is modified.
+"""
+
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from . import declarations_cache
+from .. import utils
+
+# (directory, key) -> the precompiled header, or None if CastXML can not
+# load it
+_precompiled_headers = {}
+
+# Directory of the precompiled headers when the cache has none
+_temp_directory = []
+
+
+def precompiled_header_key(config):
+    """
+    Return the key of the precompiled header of a configuration.
+
+    :param config: the configuration
+    :type config: :class:`xml_generator_configuration_t`
+
+    :rtype: str
+    """
+
+    sig = hashlib.sha1()
+    sig.update(declarations_cache.configuration_signature(config).encode())
+    sig.update(str(config.compiler_path).encode('utf-8'))
+    sig.update(str(config.pch_compiler_path).encode('utf-8'))
+    return sig.hexdigest()
+
+
+def include_flags(config, directory, check):
+    """
+    Return the xml generator flags that include the prefix header.
+
+    :param config: the configuration, its `prefix_header` is set
+    :type config: :class:`xml_generator_configuration_t`
+
+    :param directory: directory of the precompiled headers, or None
+    :type directory: str
+
+    :param check: function called with the flags loading a new precompiled
+                  header, which returns the errors of the xml generator, or
+                  None if it can load it
+
+    :rtype: str
+    """
+
+    include = '-include "%s"' % config.prefix_header
+    if config.xml_generator != "castxml" or not config.pch_compiler_path:
+        return include
+
+    if directory is None:
+        directory = _temporary_directory()
+    key = (directory, precompiled_header_key(config))
+    pch_file = os.path.join(directory, key[1] + ".pch")
+    if key in _precompiled_headers and _precompiled_headers[key] is None:
+        return include
+
+    if not _is_up_to_date(pch_file):
+        _precompiled_headers.pop(key, None)
+        errors = _compile(config, pch_file)
+        if errors is not None:
+            utils.loggers.cxx_parser.warning(
+                "The prefix header '%s' could not be precompiled:\n%s",
+                config.prefix_header, errors)
+            _precompiled_headers[key] = None
+            return include
+
+    flags = '-include-pch "%s"' % pch_file
+    if key not in _precompiled_headers:
+        errors = check(flags)
+        if errors is not None:
+            utils.loggers.cxx_parser.warning(
+                "The precompiled header '%s' can not be loaded by " +
+                "CastXML:\n%s", pch_file, errors)
+            _precompiled_headers[key] = None
+            return include
+        _precompiled_headers[key] = pch_file
+    return flags
+
+
+def _temporary_directory():
+    if not _temp_directory:
+        directory = tempfile.mkdtemp(prefix="pygccxml_pch")
+        atexit.register(shutil.rmtree, directory, True)
+        _temp_directory.append(directory)
+    return _temp_directory[0]
+
+
+def _is_up_to_date(pch_file):
+    """
+    Return True if the precompiled header exists, and none of the files it
+    depends on has been modified since it was compiled.
+
+    """
+
+    try:
+        pch_time = os.path.getmtime(pch_file)
+        dependencies = _read_dependencies(pch_file + ".d")
+    except (IOError, OSError):
+        return False
+    for file_name in dependencies:
+        if not os.path.exists(file_name) or \
+                os.path.getmtime(file_name) > pch_time:
+            return False
+    return True
+
+
+def _read_dependencies(dependencies_file):
+    """Return the files listed in a dependencies file written by clang."""
+
+    with open(dependencies_file, "r") as dependencies:
+        content = dependencies.read().replace("\\\n", " ")
+    # "target: dependency dependency\ with\ spaces ..."
+    content = re.split(r":\s", content, 1)[1]
+    return [
+        file_name.replace("\\ ", " ")
+        for file_name in re.findall(r"(?:\\ |\S)+", content)]
+
+
+def _compile(config, pch_file):
+    """
+    Compile the prefix header, and return the errors of the compiler, or
+    None if it succeeded.
+
+    """
+
+    suffix = ".%d.tmp" % os.getpid()
+    temp_pch_file = pch_file + suffix
+    temp_dependencies_file = pch_file + ".d" + suffix
+
+    cmd = ['"%s"' % config.pch_compiler_path, "-x c++-header"]
+    if config.cflags != "":
+        cmd.append(config.cflags)
+    for search_dir in [config.working_directory] + config.include_paths:
+        cmd.append('-I"%s"' % search_dir)
+    for symbol in config.define_symbols:
+        cmd.append('-D"%s"' % symbol)
+    for symbol in config.undefine_symbols:
+        cmd.append('-U"%s"' % symbol)
+    cmd.append('-MD -MF "%s"' % temp_dependencies_file)
+    cmd.append('-o "%s"' % temp_pch_file)
+    cmd.append('"%s"' % config.prefix_header)
+    command_line = ' '.join(cmd)
+    utils.loggers.cxx_parser.debug('pch cmd: %s', command_line)
+
+    process = subprocess.Popen(
+        args=command_line,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT)
+    output = process.communicate()[0].decode("utf-8", "replace")
+    if process.returncode != 0:
+        for file_name in (temp_pch_file, temp_dependencies_file):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        return output or "exit status %d" % process.returncode
+
+    # The dependencies are replaced first, so that a new precompiled header
+    # is never checked against the dependencies of an older one
+    utils.replace_file(temp_dependencies_file, pch_file + ".d")
+    utils.replace_file(temp_pch_file, pch_file)
+    return None
@@ -0,0 +1,592 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Incremental reading of the files of a project.
+
+A :class:`project_t` reads its files one by one, like the FILE_BY_FILE
+compilation mode of :class:`project_reader_t`, and joins their
+declarations. It remembers which files declare each declaration of the
+joined tree, and the files each project file depends on: after a header
+has been modified, :meth:`project_t.refresh` only parses again the
+project files which depend on it, and patches the joined tree in place.
+"""
+
+import collections
+import os
+
+from . import declarations_cache
+from . import metrics
+from . import project_reader
+from . import source_reader
+from .declarations_joiner import _join_key
+from .metrics import metrics_t
+from .. import declarations
+from .. import utils
+
+
+class project_t(object):
+
+    """
+    Joined declarations of a set of files, which can be refreshed when the
+    files are modified.
+
+    :meth:`refresh` parses again the files whose dependencies (the source
+    file, and the files of its declarations) have been modified since they
+    were read. The declarations which are only declared by these files are
+    removed from the tree, and the declarations of the new trees which are
+    not in the tree yet are added at the end of their namespace. The other
+    declarations of the tree are kept: their objects stay valid. The base
+    and derived classes, the types which refer to the replaced classes, the
+    aliases of the classes and the query optimizer of the namespaces are
+    patched.
+
+    The files are joined like :class:`project_reader_t` joins them, so the
+    tree of a refreshed project has the same declarations as the tree of
+    the files parsed again from scratch, in a different order.
+    """
+
+    def __init__(
+            self, files, config, cache=None, decl_factory=None, metrics=None):
+        """
+        :param files: the files of the project
+        :type files: list of str or :class:`file_configuration_t`
+
+        :param config: the configuration
+        :type config: :class:`xml_generator_configuration_t`
+
+        :param cache: declaration cache, by default a cache functionality
+                      will not be used
+        :type cache: :class:`cache_base_t` instance or `str`
+
+        :param decl_factory: declaration factory
+        :type decl_factory: :class:`decl_factory_t`
+
+        :param metrics: timings and counters filled while the files are
+                        parsed, if given
+        :type metrics: :class:`metrics_t`
+        """
+
+        object.__init__(self)
+        self.logger = utils.loggers.cxx_parser
+        self.__files = list(files)
+        self.__config = config
+        self.__metrics = metrics
+        if utils.is_str(cache):
+            with self.__measure(metrics_t.CACHE_LOAD):
+                cache = declarations_cache.file_cache_t(cache)
+        elif cache is None:
+            cache = declarations_cache.dummy_cache_t()
+        cache = declarations_cache.checked_cache(cache, config)
+        self.__cache = cache
+        if not decl_factory:
+            decl_factory = declarations.decl_factory_t()
+        self.__decl_factory = decl_factory
+        self.__reader = project_reader.project_reader_t(
+            config, cache, decl_factory, metrics)
+        # The strings of the declarations are shared by all the files
+        self.__strings = {}
+        self.__declarations = []
+        self.__scope = _scope_t(None, self.__declarations)
+        # file index -> _source_t, or None before the file is read
+        self.__sources = [None] * len(self.__files)
+        # The classes of the tree
+        self.__classes = project_reader._class_index_t()
+        # id(class or class declaration) -> id(declarated type) ->
+        # [declarated type, number of uses by the declarations of the tree]
+        self.__references = {}
+        self.__read(list(range(len(self.__files))))
+
+    @property
+    def files(self):
+        """The files of the project."""
+        return self.__files[:]
+
+    @property
+    def declarations(self):
+        """
+        The joined declarations of the files, as returned by
+        :meth:`project_reader_t.read_files`.
+
+        The list is updated in place by :meth:`refresh`.
+        """
+        return self.__declarations
+
+    def dependencies(self, prj_file):
+        """
+        Return the files a project file depends on, when it was read.
+
+        :param prj_file: one of the files of the project
+        :type prj_file: str or :class:`file_configuration_t`
+
+        :rtype: list of str
+        """
+
+        return sorted(
+            self.__sources[self.__files.index(prj_file)].signatures)
+
+    def changed_files(self):
+        """
+        Return the files of the project whose dependencies have been
+        modified since they were read.
+
+        :rtype: list of str or :class:`file_configuration_t`
+        """
+
+        return [self.__files[index] for index in self.__changed_indexes()]
+
+    def refresh(self, files=None):
+        """
+        Parse again the modified files, and patch the declarations tree.
+
+        If a file can not be parsed, the error is raised and the tree is
+        left as it was.
+
+        :param files: the files to parse again, by default the files
+                      returned by :meth:`changed_files`
+        :type files: list of str or :class:`file_configuration_t`
+
+        :rtype: the files parsed again
+        """
+
+        return self.update(files).files
+
+    def update(self, files=None):
+        """
+        Refresh the project like :meth:`refresh`, and return the
+        declarations which have been added, removed and changed.
+
+        :rtype: :class:`update_t`
+        """
+
+        if files is None:
+            indexes = self.__changed_indexes()
+        else:
+            indexes = [
+                index for index, prj_file in enumerate(self.__files)
+                if prj_file in files]
+        return self.__read(indexes)
+
+    def __changed_indexes(self):
+        signatures = {}
+        indexes = []
+        for index, source in enumerate(self.__sources):
+            for file_name, signature in source.signatures.items():
+                if file_name not in signatures:
+                    signatures[file_name] = \
+                        declarations_cache.file_signature(file_name)
+                if signatures[file_name] != signature:
+                    indexes.append(index)
+                    break
+        return indexes
+
+    def __measure(self, phase):
+        return metrics.measure(self.__metrics, phase)
+
+    def __read(self, indexes):
+        update = update_t([self.__files[index] for index in indexes])
+        if not indexes:
+            return update
+        # The files are parsed first: the tree is not modified if one of
+        # them can not be parsed
+        trees = [self.__read_file(index) for index in indexes]
+        with self.__measure(metrics_t.CACHE_FLUSH):
+            self.__cache.flush()
+
+        # id(scope) -> _scope_t whose declarations have to be updated
+        touched = collections.OrderedDict()
+        inserted = []
+        with self.__measure(metrics_t.NAMESPACES_JOINING):
+            removed = []
+            for index in indexes:
+                if self.__sources[index] is not None:
+                    removed.extend(self.__remove_source(index, touched))
+            for index, (decls, signatures) in zip(indexes, trees):
+                self.__sources[index] = _source_t(signatures)
+                self.__splice(self.__scope, decls, index, inserted, touched)
+            # The new namespaces are complete before they are added to the
+            # query optimizer of their parent
+            for scope in reversed(list(touched.values())):
+                scope.update_declarations()
+        self.logger.debug(
+            "Project refreshed: %d declarations removed, %d inserted",
+            len(removed), len(inserted))
+
+        with self.__measure(metrics_t.CLASS_HIERARCHY_JOINING):
+            stale_types = self.__forget(removed)
+            classes = [
+                decl for decl in declarations.make_flatten(
+                    [entry.decl for entry in inserted])
+                if isinstance(decl, declarations.class_t)]
+            for class_ in classes:
+                self.__classes.add(class_)
+            self.__reader._merge_class_hierarchy(classes, self.__classes)
+
+        with self.__measure(metrics_t.RELINKING):
+            for entry in inserted:
+                entry.types = self.__reader._declarated_types([entry.decl])
+            self.__reader._relink_declarated_types(
+                self.__classes,
+                [item[0] for item in stale_types] +
+                [type_ for entry in inserted for type_ in entry.types])
+            for type_, count in stale_types:
+                self.__reference(type_, count)
+            for entry in inserted:
+                for type_ in entry.types:
+                    self.__reference(type_)
+            for decl in declarations.make_flatten(
+                    [entry.decl for entry in inserted]):
+                if isinstance(decl, declarations.typedef_t):
+                    _bind_alias(decl)
+
+        # The declarations parsed again have the key of a removed one
+        replaced = collections.OrderedDict(
+            ((_scope_path(entry.scope), entry.key), entry.decl)
+            for entry in removed)
+        for entry in inserted:
+            old_decl = replaced.pop(
+                (_scope_path(entry.scope), entry.key), None)
+            if old_decl is None:
+                update.added.append(entry.decl)
+            elif _declaration_signature(old_decl) != \
+                    _declaration_signature(entry.decl):
+                update.changed.append((old_decl, entry.decl))
+        update.removed.extend(replaced.values())
+        return update
+
+    def __read_file(self, index):
+        """
+        Parse a file of the project, and return its declarations and the
+        signatures of its dependencies.
+
+        """
+
+        config, file_config = project_reader._file_configuration(
+            self.__config, self.__files[index])
+        reader = source_reader.source_reader_t(
+            config,
+            self.__cache,
+            self.__decl_factory,
+            self.__strings,
+            self.__metrics)
+        decls = project_reader._read_file_configuration(
+            reader, file_config, self.logger)
+
+        file_names = set(_source_files(config, file_config))
+        for decl in declarations.make_flatten(decls):
+            if decl.location is not None:
+                file_names.add(decl.location.file_name)
+        signatures = dict(
+            (file_name, declarations_cache.file_signature(file_name))
+            for file_name in file_names)
+        return decls, signatures
+
+    def __splice(self, scope, decls, index, inserted, touched):
+        """
+        Add the declarations of a file to a scope of the tree, unless they
+        are already there, and record that the file declares them.
+
+        """
+
+        source = self.__sources[index]
+        for decl in decls:
+            key = _entry_key(decl)
+            entry = scope.entries.get(key)
+            if entry is None:
+                entry = _entry_t(decl, scope, key)
+                scope.entries[key] = entry
+                touched[id(scope)] = scope
+                if scope.namespace is not None:
+                    decl.parent = scope.namespace
+                    decl.cache.reset()
+                if isinstance(decl, declarations.namespace_t):
+                    entry.children = _scope_t(decl)
+                    touched[id(entry.children)] = entry.children
+                else:
+                    inserted.append(entry)
+            if index not in entry.owners:
+                entry.owners.add(index)
+                source.entries.append(entry)
+            if entry.children is not None:
+                self.__splice(
+                    entry.children, decl.declarations, index, inserted,
+                    touched)
+
+    def __remove_source(self, index, touched):
+        """
+        Remove the declarations which are only declared by a file from the
+        tree, and return their entries.
+
+        """
+
+        source = self.__sources[index]
+        self.__sources[index] = None
+        removed = []
+        for entry in source.entries:
+            entry.owners.discard(index)
+            if entry.owners:
+                continue
+            del entry.scope.entries[entry.key]
+            touched[id(entry.scope)] = entry.scope
+            if entry.children is None:
+                removed.append(entry)
+        return removed
+
+    def __forget(self, removed):
+        """
+        Remove the removed declarations from the class hierarchy, the
+        aliases and the references, and return the types which refer to
+        them, with their number of uses.
+
+        """
+
+        decls = declarations.make_flatten([entry.decl for entry in removed])
+        removed_keys = set()
+        removed_classes = []
+        for decl in decls:
+            if isinstance(decl, declarations.class_t):
+                if self.__classes.remove(decl):
+                    removed_keys.add(self.__reader._create_key(decl))
+                    removed_classes.append(decl)
+            elif isinstance(decl, declarations.typedef_t):
+                _unbind_alias(decl)
+        for entry in removed:
+            for type_ in entry.types:
+                self.__unreference(type_)
+
+        def is_kept(info):
+            return self.__reader._create_key(
+                info.related_class) not in removed_keys
+
+        for class_ in removed_classes:
+            for info in class_.bases + class_.derived:
+                related = self.__classes.get(info.related_class)
+                if related is not None:
+                    related.bases = list(filter(is_kept, related.bases))
+                    related.derived = list(filter(is_kept, related.derived))
+
+        stale_types = []
+        for decl in decls:
+            references = self.__references.pop(id(decl), None)
+            if references:
+                stale_types.extend(references.values())
+        return stale_types
+
+    def __reference(self, type_, count=1):
+        target = type_.declaration
+        if not isinstance(target, (
+                declarations.class_t, declarations.class_declaration_t)):
+            return
+        references = self.__references.setdefault(id(target), {})
+        item = references.get(id(type_))
+        if item is None:
+            references[id(type_)] = [type_, count]
+        else:
+            item[1] += count
+
+    def __unreference(self, type_):
+        references = self.__references.get(id(type_.declaration))
+        if not references or id(type_) not in references:
+            return
+        item = references[id(type_)]
+        item[1] -= 1
+        if not item[1]:
+            del references[id(type_)]
+            if not references:
+                del self.__references[id(type_.declaration)]
+
+
+class update_t(object):
+
+    """
+    Declarations modified by a :meth:`project_t.update`.
+
+    Only the declarations of the namespaces are listed: the members of an
+    added, removed or changed class are not.
+    """
+
+    def __init__(self, files):
+        object.__init__(self)
+        # The files parsed again
+        self.files = files
+        # The new declarations
+        self.added = []
+        # The declarations which are not declared anymore
+        self.removed = []
+        # The (old, new) declarations which have been parsed again and
+        # replaced, and whose signature, members or location changed
+        self.changed = []
+
+    def __repr__(self):
+        return "update_t(files=%d, added=%d, removed=%d, changed=%d)" % (
+            len(self.files), len(self.added), len(self.removed),
+            len(self.changed))
+
+
+class _source_t(object):
+
+    """Implementation detail: what is known about a file of the project."""
+
+    def __init__(self, signatures):
+        object.__init__(self)
+        # file name -> signature of the file when it was read
+        self.signatures = signatures
+        # _entry_t of the declarations declared by the file
+        self.entries = []
+
+
+class _scope_t(object):
+
+    """Implementation detail: the declarations of a namespace, by key."""
+
+    def __init__(self, namespace, decls=None):
+        object.__init__(self)
+        # the namespace, or None for the top level declarations
+        self.namespace = namespace
+        # the top level declarations
+        self.decls = decls
+        # _entry_key(declaration) -> _entry_t, in the order of the tree
+        self.entries = collections.OrderedDict()
+
+    def update_declarations(self):
+        """
+        Set the declarations of the namespace, without the class
+        declarations of its classes.
+
+        """
+
+        class_names = set()
+        for entry in self.entries.values():
+            if isinstance(entry.decl, declarations.class_t) and \
+                    entry.decl.name:
+                class_names.add(_class_name(entry.decl))
+        decls = [
+            entry.decl for entry in self.entries.values()
+            if not isinstance(entry.decl, declarations.class_declaration_t) or
+            not _class_name(entry.decl) or
+            _class_name(entry.decl) not in class_names]
+        if self.namespace is None:
+            self.decls[:] = decls
+        else:
+            self.namespace.declarations = decls
+
+
+class _entry_t(object):
+
+    """
+    Implementation detail: a declaration of the tree, and the files which
+    declare it.
+
+    """
+
+    def __init__(self, decl, scope, key):
+        object.__init__(self)
+        self.decl = decl
+        self.scope = scope
+        self.key = key
+        # indexes of the files declaring the declaration
+        self.owners = set()
+        # declarated types used by the declaration
+        self.types = []
+        # _scope_t of a namespace
+        self.children = None
+
+
+def _entry_key(decl):
+    """
+    Return the key of a declaration in its scope: the declarations with
+    the same key are joined.
+
+    """
+
+    if isinstance(decl, declarations.namespace_t):
+        return declarations.namespace_t, decl.name
+    if isinstance(decl, declarations.calldef_t) or (
+            # unnamed enums and classes
+            not decl.name and isinstance(
+                decl, (declarations.enumeration_t, declarations.class_t))):
+        return decl.__class__, decl.name, _join_key(decl)
+    return decl.__class__, decl.name
+
+
+def _scope_path(scope):
+    if scope.namespace is None:
+        return ()
+    return tuple(declarations.declaration_path(scope.namespace))
+
+
+def _declaration_signature(decl):
+    """
+    Return a signature of a declaration and of its members, which tells
+    whether a declaration parsed again has changed.
+
+    """
+
+    items = []
+    for member in declarations.make_flatten(decl):
+        item = [member.__class__.__name__, str(member)]
+        if member.location is not None:
+            item.append(member.location.as_tuple())
+        if isinstance(member, (
+                declarations.typedef_t, declarations.variable_t)):
+            item.append(member.decl_type.decl_string)
+        elif isinstance(member, declarations.enumeration_t):
+            item.append(tuple(member.values))
+        elif isinstance(member, declarations.class_t):
+            item.append(tuple(
+                (info.related_class.decl_string, info.access)
+                for info in member.bases))
+        items.append(tuple(item))
+    return sorted(items)
+
+
+def _class_name(decl):
+    if "GCC" in utils.xml_generator:
+        return decl.mangled
+    return decl.name
+
+
+def _source_files(config, file_config):
+    """Return the files read to parse a project file."""
+
+    content_types = project_reader.file_configuration_t.CONTENT_TYPE
+    if file_config.content_type == content_types.TEXT:
+        return []
+    file_names = [file_config.data]
+    if file_config.content_type == content_types.CACHED_SOURCE_FILE:
+        file_names.append(file_config.cached_source_file)
+    search_directories = [config.working_directory] + config.include_paths
+    for index, file_name in enumerate(file_names):
+        if os.path.isfile(file_name):
+            continue
+        for directory in search_directories:
+            file_path = os.path.join(directory, file_name)
+            if os.path.isfile(file_path):
+                file_names[index] = file_path
+                break
+    return file_names
+
+
+def _alias_class(typedef):
+    type_ = declarations.remove_alias(typedef.decl_type)
+    if not isinstance(type_, declarations.declarated_t):
+        return None
+    if not isinstance(type_.declaration, declarations.class_types):
+        return None
+    return type_.declaration
+
+
+def _bind_alias(typedef):
+    class_ = _alias_class(typedef)
+    if class_ is not None and \
+            not any(alias is typedef for alias in class_.aliases):
+        class_.aliases.append(typedef)
+
+
+def _unbind_alias(typedef):
+    class_ = _alias_class(typedef)
+    if class_ is not None:
+        class_.aliases = [
+            alias for alias in class_.aliases if alias is not typedef]
@@ -4,19 +4,33 @@
 # See http://www.boost.org/LICENSE_1_0.txt
 
 import os
-import time
+import atexit
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
 
 import pygccxml.declarations
 
 from . import source_reader
 from . import declarations_cache
 from . import declarations_joiner
+from . import interning
+from . import type_table
+from . import metrics
+from .metrics import metrics_t
 from .. import utils
 
 
 class COMPILATION_MODE(object):
     ALL_AT_ONCE = 'all at once'
     FILE_BY_FILE = 'file by file'
+    PARALLEL_FILE_BY_FILE = 'parallel file by file'
+    BATCHED = 'batched'
+
+
+# Directory of the batch files, when the declarations cache has none
+_temp_directory = []
 
 
 class file_configuration_t(object):
@@ -170,7 +184,7 @@ class project_reader_t(object):
 
     """parses header files and returns the contained declarations"""
 
-    def __init__(self, config, cache=None, decl_factory=None):
+    def __init__(self, config, cache=None, decl_factory=None, metrics=None):
         """
         :param config: GCCXML configuration
         :type config: :class:xml_generator_configuration_t
@@ -181,16 +195,23 @@ class project_reader_t(object):
 
         :param decl_factory: declaration factory
         :type decl_factory: :class:`decl_factory_t`
+
+        :param metrics: timings and counters filled while the files are
+                        parsed, if given
+        :type metrics: :class:`metrics_t`
         """
 
         self.__config = config
+        self.__metrics = metrics
         self.__dcache = None
         if isinstance(cache, declarations_cache.cache_base_t):
             self.__dcache = cache
         elif utils.is_str(cache):
-            self.__dcache = declarations_cache.file_cache_t(cache)
+            with self.__measure(metrics_t.CACHE_LOAD):
+                self.__dcache = declarations_cache.file_cache_t(cache)
         else:
             self.__dcache = declarations_cache.dummy_cache_t()
+        self.__dcache = declarations_cache.checked_cache(self.__dcache, config)
         self.__decl_factory = decl_factory
         if not decl_factory:
             self.__decl_factory = pygccxml.declarations.decl_factory_t()
@@ -224,7 +245,9 @@ class project_reader_t(object):
     def read_files(
             self,
             files,
-            compilation_mode=COMPILATION_MODE.FILE_BY_FILE):
+            compilation_mode=COMPILATION_MODE.FILE_BY_FILE,
+            jobs=None,
+            batch_size=None):
         """
         parses a set of files
 
@@ -235,92 +258,325 @@ class project_reader_t(object):
         :param compilation_mode: determines whether the files are parsed
                                  individually or as one single chunk
         :type compilation_mode: :class:`COMPILATION_MODE`
+
+        :param jobs: number of worker processes used by the
+                     PARALLEL_FILE_BY_FILE and BATCHED modes, by default the
+                     number of CPUs of the machine
+        :type jobs: int
+
+        :param batch_size: number of files compiled together in the BATCHED
+                           mode. By default, the files are split in `jobs`
+                           batches of similar size.
+        :type batch_size: int
+
         :rtype: [:class:`declaration_t`]
         """
 
-        if compilation_mode == COMPILATION_MODE.ALL_AT_ONCE \
-           and len(files) == len(self.get_os_file_names(files)):
+        all_files = len(files) == len(self.get_os_file_names(files))
+        if compilation_mode == COMPILATION_MODE.ALL_AT_ONCE and all_files:
             return self.__parse_all_at_once(files)
+        elif compilation_mode == COMPILATION_MODE.BATCHED:
+            return self.__parse_batches(files, jobs, batch_size)
         else:
             if compilation_mode == COMPILATION_MODE.ALL_AT_ONCE:
                 msg = ''.join([
-                    "Unable to parse files using ALL_AT_ONCE mode. ",
+                    "Unable to parse files using %s mode. " %
+                    compilation_mode.upper(),
                     "There is some file configuration that is not file. ",
                     "pygccxml.parser.project_reader_t switches to ",
                     "FILE_BY_FILE mode."])
                 self.logger.warning(msg)
+            elif compilation_mode == COMPILATION_MODE.PARALLEL_FILE_BY_FILE:
+                return self.__parse_file_by_file_parallel(files, jobs)
             return self.__parse_file_by_file(files)
 
+    def aread_files(self, files, concurrency=None, executor=None):
+        """
+        Coroutine version of :meth:`read_files`, using the FILE_BY_FILE
+        compilation mode.
+
+        The xml generators are run as asyncio subprocesses, at most
+        `concurrency` of them at the same time. The scanning, linking and
+        joining steps are done in the `executor` (the default executor of
+        the event loop if None). Requires Python 3.5 or newer.
+
+        :param files: list of strings and\\or :class:`file_configuration_t`
+                      instances.
+        :type files: list
+
+        :param concurrency: maximum number of files parsed at the same time,
+                            by default the number of CPUs of the machine
+        :type concurrency: int
+
+        :param executor: executor used for the CPU bound steps
+        :type executor: :class:`concurrent.futures.Executor`
+
+        :rtype: [:class:`declaration_t`]
+        """
+
+        from . import async_reader
+
+        def create_reader(prj_file):
+            config, file_config = _file_configuration(
+                self.__config, prj_file, len(files))
+            reader = source_reader.source_reader_t(
+                config,
+                self.__dcache,
+                self.__decl_factory,
+                strings,
+                self.__metrics)
+            return reader, file_config
+
+        strings = {}
+
+        return async_reader.read_files(
+            files,
+            create_reader,
+            self.__dcache,
+            self.__flush_cache,
+            self.__join_files_namespaces,
+            concurrency,
+            executor)
+
     def __parse_file_by_file(self, files):
         namespaces = []
-        config = self.__config.clone()
+        # The strings of the declarations are shared by all the files
+        strings = {}
         self.logger.debug("Reading project files: file by file")
         for prj_file in files:
+            config, file_config = _file_configuration(
+                self.__config, prj_file, len(files))
+            reader = source_reader.source_reader_t(
+                config,
+                self.__dcache,
+                self.__decl_factory,
+                strings,
+                self.__metrics)
+            namespaces.append(
+                _read_file_configuration(reader, file_config, self.logger))
+        self.__flush_cache()
+        return self.__join_files_namespaces(namespaces)
+
+    def __parse_file_by_file_parallel(self, files, jobs):
+        """
+        Parse the files in a pool of worker processes.
 
-            if isinstance(prj_file, file_configuration_t):
-                del config.start_with_declarations[:]
-                config.start_with_declarations.extend(
-                    prj_file.start_with_declarations)
-                header = prj_file.data
-                content_type = prj_file.content_type
-            else:
-                config = self.__config
-                header = prj_file
-                content_type = \
-                    file_configuration_t.CONTENT_TYPE.STANDARD_SOURCE_FILE
+        Cache lookups and updates are done in this process; the workers
+        only run the xml generator, the scanner and the linker. The
+        resulting declarations are joined in the order of `files`.
 
+        """
+
+        if jobs == 1:
+            return self.__parse_file_by_file(files)
+
+        self.logger.debug("Reading project files: parallel file by file")
+        namespaces = [None] * len(files)
+        pending = []
+        strings = {}
+        for index, prj_file in enumerate(files):
+            config, file_config = _file_configuration(
+                self.__config, prj_file, len(files))
             reader = source_reader.source_reader_t(
                 config,
                 self.__dcache,
-                self.__decl_factory)
+                self.__decl_factory,
+                strings,
+                self.__metrics)
+            decls = _cached_file_configuration(reader, file_config)
+            if decls:
+                self.logger.debug(
+                    'Reading declarations of "%s" from cache.',
+                    file_config.data)
+                namespaces[index] = decls
+            else:
+                pending.append((index, config, file_config))
+
+        if pending:
+            pool = multiprocessing.Pool(processes=jobs)
+            try:
+                measure = self.__metrics is not None
+                results = [
+                    (index, pool.apply_async(
+                        _parse_file_configuration,
+                        (config, self.__decl_factory, file_config, measure)))
+                    for index, config, file_config in pending]
+                for index, result in results:
+                    decls, updates, xml_generator, xml_output_version, \
+                        worker_metrics = result.get()
+                    if worker_metrics is not None:
+                        self.__metrics.merge(worker_metrics)
+                    if xml_generator:
+                        utils.xml_generator = xml_generator
+                        utils.xml_output_version = xml_output_version
+                    # The workers have their own strings tables
+                    interning.intern_declarations(decls, strings)
+                    for update in updates:
+                        self.__dcache.update(*update)
+                    namespaces[index] = decls
+            except Exception:
+                pool.terminate()
+                raise
+            else:
+                pool.close()
+            finally:
+                pool.join()
 
-            if content_type == \
-                    file_configuration_t.CONTENT_TYPE.STANDARD_SOURCE_FILE:
-                self.logger.info('Parsing source file "%s" ... ', header)
-                decls = reader.read_file(header)
-            elif content_type == \
-                    file_configuration_t.CONTENT_TYPE.GCCXML_GENERATED_FILE:
-                self.logger.info('Parsing xml file "%s" ... ', header)
-                decls = reader.read_xml_file(header)
-            elif content_type == \
-                    file_configuration_t.CONTENT_TYPE.CACHED_SOURCE_FILE:
-                # TODO: raise error when header file does not exist
-                if not os.path.exists(prj_file.cached_source_file):
-                    dir_ = os.path.split(prj_file.cached_source_file)[0]
-                    if dir_ and not os.path.exists(dir_):
-                        os.makedirs(dir_)
-                    self.logger.info(
-                        'Creating xml file "%s" from source file "%s" ... ',
-                        prj_file.cached_source_file, header)
-                    reader.create_xml_file(header, prj_file.cached_source_file)
-                self.logger.info(
-                    'Parsing xml file "%s" ... ',
-                    prj_file.cached_source_file)
-                decls = reader.read_xml_file(prj_file.cached_source_file)
+        self.__flush_cache()
+        return self.__join_files_namespaces(namespaces)
+
+    def __parse_batches(self, files, jobs, batch_size):
+        """
+        Parse the files in batches, each batch being compiled as a single
+        translation unit.
+
+        Each batch is a generated header file including the files of the
+        batch. Its name is derived from its content, so that it is cached
+        like any other source file: a modified header only invalidates the
+        batch it belongs to. The batch files are stored in the directory of
+        the declarations cache (in a temporary directory if the cache has
+        none) and are kept after the parse, as other processes may be
+        parsing the same batches.
+
+        Only the source files are batched: the other file configurations
+        (xml files, cached source files, text) are read file by file, after
+        the batches.
+
+        """
+
+        self.logger.debug("Reading project files: batched")
+        fc_types = file_configuration_t.CONTENT_TYPE
+        source_files = []
+        other_files = []
+        for prj_file in files:
+            if isinstance(prj_file, file_configuration_t) and \
+                    prj_file.content_type != fc_types.STANDARD_SOURCE_FILE:
+                other_files.append(prj_file)
             else:
-                decls = reader.read_string(header)
-            namespaces.append(decls)
+                source_files.append(prj_file)
+        files = source_files
+        if batch_size:
+            batches = [
+                files[i:i + batch_size]
+                for i in range(0, len(files), batch_size)]
+        else:
+            # The size of a header is used as the estimation of its cost
+            costs = []
+            for header in self.get_os_file_names(files):
+                header = self.__header_full_name(header)
+                costs.append(
+                    os.path.getsize(header) if os.path.isfile(header) else 0)
+            batches = _split_by_cost(
+                files, costs, jobs or multiprocessing.cpu_count())
+
+        batch_files = [self.__create_batch_file(batch) for batch in batches]
+        return self.__parse_file_by_file_parallel(
+            batch_files + other_files, jobs)
+
+    def __header_full_name(self, header):
+        """
+        Return the full path of a header, searched like the xml generator
+        would do, or the header itself if it can not be found.
 
+        """
+
+        search_directories = [self.__config.working_directory] + \
+            self.__config.include_paths
+        for path in [header] + [
+                os.path.join(dir_, header) for dir_ in search_directories]:
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        return header
+
+    def __create_batch_file(self, batch):
+        header_content = []
+        # A batch reads the start declarations of the configuration, merged
+        # with the ones of its file configurations, or all the declarations
+        # if one of its files has no start declarations.
+        start_with_declarations = []
+        read_all = False
+        for header in batch:
+            names = list(self.__config.start_with_declarations)
+            if isinstance(header, file_configuration_t):
+                names.extend(header.start_with_declarations)
+                header = header.data
+            read_all = read_all or not names
+            start_with_declarations.extend(
+                name for name in names
+                if name not in start_with_declarations)
+            header_content.append(
+                '#include "%s" %s' %
+                (self.__header_full_name(header), os.linesep))
+        content = ''.join(header_content)
+
+        directory = self.__dcache.directory
+        if directory is None:
+            directory = _temporary_directory()
+        elif not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another process may have created it in the meantime
+                if not os.path.isdir(directory):
+                    raise
+        batch_file = os.path.join(
+            directory,
+            'pygccxml_batch_%s.h' %
+            hashlib.sha1(content.encode('utf-8')).hexdigest())
+        if _read_text_file(batch_file) != content:
+            # Another process may be reading the batch file: a new file is
+            # written, and renamed
+            temp_file = utils.create_temp_file_name(
+                suffix=".h.tmp", prefix="pygccxml_batch_", directory=directory)
+            with open(temp_file, "w") as f:
+                f.write(content)
+            utils.replace_file(temp_file, batch_file)
+        if read_all:
+            start_with_declarations = []
+        return file_configuration_t(
+            data=batch_file,
+            start_with_declarations=start_with_declarations)
+
+    def __measure(self, phase):
+        return metrics.measure(self.__metrics, phase)
+
+    def __flush_cache(self):
         self.logger.debug("Flushing cache... ")
-        start_time = time.clock()
-        self.__dcache.flush()
+        start_time = utils.wall_time()
+        with self.__measure(metrics_t.CACHE_FLUSH):
+            self.__dcache.flush()
         self.logger.debug(
             "Cache has been flushed in %.1f secs",
-            (time.clock() - start_time))
+            (utils.wall_time() - start_time))
+
+    def __join_files_namespaces(self, namespaces):
         answer = []
-        self.logger.debug("Joining namespaces ...")
-        for file_nss in namespaces:
-            answer = self._join_top_namespaces(answer, file_nss)
-        self.logger.debug("Joining declarations ...")
-        for ns in answer:
-            if isinstance(ns, pygccxml.declarations.namespace_t):
-                declarations_joiner.join_declarations(ns)
-        leaved_classes = self._join_class_hierarchy(answer)
-        types = self.__declarated_types(answer)
-        self.logger.debug("Relinking declared types ...")
-        self._relink_declarated_types(leaved_classes, types)
-        declarations_joiner.bind_aliases(
-            pygccxml.declarations.make_flatten(answer))
+        with self.__measure(metrics_t.NAMESPACES_JOINING):
+            self.logger.debug("Joining namespaces ...")
+            for file_nss in namespaces:
+                answer = self._join_top_namespaces(answer, file_nss)
+            self.logger.debug("Joining declarations ...")
+            for ns in answer:
+                if isinstance(ns, pygccxml.declarations.namespace_t):
+                    declarations_joiner.join_declarations(ns)
+        with self.__measure(metrics_t.CLASS_HIERARCHY_JOINING):
+            leaved_classes = self._join_class_hierarchy(answer)
+        if len(namespaces) == 1 and self.__config.lazy_linking:
+            # No class has been dropped, and the aliases have been bound by
+            # the source reader: looking for the declarated types would
+            # link all the types
+            return answer
+        with self.__measure(metrics_t.RELINKING):
+            types = self._declarated_types(answer)
+            self.logger.debug("Relinking declared types ...")
+            relinked = self._relink_declarated_types(leaved_classes, types)
+            self.logger.debug(
+                "%d of %d declared types relinked", relinked, len(types))
+            decls = pygccxml.declarations.make_flatten(answer)
+            declarations_joiner.bind_aliases(decls)
+            # The types of the different files are shared once they refer
+            # to the same declarations
+            type_table.type_table_t().intern_declarations(decls)
         return answer
 
     def __parse_all_at_once(self, files):
@@ -351,7 +607,8 @@ class project_reader_t(object):
         reader = source_reader.source_reader_t(
             self.__config,
             None,
-            self.__decl_factory)
+            self.__decl_factory,
+            metrics=self.__metrics)
         return reader.read_string(content)
 
     def read_xml(self, file_configuration):
@@ -364,7 +621,8 @@ class project_reader_t(object):
         reader = source_reader.source_reader_t(
             self.__config,
             None,
-            self.__decl_factory)
+            self.__decl_factory,
+            metrics=self.__metrics)
         try:
             if fc.content_type == fc.CONTENT_TYPE.STANDARD_SOURCE_FILE:
                 self.logger.info('Parsing source file "%s" ... ', fc.data)
@@ -401,16 +659,19 @@ class project_reader_t(object):
     @staticmethod
     def _join_top_namespaces(main_ns_list, other_ns_list):
         answer = main_ns_list[:]
+        # name -> namespace of the answer
+        namespaces = {}
+        for decl in answer:
+            if isinstance(decl, pygccxml.declarations.namespace_t):
+                namespaces.setdefault(decl.name, decl)
         for other_ns in other_ns_list:
-            main_ns = pygccxml.declarations.find_declaration(
-                answer,
-                decl_type=pygccxml.declarations.namespace_t,
-                name=other_ns._name,
-                recursive=False)
+            main_ns = namespaces.get(other_ns.name)
             if main_ns:
                 main_ns.take_parenting(other_ns)
             else:
                 answer.append(other_ns)
+                if isinstance(other_ns, pygccxml.declarations.namespace_t):
+                    namespaces[other_ns.name] = other_ns
         return answer
 
     @staticmethod
@@ -423,72 +684,106 @@ class project_reader_t(object):
         classes = [
             decl for decl in pygccxml.declarations.make_flatten(namespaces)
             if isinstance(decl, pygccxml.declarations.class_t)]
-        leaved_classes = {}
+        leaved_classes = _class_index_t()
         # selecting classes to leave
+        leaved = [leaved_classes.add(class_) for class_ in classes]
+        self._merge_class_hierarchy(classes, leaved_classes)
+        # this loop removes the other instances from parent.declarations
+        # id(parent) -> [declarations of the parent, ids of the instances]
+        removed = {}
+        for class_, leaved_class in zip(classes, leaved):
+            if leaved_class is class_:
+                continue
+            if class_.parent:
+                declarations = class_.parent.declarations
+            else:
+                # yes, we are talking about global class that doesn't
+                # belong to any namespace. Usually is compiler generated
+                # top level classes
+                declarations = namespaces
+            removed.setdefault(
+                id(class_.parent), (declarations, set()))[1].add(id(class_))
+        for declarations, removed_ids in removed.values():
+            declarations[:] = [
+                decl for decl in declarations if id(decl) not in removed_ids]
+        return leaved_classes
+
+    def _merge_class_hierarchy(self, classes, leaved_classes):
+        """
+        Replace the base and derived classes of the classes that are left by
+        those that should be left, and add the missing derived classes to
+        the bases.
+
+        :param classes: the classes whose hierarchy is merged
+        :type classes: list of :class:`class_t`
+
+        :param leaved_classes: the classes that are left
+        :type leaved_classes: :class:`_class_index_t`
+
+        """
+
+        hierarchy_info_t = pygccxml.declarations.hierarchy_info_t
+        # (id(class), "bases" or "derived") -> hierarchy_info_t -> the
+        # first equal hierarchy_info_t of the list
+        indexes = {}
+
+        def add_info(class_, attribute, info, relink):
+            """
+            Add a hierarchy_info_t to a list, unless it is already there.
+            The related class of the info found is replaced if `relink`.
+
+            """
+
+            key = (id(class_), attribute)
+            index = indexes.get(key)
+            if index is None:
+                index = {}
+                for existing in getattr(class_, attribute):
+                    index.setdefault(existing, existing)
+                indexes[key] = index
+            existing = index.get(info)
+            if existing is None:
+                getattr(class_, attribute).append(info)
+                index[info] = info
+            elif relink:
+                existing.related_class = info.related_class
+
         for class_ in classes:
-            key = self._create_key(class_)
-            if key not in leaved_classes:
-                leaved_classes[key] = class_
-        # replacing base and derived classes with those that should be leave
-        # also this loop will add missing derived classes to the base
-        for class_ in classes:
-            leaved_class = leaved_classes[self._create_key(class_)]
+            leaved_class = leaved_classes[class_]
             for base_info in class_.bases:
-                leaved_base = leaved_classes[
-                    self._create_key(base_info.related_class)]
+                leaved_base = leaved_classes[base_info.related_class]
                 # treating base class hierarchy of leaved_class
-                leaved_base_info = pygccxml.declarations.hierarchy_info_t(
-                    related_class=leaved_base, access=base_info.access)
-                if leaved_base_info not in leaved_class.bases:
-                    leaved_class.bases.append(leaved_base_info)
-                else:
-                    index = leaved_class.bases.index(leaved_base_info)
-                    leaved_class.bases[
-                        index].related_class = leaved_base_info.related_class
+                add_info(
+                    leaved_class,
+                    "bases",
+                    hierarchy_info_t(
+                        related_class=leaved_base, access=base_info.access),
+                    True)
                 # treating derived class hierarchy of leaved_base
-                leaved_derived_for_base_info = \
-                    pygccxml.declarations.hierarchy_info_t(
-                        related_class=leaved_class,
-                        access=base_info.access)
-                if leaved_derived_for_base_info not in leaved_base.derived:
-                    leaved_base.derived.append(leaved_derived_for_base_info)
-                else:
-                    index = leaved_base.derived.index(
-                        leaved_derived_for_base_info)
-                    leaved_base.derived[index].related_class = \
-                        leaved_derived_for_base_info.related_class
+                add_info(
+                    leaved_base,
+                    "derived",
+                    hierarchy_info_t(
+                        related_class=leaved_class, access=base_info.access),
+                    True)
             for derived_info in class_.derived:
-                leaved_derived = leaved_classes[
-                    self._create_key(
-                        derived_info.related_class)]
+                leaved_derived = leaved_classes[derived_info.related_class]
                 # treating derived class hierarchy of leaved_class
-                leaved_derived_info = pygccxml.declarations.hierarchy_info_t(
-                    related_class=leaved_derived, access=derived_info.access)
-                if leaved_derived_info not in leaved_class.derived:
-                    leaved_class.derived.append(leaved_derived_info)
+                add_info(
+                    leaved_class,
+                    "derived",
+                    hierarchy_info_t(
+                        related_class=leaved_derived,
+                        access=derived_info.access),
+                    False)
                 # treating base class hierarchy of leaved_derived
-                leaved_base_for_derived_info = \
-                    pygccxml.declarations.hierarchy_info_t(
+                add_info(
+                    leaved_derived,
+                    "bases",
+                    hierarchy_info_t(
                         related_class=leaved_class,
-                        access=derived_info.access)
-                if leaved_base_for_derived_info not in leaved_derived.bases:
-                    leaved_derived.bases.append(leaved_base_for_derived_info)
-        # this loops remove instance we from parent.declarations
-        for class_ in classes:
-            key = self._create_key(class_)
-            if id(leaved_classes[key]) == id(class_):
-                continue
-            else:
-                if class_.parent:
-                    declarations = class_.parent.declarations
-                else:
-                    # yes, we are talking about global class that doesn't
-                    # belong to any namespace. Usually is compiler generated
-                    # top level classes
-                    declarations = namespaces
-                declarations_ids = [id(decl) for decl in declarations]
-                del declarations[declarations_ids.index(id(class_))]
-        return leaved_classes
+                        access=derived_info.access),
+                    False)
 
     @staticmethod
     def _create_name_key(decl):
@@ -500,85 +795,380 @@ class project_reader_t(object):
             return decl.location.as_tuple(), decl.name
 
     def _relink_declarated_types(self, leaved_classes, declarated_types):
+        """
+        Link the declarated types to the classes that are left.
+
+        The class a declaration is replaced by is looked up once, the other
+        types referring to the same declaration reuse it.
+
+        :param leaved_classes: the classes that are left
+        :type leaved_classes: :class:`_class_index_t`
 
-        mangled_leaved_classes = {}
-        for leaved_class in leaved_classes.values():
-            mangled_leaved_classes[
-                self._create_name_key(leaved_class)] = leaved_class
+        :param declarated_types: the types to relink
+        :type declarated_types: list of :class:`declarated_t`
+
+        :rtype: the number of types linked to another declaration
+        """
 
+        # id(declaration) -> class that is left, or None
+        replacements = {}
+        relinked = 0
         for decl_wrapper_type in declarated_types:
             # it is possible, that cache contains reference to dropped class
             # We need to clear it
             decl_wrapper_type.cache.reset()
-            if isinstance(
-                    decl_wrapper_type.declaration,
-                    pygccxml.declarations.class_t):
-                key = self._create_key(decl_wrapper_type.declaration)
-                if key in leaved_classes:
-                    decl_wrapper_type.declaration = leaved_classes[key]
-                else:
+            declaration = decl_wrapper_type.declaration
+            if id(declaration) in replacements:
+                leaved_class = replacements[id(declaration)]
+            else:
+                leaved_class = self.__leaved_class(
+                    leaved_classes, declaration)
+                replacements[id(declaration)] = leaved_class
+            if leaved_class is not None and leaved_class is not declaration:
+                decl_wrapper_type.declaration = leaved_class
+                relinked += 1
+        return relinked
 
-                    name = decl_wrapper_type.declaration._name
-                    if name == "":
-                        # Happens with gcc5, castxml + std=c++11
-                        # See issue #45
-                        continue
-                    if name.startswith("__vmi_class_type_info_pseudo"):
-                        continue
-                    if name == "rebind<std::__tree_node" + \
-                            "<std::basic_string<char>, void *> >":
-                        continue
-
-                    msg = []
-                    msg.append(
-                        "Unable to find out actual class definition: '%s'." %
-                        decl_wrapper_type.declaration._name)
-                    msg.append((
-                        "Class definition has been changed from one " +
-                        "compilation to an other."))
-                    msg.append((
-                        "Why did it happen to me? Here is a short list " +
-                        "of reasons: "))
-                    msg.append((
-                        "    1. There are different preprocessor " +
-                        "definitions applied on same file during compilation"))
-                    msg.append("    2. Bug in pygccxml.")
-                    raise Exception(os.linesep.join(msg))
-            elif isinstance(
-                    decl_wrapper_type.declaration,
-                    pygccxml.declarations.class_declaration_t):
-                key = self._create_name_key(decl_wrapper_type.declaration)
-                if key in mangled_leaved_classes:
-                    decl_wrapper_type.declaration = mangled_leaved_classes[key]
+    @staticmethod
+    def __leaved_class(leaved_classes, declaration):
+        """
+        Return the class that is left for the declaration of a declarated
+        type, or None if the declaration is kept.
+
+        """
+
+        if isinstance(declaration, pygccxml.declarations.class_t):
+            leaved_class = leaved_classes.get(declaration)
+            if leaved_class is not None:
+                return leaved_class
+
+            name = declaration._name
+            if name == "":
+                # Happens with gcc5, castxml + std=c++11
+                # See issue #45
+                return None
+            if name.startswith("__vmi_class_type_info_pseudo"):
+                return None
+            if name == "rebind<std::__tree_node" + \
+                    "<std::basic_string<char>, void *> >":
+                return None
+
+            msg = []
+            msg.append(
+                "Unable to find out actual class definition: '%s'." %
+                declaration._name)
+            msg.append((
+                "Class definition has been changed from one " +
+                "compilation to an other."))
+            msg.append((
+                "Why did it happen to me? Here is a short list " +
+                "of reasons: "))
+            msg.append((
+                "    1. There are different preprocessor " +
+                "definitions applied on same file during compilation"))
+            msg.append("    2. Bug in pygccxml.")
+            raise Exception(os.linesep.join(msg))
+        elif isinstance(
+                declaration, pygccxml.declarations.class_declaration_t):
+            return leaved_classes.get_by_name(declaration)
+        return None
 
     @staticmethod
-    def __declarated_types(namespaces):
-        def get_from_type(cpptype):
-            if not cpptype:
-                return []
-            elif isinstance(cpptype, pygccxml.declarations.fundamental_t):
-                return []
-            elif isinstance(cpptype, pygccxml.declarations.declarated_t):
-                return [cpptype]
-            elif isinstance(cpptype, pygccxml.declarations.compound_t):
-                return get_from_type(cpptype.base)
-            elif isinstance(cpptype, pygccxml.declarations.calldef_type_t):
-                types = get_from_type(cpptype.return_type)
-                for arg in cpptype.arguments_types:
-                    types.extend(get_from_type(arg))
-                return types
-            else:
-                assert isinstance(
-                    cpptype,
-                    (pygccxml.declarations.unknown_t,
-                     pygccxml.declarations.ellipsis_t))
-                return []
+    def _declarated_types(namespaces):
+        """
+        Return the declarated types used by the declarations, each type
+        node once.
+
+        """
+
         types = []
+        # The type nodes are shared by the declarations of a file
+        visited = set()
+        stack = []
         for decl in pygccxml.declarations.make_flatten(namespaces):
             if isinstance(decl, pygccxml.declarations.calldef_t):
-                types.extend(get_from_type(decl.function_type()))
+                stack.append(decl.return_type)
+                stack.extend(argument.decl_type for argument in decl.arguments)
             elif isinstance(
                     decl, (pygccxml.declarations.typedef_t,
                            pygccxml.declarations.variable_t)):
-                types.extend(get_from_type(decl.decl_type))
+                stack.append(decl.decl_type)
+            while stack:
+                cpptype = stack.pop()
+                if not cpptype or id(cpptype) in visited:
+                    continue
+                visited.add(id(cpptype))
+                if isinstance(cpptype, pygccxml.declarations.declarated_t):
+                    types.append(cpptype)
+                elif isinstance(cpptype, pygccxml.declarations.compound_t):
+                    stack.append(cpptype.base)
+                elif isinstance(
+                        cpptype, pygccxml.declarations.calldef_type_t):
+                    stack.append(cpptype.return_type)
+                    stack.extend(cpptype.arguments_types)
         return types
+
+
+class _class_index_t(object):
+
+    """
+    Implementation detail: the classes that are left in a joined tree.
+
+    The classes are indexed by :meth:`project_reader_t._create_key`, which
+    finds the class left for another instance of the same class, and by
+    :meth:`project_reader_t._create_name_key`, which finds the class left
+    for a class declaration.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        # project_reader_t._create_key(class) -> class
+        self.__classes = {}
+        # project_reader_t._create_name_key(class) -> class
+        self.__names = {}
+
+    def __len__(self):
+        return len(self.__classes)
+
+    def __iter__(self):
+        return iter(self.__classes.values())
+
+    def __getitem__(self, class_):
+        return self.__classes[project_reader_t._create_key(class_)]
+
+    def add(self, class_):
+        """
+        Add a class, unless an instance of the same class is already left,
+        and return the class that is left.
+
+        """
+
+        leaved_class = self.__classes.setdefault(
+            project_reader_t._create_key(class_), class_)
+        if leaved_class is class_:
+            self.__names.setdefault(
+                project_reader_t._create_name_key(class_), class_)
+        return leaved_class
+
+    def remove(self, class_):
+        """
+        Remove a class, and return True if it was the class that is left.
+
+        """
+
+        key = project_reader_t._create_key(class_)
+        if self.__classes.get(key) is not class_:
+            return False
+        del self.__classes[key]
+        name_key = project_reader_t._create_name_key(class_)
+        if self.__names.get(name_key) is class_:
+            del self.__names[name_key]
+        return True
+
+    def get(self, class_):
+        """Return the class left for an instance of a class, or None."""
+
+        return self.__classes.get(project_reader_t._create_key(class_))
+
+    def get_by_name(self, decl):
+        """Return the class left for a class declaration, or None."""
+
+        return self.__names.get(project_reader_t._create_name_key(decl))
+
+
+def _temporary_directory():
+    if not _temp_directory:
+        directory = tempfile.mkdtemp(prefix="pygccxml_batch")
+        atexit.register(shutil.rmtree, directory, True)
+        _temp_directory.append(directory)
+    return _temp_directory[0]
+
+
+def _read_text_file(file_name):
+    """Return the content of a file, or None if it can not be read."""
+
+    try:
+        with open(file_name, "r") as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _split_by_cost(files, costs, batches_count):
+    """
+    Split the files in `batches_count` contiguous batches (or one batch per
+    file if there are fewer files), of similar total cost.
+
+    A batch is closed before a file which would make it overshoot the
+    average cost of the remaining batches. When the costs are unknown (all
+    zero), the files are split by count.
+
+    :param files: the files to split
+    :type files: list
+
+    :param costs: the estimated cost of each file
+    :type costs: list of int
+
+    :param batches_count: maximum number of batches
+    :type batches_count: int
+
+    :rtype: list of lists of files
+    """
+
+    count = min(batches_count, len(files))
+    if not any(costs):
+        costs = [1] * len(files)
+    remaining_cost = float(sum(costs))
+    target = remaining_cost / max(count, 1)
+    batches = []
+    batch = []
+    batch_cost = 0
+    for index, (file_, cost) in enumerate(zip(files, costs)):
+        # Number of batches to start after the current one
+        next_batches = count - len(batches) - 1
+        if batch and next_batches > 0 and (
+                batch_cost + cost > target or
+                len(files) - index == next_batches):
+            batches.append(batch)
+            remaining_cost -= batch_cost
+            target = remaining_cost / (count - len(batches))
+            batch = []
+            batch_cost = 0
+        batch.append(file_)
+        batch_cost += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _file_configuration(config, prj_file, files_count=1):
+    """
+    Return the configuration and the :class:`file_configuration_t`
+    instance to be used to parse a project file.
+
+    The types are linked lazily only in a single file project: joining the
+    declarations of several files links all of them.
+
+    """
+
+    if config.lazy_linking and files_count > 1:
+        config = config.clone()
+        config.lazy_linking = False
+    if isinstance(prj_file, file_configuration_t):
+        config = config.clone()
+        del config.start_with_declarations[:]
+        config.start_with_declarations.extend(
+            prj_file.start_with_declarations)
+        return config, prj_file
+    return config, create_source_fc(prj_file)
+
+
+def _read_file_configuration(reader, file_config, logger):
+    """
+    Read the declarations of a single project file.
+
+    :param reader: reader configured for the file
+    :type reader: :class:`source_reader_t`
+
+    :param file_config: the file to read
+    :type file_config: :class:`file_configuration_t`
+
+    :rtype: declarations tree
+    """
+
+    header = file_config.data
+    content_type = file_config.content_type
+    if content_type == \
+            file_configuration_t.CONTENT_TYPE.STANDARD_SOURCE_FILE:
+        logger.info('Parsing source file "%s" ... ', header)
+        decls = reader.read_file(header)
+    elif content_type == \
+            file_configuration_t.CONTENT_TYPE.GCCXML_GENERATED_FILE:
+        logger.info('Parsing xml file "%s" ... ', header)
+        decls = reader.read_xml_file(header)
+    elif content_type == \
+            file_configuration_t.CONTENT_TYPE.CACHED_SOURCE_FILE:
+        # TODO: raise error when header file does not exist
+        if not os.path.exists(file_config.cached_source_file):
+            dir_ = os.path.split(file_config.cached_source_file)[0]
+            if dir_ and not os.path.exists(dir_):
+                os.makedirs(dir_)
+            logger.info(
+                'Creating xml file "%s" from source file "%s" ... ',
+                file_config.cached_source_file, header)
+            reader.create_xml_file(header, file_config.cached_source_file)
+        logger.info(
+            'Parsing xml file "%s" ... ',
+            file_config.cached_source_file)
+        decls = reader.read_xml_file(file_config.cached_source_file)
+    else:
+        decls = reader.read_string(header)
+    return decls
+
+
+def _cached_file_configuration(reader, file_config):
+    """
+    Return the cached declarations of a project file, or None.
+
+    Text content is never cached.
+
+    """
+
+    content_type = file_config.content_type
+    if content_type in (
+            file_configuration_t.CONTENT_TYPE.STANDARD_SOURCE_FILE,
+            file_configuration_t.CONTENT_TYPE.GCCXML_GENERATED_FILE):
+        return reader.read_cached_file(file_config.data)
+    elif content_type == \
+            file_configuration_t.CONTENT_TYPE.CACHED_SOURCE_FILE:
+        if os.path.exists(file_config.cached_source_file):
+            return reader.read_cached_file(file_config.cached_source_file)
+    return None
+
+
+def _parse_file_configuration(config, decl_factory, file_config, measure):
+    """
+    Parse a single project file in a worker process.
+
+    The cache updates are not applied but recorded, and returned together
+    with the declarations, so that the parent process can merge them into
+    its own cache. The metrics of the file are returned too if `measure`
+    is True.
+
+    """
+
+    cache = _deferred_cache_t()
+    worker_metrics = None
+    if measure:
+        worker_metrics = metrics_t()
+    reader = source_reader.source_reader_t(
+        config, cache, decl_factory, metrics=worker_metrics)
+    decls = _read_file_configuration(
+        reader, file_config, utils.loggers.cxx_parser)
+    return (
+        decls, cache.updates, utils.xml_generator, utils.xml_output_version,
+        worker_metrics)
+
+
+class _deferred_cache_t(declarations_cache.cache_base_t):
+
+    """
+    Cache used by the worker processes of the PARALLEL_FILE_BY_FILE mode.
+
+    It never returns a cached value and only records the updates.
+
+    """
+
+    def __init__(self):
+        declarations_cache.cache_base_t.__init__(self)
+        self.updates = []
+
+    def flush(self):
+        pass
+
+    def update(self, source_file, configuration, declarations, included_files):
+        self.updates.append(
+            (source_file, configuration, declarations, included_files))
+
+    def cached_value(self, source_file, configuration):
+        return None
@@ -9,6 +9,7 @@ import xml.sax
 import xml.sax.handler
 from .. import utils
 from .. import declarations
+from . import interning
 
 # convention
 # XML_NN - XML Node Name
@@ -80,14 +81,30 @@ XML_NN_TYPEDEF = "Typedef"
 XML_NN_UNION = "Union"
 XML_NN_VARIABLE = "Variable"
 
+# The attributes that refer to other elements, followed to find the
+# elements used by the declarations that are read
+_XML_AN_REFERENCES = (
+    XML_AN_BASE_TYPE,
+    XML_AN_CONTEXT,
+    XML_AN_RETURNS,
+    XML_AN_TYPE)
+_XML_AN_REFERENCE_LISTS = (
+    XML_AN_BASES,
+    XML_AN_THROW)
+
 
 class scanner_t(xml.sax.handler.ContentHandler):
 
-    def __init__(self, xml_file, decl_factory, config, *args):
+    def __init__(self, xml_file, decl_factory, config, strings=None, *args):
         xml.sax.handler.ContentHandler.__init__(self, *args)
         self.logger = utils.loggers.cxx_parser
         self.xml_file = xml_file
         self.config = config
+        # Strings table, see the interning module. It can be shared with
+        # the scanners of the other files of a project.
+        if strings is None:
+            strings = {}
+        self.__strings = strings
         # defining parsing tables
         self.__readers = {
             XML_NN_FILE: self.__read_file,
@@ -118,7 +135,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
             XML_NN_METHOD: self.__read_method,
             XML_NN_GCC_XML: self.__read_version,
             XML_NN_ELLIPSIS: self.__read_ellipsis}
-        self.deep_declarations = [
+        self.deep_declarations = set([
             XML_NN_CASTING_OPERATOR,
             XML_NN_CONSTRUCTOR,
             XML_NN_DESTRUCTOR,
@@ -129,7 +146,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
             XML_NN_MEMBER_OPERATOR,
             XML_NN_METHOD,
             XML_NN_FUNCTION_TYPE,
-            XML_NN_METHOD_TYPE]
+            XML_NN_METHOD_TYPE])
 
         assert isinstance(decl_factory, declarations.decl_factory_t)
         self.__decl_factory = decl_factory
@@ -155,14 +172,46 @@ class scanner_t(xml.sax.handler.ContentHandler):
         self.__mangled_suffix_len = len(self.__mangled_suffix)
 
         self.__name_attrs_to_skip = []
+
+        # With CastXML and clang some __va_list_tag declarations are
+        # present in the tree: we do not want to have these in the tree.
+        # With llvm 3.9 there is a __NSConstantString(_tag) in the tree
+        # We hide these declarations by default
+        if "f1" not in self.config.flags:
+            self.__names_to_skip = set([
+                "__va_list_tag",
+                "__NSConstantString_tag",
+                "__NSConstantString"])
+        else:
+            self.__names_to_skip = set()
+
         self.__read_location = \
             lambda decl, attrs, to_skip: self.__read_location_bootstrap(
                 self, decl, attrs, to_skip)
 
+        # When a location filter is set, the elements are kept in this list
+        # (with their children) until the File elements, which are at the
+        # end of the document, have been read.
+        self.__location_filter = getattr(config, "location_filter", None)
+        self.__deferred_elements = None
+        if self.__location_filter is not None:
+            self.__deferred_elements = []
+        self.__depth = 0
+
     def read(self):
         xml.sax.parse(self.xml_file, self)
 
     def endDocument(self):
+        if self.__deferred_elements is not None:
+            elements = self.__deferred_elements
+            self.__deferred_elements = None
+            for name, attrs, children in self.__filter_elements(elements):
+                self.startElement(name, attrs)
+                for child_name, child_attrs in children:
+                    self.startElement(child_name, child_attrs)
+                    self.endElement(child_name)
+                self.endElement(name)
+
         # updating membership
         members_mapping = {}
         for gccxml_id, members in self.__members.items():
@@ -194,11 +243,15 @@ class scanner_t(xml.sax.handler.ContentHandler):
         return self.__members
 
     def startElement(self, name, attrs):
+        if self.__deferred_elements is not None and \
+                self.__defer_element(name, attrs):
+            return
 
         try:
-            if name not in self.__readers:
+            reader = self.__readers.get(name)
+            if reader is None:
                 return
-            obj = self.__readers[name](attrs)
+            obj = reader(attrs)
             if not obj:
                 return  # it means that we worked on internals
                 # for example EnumValue of function argument
@@ -207,19 +260,9 @@ class scanner_t(xml.sax.handler.ContentHandler):
             self.__read_access(attrs)
             element_id = attrs.get(XML_AN_ID)
 
-            # With CastXML and clang some __va_list_tag declarations are
-            # present in the tree: we do not want to have these in the tree.
-            # With llvm 3.9 there is a __NSConstantString(_tag) in the tree
-            # We hide these declarations by default
-            rm1 = "f1" not in self.config.flags
-            names = [
-                "__va_list_tag",
-                "__NSConstantString_tag",
-                "__NSConstantString"]
-
             if isinstance(obj, declarations.declaration_t):
 
-                if rm1 and str(obj.name) in names:
+                if str(obj.name) in self.__names_to_skip:
                     return
 
                 # XML generator. Kept for retrocompatibily
@@ -246,7 +289,8 @@ class scanner_t(xml.sax.handler.ContentHandler):
 
             elif utils.is_str(obj):
 
-                self.__files[element_id] = os.path.normpath(obj)
+                self.__files[element_id] = self.__intern(
+                    os.path.normpath(obj))
 
             else:
                 self.logger.warning(
@@ -260,10 +304,89 @@ class scanner_t(xml.sax.handler.ContentHandler):
             self.logger.error(msg, name, pprint.pformat(list(attrs.keys())))
             raise
 
+    def strings(self):
+        return self.__strings
+
+    def __intern(self, value):
+        if value is None:
+            return None
+        return self.__strings.setdefault(value, value)
+
     def endElement(self, name):
+        if self.__deferred_elements is not None:
+            self.__depth -= 1
         if name in self.deep_declarations:
             self.__inst = None
 
+    def __defer_element(self, name, attrs):
+        """
+        Keep an element, to be read once the File elements are known.
+
+        Return False if the element should be read right away (the root
+        element and the File elements).
+        """
+
+        depth = self.__depth
+        self.__depth += 1
+        if depth == 0 or name == XML_NN_FILE:
+            return False
+        # The attributes of the etree elements are cleared after the end
+        # of the element
+        attrs = dict(attrs)
+        if depth == 1:
+            self.__deferred_elements.append((name, attrs, []))
+        else:
+            self.__deferred_elements[-1][2].append((name, attrs))
+        return True
+
+    def __filter_elements(self, elements):
+        """
+        Return the elements that should be read, in the document order.
+
+        These are the namespaces, the declarations of the files accepted by
+        the location filter, and the elements they refer to (types, base
+        classes, parents...). The declarations of the other files that are
+        used by the kept declarations are kept, but not their members.
+        """
+
+        accepted_files = set(
+            file_id for file_id, file_name in self.__files.items()
+            if self.__location_filter(file_name))
+
+        elements_by_id = {}
+        kept_ids = set()
+        stack = []
+        for element in elements:
+            name, attrs, _ = element
+            element_id = attrs.get(XML_AN_ID)
+            if element_id is None:
+                continue
+            elements_by_id[element_id] = element
+            if name == XML_NN_NAMESPACE or \
+                    attrs.get(XML_AN_FILE) in accepted_files:
+                kept_ids.add(element_id)
+                stack.append(element)
+
+        while stack:
+            _, attrs, children = stack.pop()
+            references = [attrs.get(name) for name in _XML_AN_REFERENCES]
+            for name in _XML_AN_REFERENCE_LISTS:
+                # The bases are written as "_5" or "protected:_5"
+                references.extend(
+                    reference.split(':')[-1]
+                    for reference in attrs.get(name, '').split())
+            references.extend(
+                child_attrs.get(XML_AN_TYPE) for _, child_attrs in children)
+            for reference in references:
+                if reference in kept_ids or reference not in elements_by_id:
+                    continue
+                kept_ids.add(reference)
+                stack.append(elements_by_id[reference])
+
+        return [
+            element for element in elements
+            if element[1].get(XML_AN_ID) in kept_ids]
+
     @staticmethod
     def __read_location_bootstrap(inst, decl, attrs, to_skip):
         """ This function monkey patches the __read_location function to either
@@ -333,11 +456,10 @@ class scanner_t(xml.sax.handler.ContentHandler):
         if isinstance(mangled, bytes) and \
                 mangled.endswith(self.__mangled_suffix):
             mangled = mangled[:self.__mangled_suffix_len]
-        decl.mangled = mangled
+        decl.mangled = self.__intern(mangled)
 
-    @staticmethod
-    def __read_demangled(decl, attrs):
-        decl.demangled = attrs.get(XML_AN_DEMANGLED)
+    def __read_demangled(self, decl, attrs):
+        decl.demangled = self.__intern(attrs.get(XML_AN_DEMANGLED))
 
     def __read_attributes(self, decl, attrs):
         attribute = attrs.get(XML_AN_ATTRIBUTES)
@@ -348,7 +470,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
                 return
             if "__thiscall__" in attribute:
                 attribute = attribute.replace("__thiscall__ ", "")
-        decl.attributes = attribute
+        decl.attributes = self.__intern(attribute)
 
     def __read_access(self, attrs):
         self.__access[attrs[XML_AN_ID]] = \
@@ -390,21 +512,23 @@ class scanner_t(xml.sax.handler.ContentHandler):
             # that is almost true: gcc mangale name using top file name.
             # almost all files has '.' in name
             ns_name = ''
-        return self.__decl_factory.create_namespace(name=ns_name)
+        return self.__decl_factory.create_namespace(
+            name=self.__intern(ns_name))
 
     def __read_enumeration(self, attrs):
         enum_name = attrs.get(XML_AN_NAME, '')
         if '$_' in enum_name or '._' in enum_name:
             # it means that this is unnamed enum. in c++ enum{ x };
             enum_name = ''
-        decl = self.__decl_factory.create_enumeration(name=enum_name)
+        decl = self.__decl_factory.create_enumeration(
+            name=self.__intern(enum_name))
         self.__read_byte_size(decl, attrs)
         self.__read_byte_align(decl, attrs)
         self.__enums.append(decl)
         return decl
 
     def __read_enumeration_value(self, attrs):
-        name = attrs.get(XML_AN_NAME, '')
+        name = self.__intern(attrs.get(XML_AN_NAME, ''))
         num = int(attrs[XML_AN_INIT])
         self.__inst.append_value(name, num)
 
@@ -488,12 +612,12 @@ class scanner_t(xml.sax.handler.ContentHandler):
             self.__inst.arguments_types.append(attrs[XML_AN_TYPE])
         else:
             argument = declarations.argument_t()
-            argument.name = attrs.get(
+            argument.name = self.__intern(attrs.get(
                 XML_AN_NAME,
                 'arg%d' % len(
-                    self.__inst.arguments))
+                    self.__inst.arguments)))
             argument.decl_type = attrs[XML_AN_TYPE]
-            argument.default_value = attrs.get(XML_AN_DEFAULT)
+            argument.default_value = self.__intern(attrs.get(XML_AN_DEFAULT))
             self.__read_attributes(argument, attrs)
             if 'CastXML' not in utils.xml_generator:
                 # GCCXML only
@@ -513,7 +637,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
         calldef.return_type = attrs.get(XML_AN_RETURNS)
         if is_declaration:
             self.__calldefs.append(calldef)
-            calldef.name = attrs.get(XML_AN_NAME, '')
+            calldef.name = self.__intern(attrs.get(XML_AN_NAME, ''))
             calldef.has_extern = attrs.get(XML_AN_EXTERN, False)
             calldef.has_inline = bool(attrs.get(XML_AN_INLINE, "") == "1")
             throw_stmt = attrs.get(XML_AN_THROW)
@@ -553,9 +677,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
 
     def __read_typedef(self, attrs):
         return self.__decl_factory.create_typedef(
-            name=attrs.get(
-                XML_AN_NAME,
-                ''),
+            name=self.__intern(attrs.get(XML_AN_NAME, '')),
             decl_type=attrs[XML_AN_TYPE])
 
     def __read_variable(self, attrs):
@@ -566,9 +688,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
         if bits:
             bits = int(bits)
         decl = self.__decl_factory.create_variable(
-            name=attrs.get(
-                XML_AN_NAME,
-                ''),
+            name=self.__intern(attrs.get(XML_AN_NAME, '')),
             decl_type=attrs[XML_AN_TYPE],
             type_qualifiers=type_qualifiers,
             value=attrs.get(
@@ -583,6 +703,7 @@ class scanner_t(xml.sax.handler.ContentHandler):
         name = attrs.get(XML_AN_NAME, '')
         if '$' in name or '.' in name:
             name = ''
+        name = self.__intern(name)
         if XML_AN_INCOMPLETE in attrs:
             decl = self.__decl_factory.create_class_declaration(name=name)
         else:
@@ -627,25 +748,25 @@ class scanner_t(xml.sax.handler.ContentHandler):
     def __read_destructor(self, attrs):
         destructor = self.__decl_factory.create_destructor()
         self.__read_member_function(destructor, attrs, True)
-        destructor.name = '~' + destructor.name
+        destructor.name = self.__intern('~' + destructor.name)
         return destructor
 
     def __read_free_operator(self, attrs):
         operator = self.__decl_factory.create_free_operator()
         self.__read_member_function(operator, attrs, True)
         if 'new' in operator.name or 'delete' in operator.name:
-            operator.name = 'operator ' + operator.name
+            operator.name = self.__intern('operator ' + operator.name)
         else:
-            operator.name = 'operator' + operator.name
+            operator.name = self.__intern('operator' + operator.name)
         return operator
 
     def __read_member_operator(self, attrs):
         operator = self.__decl_factory.create_member_operator()
         self.__read_member_function(operator, attrs, True)
         if 'new' in operator.name or 'delete' in operator.name:
-            operator.name = 'operator ' + operator.name
+            operator.name = self.__intern('operator ' + operator.name)
         else:
-            operator.name = 'operator' + operator.name
+            operator.name = self.__intern('operator' + operator.name)
         return operator
 
     @staticmethod
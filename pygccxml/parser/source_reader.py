@@ -15,7 +15,14 @@ from . import config
 from . import patcher
 from . import declarations_cache
 from . import declarations_joiner
+from . import interning
+from . import type_table
 from .etree_scanner import ietree_scanner_t as scanner_t
+from .expat_scanner import expat_scanner_t
+from . import pgx_scanner
+from . import xml_compression
+from . import metrics
+from . import precompiled_header
 
 from .. import utils
 
@@ -40,7 +47,13 @@ class source_reader_t(object):
         generated ids with references to declarations or type class instances.
     """
 
-    def __init__(self, configuration, cache=None, decl_factory=None):
+    def __init__(
+            self,
+            configuration,
+            cache=None,
+            decl_factory=None,
+            strings=None,
+            metrics=None):
         """
         :param configuration:
                        Instance of :class:`xml_generator_configuration_t`
@@ -54,6 +67,15 @@ class source_reader_t(object):
                              declarations factory( :class:`decl_factory_t` )
                              will be used.
 
+        :param strings: Strings table used to intern the names, file names
+                        and attributes of the declarations. It can be shared
+                        between readers; a new table is used if not given.
+        :type strings: dict
+
+        :param metrics: Timings and counters filled while the files are
+                        parsed, if given.
+        :type metrics: :class:`metrics_t`
+
         """
 
         self.logger = utils.loggers.cxx_parser
@@ -64,11 +86,15 @@ class source_reader_t(object):
         self.__search_directories.extend(configuration.include_paths)
         if not cache:
             cache = declarations_cache.dummy_cache_t()
-        self.__dcache = cache
+        self.__dcache = declarations_cache.checked_cache(cache, configuration)
         self.__config.raise_on_wrong_settings()
         self.__decl_factory = decl_factory
         if not decl_factory:
             self.__decl_factory = declarations.decl_factory_t()
+        if strings is None:
+            strings = {}
+        self.__strings = strings
+        self.__metrics = metrics
 
     def __create_command_line(self, source_file, xml_file):
         """
@@ -104,7 +130,8 @@ class source_reader_t(object):
 
         return cmd
 
-    def __create_command_line_castxml(self, source_file, xmlfile):
+    def __create_command_line_castxml(
+            self, source_file, xmlfile, prefix_header_flags=None):
 
         cmd = self.__create_command_line_common()
 
@@ -157,6 +184,12 @@ class source_reader_t(object):
         # Add symbols
         cmd = self.__add_symbols(cmd)
 
+        # The prefix header, or its precompiled header
+        if prefix_header_flags is None:
+            prefix_header_flags = self.__prefix_header_flags()
+        if prefix_header_flags:
+            cmd.append(prefix_header_flags)
+
         # The destination file
         cmd.append('-o %s' % xmlfile)
         # The source file
@@ -200,6 +233,11 @@ class source_reader_t(object):
         # Add symbols
         cmd = self.__add_symbols(cmd)
 
+        # The prefix header
+        prefix_header_flags = self.__prefix_header_flags()
+        if prefix_header_flags:
+            cmd.append(prefix_header_flags)
+
         # fourth source file
         cmd.append('"%s"' % source_file)
         # five destination file
@@ -234,6 +272,46 @@ class source_reader_t(object):
 
         return cmd
 
+    def __prefix_header_flags(self):
+        """
+        Return the flags including the prefix header, or its precompiled
+        header. See :mod:`precompiled_header`.
+
+        """
+
+        if not self.__config.prefix_header:
+            return ""
+        return precompiled_header.include_flags(
+            self.__config,
+            self.__dcache.directory,
+            self.__check_precompiled_header)
+
+    def __check_precompiled_header(self, prefix_header_flags):
+        """
+        Run CastXML on an empty file with the flags loading a precompiled
+        header, and return its errors, or None if it can load it.
+
+        """
+
+        source_file = utils.create_temp_file_name(suffix=".cpp")
+        xml_file = utils.create_temp_file_name(suffix=".xml")
+        try:
+            command_line = self.__create_command_line_castxml(
+                source_file, xml_file, prefix_header_flags)
+            process = subprocess.Popen(
+                args=command_line,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+            output = process.communicate()[0].decode("utf-8", "replace")
+        finally:
+            os.remove(source_file)
+            if os.path.exists(xml_file):
+                os.remove(xml_file)
+        if process.returncode != 0:
+            return output or "exit status %d" % process.returncode
+        return None
+
     def create_xml_file(self, source_file, destination=None):
         """
         This method will generate a xml file using an external tool.
@@ -245,23 +323,34 @@ class source_reader_t(object):
         :type source_file: str
 
         :param destination: if given, will be used as target file path for
-                            GCC-XML or CastXML.
+                            GCC-XML or CastXML. The file is compressed if
+                            its extension is ".gz", ".bz2" or ".xz".
         :type destination: str
 
         :rtype: path to xml file.
 
         """
 
+        ffname = source_file
+        if not os.path.isabs(ffname):
+            ffname = self.__file_full_name(source_file)
+        with self.__measure(metrics.metrics_t.XML_GENERATION, ffname):
+            return self.__create_xml_file(ffname, destination)
+
+    def __create_xml_file(self, ffname, destination):
         xml_file = destination
         # If file specified, remove it to start else create new file name
         if xml_file:
             utils.remove_file_no_raise(xml_file, self.__config)
         else:
-            xml_file = utils.create_temp_file_name(suffix='.xml')
+            xml_file = utils.create_temp_file_name(
+                suffix=xml_compression.xml_file_suffix(self.__config))
+
+        compression = xml_compression.file_compression(xml_file)
+        if compression and self.__config.xml_generator == "castxml":
+            self.__create_compressed_xml_file(ffname, xml_file)
+            return xml_file
 
-        ffname = source_file
-        if not os.path.isabs(ffname):
-            ffname = self.__file_full_name(source_file)
         command_line = self.__create_command_line(ffname, xml_file)
 
         process = subprocess.Popen(
@@ -279,36 +368,107 @@ class source_reader_t(object):
                 if line.strip():
                     gccxml_reports.append(line.rstrip())
 
-            exit_status = process.returncode
-            gccxml_msg = os.linesep.join([str(s) for s in gccxml_reports])
-            if self.__config.ignore_gccxml_output:
-                if not os.path.isfile(xml_file):
-                    raise RuntimeError(
-                        "Error occurred while running " +
-                        self.__config.xml_generator.upper() +
-                        ": %s status:%s" %
-                        (gccxml_msg, exit_status))
-            else:
-                if gccxml_msg or exit_status or not \
-                        os.path.isfile(xml_file):
-                    if not os.path.isfile(xml_file):
-                        raise RuntimeError(
-                            "Error occurred while running " +
-                            self.__config.xml_generator.upper() +
-                            " xml file does not exist")
-                    else:
-                        raise RuntimeError(
-                            "Error occurred while running " +
-                            self.__config.xml_generator.upper() +
-                            ": %s status:%s" % (gccxml_msg, exit_status))
+            check_xml_generator_output(
+                self.__config, xml_file, gccxml_reports, process.returncode)
         except Exception:
             utils.remove_file_no_raise(xml_file, self.__config)
             raise
         finally:
             process.wait()
             process.stdout.close()
+        if compression:
+            # GCC-XML can not write its output to a pipe
+            xml_compression.compress_file(xml_file)
         return xml_file
 
+    def __create_compressed_xml_file(self, source_file, xml_file):
+        """
+        Run CastXML and compress its output while it is being generated.
+
+        CastXML writes the xml to its standard output, which is compressed
+        to `xml_file`.
+
+        """
+
+        command_line = self.__create_command_line(source_file, '-')
+
+        process = subprocess.Popen(
+            args=command_line,
+            shell=True,
+            stdout=subprocess.PIPE)
+
+        try:
+            try:
+                xml_compression.write_file(xml_file, process.stdout)
+            finally:
+                process.wait()
+                process.stdout.close()
+            check_xml_generator_output(
+                self.__config, xml_file, [], process.returncode)
+        except Exception:
+            utils.remove_file_no_raise(xml_file, self.__config)
+            raise
+
+    def __streams_xml(self):
+        """
+        Return True if the xml generator output can be read from a pipe.
+
+        The xml file is needed when it should be kept, and gccxml can not
+        write its output to the standard output.
+
+        """
+
+        return bool(self.__config.stream_xml) and \
+            not self.__config.keep_xml and \
+            self.__config.xml_generator == "castxml"
+
+    def __parse_xml_stream(self, source_file):
+        """
+        Run CastXML and scan its output while it is being generated.
+
+        CastXML writes the xml to its standard output, which is directly
+        consumed by the scanner; no temporary xml file is created.
+
+        :param source_file: full path to the source file that should be parsed.
+        :type source_file: str
+
+        :rtype: declarations and included files, like
+                :meth:`__parse_xml_file`
+
+        """
+
+        command_line = self.__create_command_line(source_file, '-')
+
+        process = subprocess.Popen(
+            args=command_line,
+            shell=True,
+            stdout=subprocess.PIPE)
+
+        try:
+            try:
+                result = self.__parse_xml_file(process.stdout, source_file)
+            finally:
+                # Do not let CastXML block on a full pipe if the scanner
+                # stopped early
+                process.stdout.read()
+                process.wait()
+        except Exception:
+            if process.returncode:
+                raise RuntimeError(
+                    "Error occurred while running " +
+                    self.__config.xml_generator.upper() +
+                    ": status:%s" % process.returncode)
+            raise
+        finally:
+            process.stdout.close()
+
+        if process.returncode and not self.__config.ignore_gccxml_output:
+            raise RuntimeError(
+                "Error occurred while running " +
+                self.__config.xml_generator.upper() +
+                ": status:%s" % process.returncode)
+        return result
+
     def create_xml_file_from_string(self, content, destination=None):
         """
         Creates XML file from text.
@@ -347,12 +507,15 @@ class source_reader_t(object):
         try:
             ffname = self.__file_full_name(source_file)
             self.logger.debug("Reading source file: [%s].", ffname)
-            decls = self.__dcache.cached_value(ffname, self.__config)
+            decls = self.__cached_value(ffname)
             if not decls:
                 self.logger.debug(
                     "File has not been found in cache, parsing...")
-                xml_file = self.create_xml_file(ffname)
-                decls, files = self.__parse_xml_file(xml_file)
+                if self.__streams_xml():
+                    decls, files = self.__parse_xml_stream(ffname)
+                else:
+                    xml_file = self.create_xml_file(ffname)
+                    decls, files = self.__parse_xml_file(xml_file, ffname)
                 self.__dcache.update(
                     ffname, self.__config, decls, files)
             else:
@@ -372,7 +535,10 @@ class source_reader_t(object):
         """
         Read generated XML file.
 
-        :param xml_file: path to xml file
+        :param xml_file: path to xml file, or to a .pgx file created by
+                         :func:`create_pgx_file`. The xml files whose
+                         extension is ".gz", ".bz2" or ".xz" are
+                         decompressed while they are read.
         :type xml_file: str
 
         :rtype: declarations tree
@@ -383,7 +549,7 @@ class source_reader_t(object):
 
         ffname = self.__file_full_name(xml_file)
         self.logger.debug("Reading xml file: [%s]", xml_file)
-        decls = self.__dcache.cached_value(ffname, self.__config)
+        decls = self.__cached_value(ffname)
         if not decls:
             self.logger.debug("File has not been found in cache, parsing...")
             decls, _ = self.__parse_xml_file(ffname)
@@ -394,6 +560,29 @@ class source_reader_t(object):
 
         return decls
 
+    def read_cached_file(self, file_):
+        """
+        Return the cached declarations of a source or xml file.
+
+        :param file_: path to the C++ source file or to the xml file
+        :type file_: str
+
+        :rtype: declarations tree or None if the file is not cached
+
+        """
+
+        ffname = self.__file_full_name(file_)
+        return self.__cached_value(ffname)
+
+    def __cached_value(self, ffname):
+        with self.__measure(metrics.metrics_t.CACHE_LOAD, ffname):
+            decls = self.__dcache.cached_value(ffname, self.__config)
+        if decls:
+            # Share the strings of the cached declarations with the
+            # declarations read by this reader
+            interning.intern_declarations(decls, self.__strings)
+        return decls
+
     def read_string(self, content):
         """
         Reads a Python string that contains C++ code, and return
@@ -414,6 +603,77 @@ class source_reader_t(object):
 
         return decls
 
+    def __async_context(self, executor=None):
+        from . import async_reader
+        return async_reader.reader_context_t(
+            config=self.__config,
+            cache=self.__dcache,
+            cached_value=self.__cached_value,
+            file_full_name=self.__file_full_name,
+            create_command_line=self.__create_command_line,
+            parse_xml_file=self.__parse_xml_file,
+            measure=self.__measure,
+            streams_xml=self.__streams_xml(),
+            executor=executor)
+
+    def acreate_xml_file(self, source_file, destination=None):
+        """
+        Coroutine version of :meth:`create_xml_file`.
+
+        The xml generator is run as an asyncio subprocess.
+        Requires Python 3.5 or newer.
+
+        """
+
+        from . import async_reader
+        return async_reader.create_xml_file(
+            self.__async_context(), source_file, destination)
+
+    def aread_file(self, source_file, executor=None):
+        """
+        Coroutine version of :meth:`read_file`.
+
+        The xml generator is run as an asyncio subprocess, and its output is
+        scanned and linked in the `executor` (the default executor of the
+        event loop if None). Requires Python 3.5 or newer.
+
+        :param source_file: path to C++ source file
+        :type source_file: str
+
+        :param executor: executor used for the CPU bound steps
+        :type executor: :class:`concurrent.futures.Executor`
+
+        """
+
+        from . import async_reader
+        return async_reader.read_cpp_source_file(
+            self.__async_context(executor), source_file)
+
+    def aread_xml_file(self, xml_file, executor=None):
+        """
+        Coroutine version of :meth:`read_xml_file`.
+
+        The xml file is scanned and linked in the `executor` (the default
+        executor of the event loop if None). Requires Python 3.5 or newer.
+
+        """
+
+        from . import async_reader
+        return async_reader.read_xml_file(
+            self.__async_context(executor), xml_file)
+
+    def aread_string(self, content, executor=None):
+        """
+        Coroutine version of :meth:`read_string`.
+
+        Requires Python 3.5 or newer.
+
+        """
+
+        from . import async_reader
+        return async_reader.read_string(
+            self.__async_context(executor), content)
+
     def __file_full_name(self, file_):
         if os.path.isfile(file_):
             return file_
@@ -423,26 +683,69 @@ class source_reader_t(object):
                 return file_path
         raise RuntimeError("pygccxml error: file '%s' does not exist" % file_)
 
-    def __parse_xml_file(self, xml_file):
-        scanner_ = scanner_t(xml_file, self.__decl_factory, self.__config)
-        scanner_.read()
+    def __measure(self, phase, file_name=None):
+        return metrics.measure(self.__metrics, phase, file_name)
+
+    def __parse_xml_file(self, xml_file, file_name=None):
+        """
+        Scan, link and patch an xml file.
+
+        `file_name` is the file the metrics are recorded for: the source
+        file, or by default the xml file.
+
+        """
+
+        if file_name is None and utils.is_str(xml_file):
+            file_name = xml_file
+        if utils.is_str(xml_file) and \
+                xml_compression.file_compression(xml_file):
+            # The scanner reads the decompressed stream
+            stream = xml_compression.open_file(xml_file)
+            try:
+                return self.__parse_xml_file(stream, file_name)
+            finally:
+                stream.close()
+
+        if pgx_scanner.is_pgx_file(xml_file):
+            scanner_class = pgx_scanner.pgx_scanner_t
+        elif self.__config.xml_scanner == "expat":
+            scanner_class = expat_scanner_t
+        else:
+            scanner_class = scanner_t
+        scanner_ = scanner_class(
+            xml_file, self.__decl_factory, self.__config, self.__strings)
+        with self.__measure(metrics.metrics_t.SCANNING, file_name):
+            scanner_.read()
         decls = scanner_.declarations()
         types = scanner_.types()
         files = scanner_.files()
-        linker_ = linker.linker_t(
-            decls=decls,
-            types=types,
-            access=scanner_.access(),
-            membership=scanner_.members(),
-            files=files)
-        for type_ in list(types.values()):
-            # I need this copy because internaly linker change types collection
-            linker_.instance = type_
-            declarations.apply_visitor(linker_, type_)
-        for decl in decls.values():
-            linker_.instance = decl
-            declarations.apply_visitor(linker_, decl)
-        declarations_joiner.bind_aliases(iter(decls.values()))
+        if self.__metrics is not None and file_name is not None:
+            self.__metrics.count(file_name, len(decls), len(types))
+        lazy_linking = self.__config.lazy_linking
+        with self.__measure(metrics.metrics_t.LINKING, file_name):
+            linker_ = linker.linker_t(
+                decls=decls,
+                types=types,
+                access=scanner_.access(),
+                membership=scanner_.members(),
+                files=files,
+                lazy=lazy_linking)
+            if not lazy_linking:
+                for type_ in list(types.values()):
+                    # I need this copy because internaly linker change types
+                    # collection
+                    linker_.instance = type_
+                    declarations.apply_visitor(linker_, type_)
+            for decl in decls.values():
+                linker_.instance = decl
+                declarations.apply_visitor(linker_, decl)
+            if not lazy_linking:
+                # Share the structurally identical types (cv-qualified
+                # types written twice, declarated_t nodes of the same
+                # declaration...)
+                type_table.type_table_t().intern_declarations(
+                    decls.values())
+            declarations_joiner.bind_aliases(iter(decls.values()))
 
         # some times gccxml report typedefs defined in no namespace
         # it happens for example in next situation
@@ -450,8 +753,9 @@ class source_reader_t(object):
         # void ddd(){ typedef typename X::Y YY;}
         # if I will fail on this bug next time, the right way to fix it may be
         # different
-        patcher.fix_calldef_decls(scanner_.calldefs(), scanner_.enums(),
-                                  self.__cxx_std)
+        with self.__measure(metrics.metrics_t.PATCHING, file_name):
+            patcher.fix_calldef_decls(
+                scanner_.calldefs(), scanner_.enums(), self.__cxx_std)
         decls = [inst for inst in iter(decls.values()) if self.__check(inst)]
         return decls, list(files.values())
 
@@ -482,3 +786,44 @@ def bind_aliases(decls):
         "The bind_aliases function is deprecated", DeprecationWarning)
 
     declarations_joiner.bind_aliases(decls)
+
+
+def check_xml_generator_output(config, xml_file, reports, exit_status):
+    """
+    Raise a RuntimeError if the xml generator run was not successful.
+
+    :param config: the configuration used to run the xml generator
+    :type config: :class:`xml_generator_configuration_t`
+
+    :param xml_file: path to the xml file written by the xml generator
+    :type xml_file: str
+
+    :param reports: lines written by the xml generator on its output
+    :type reports: list
+
+    :param exit_status: exit status of the xml generator
+    :type exit_status: int
+
+    """
+
+    gccxml_msg = os.linesep.join([str(s) for s in reports])
+    if config.ignore_gccxml_output:
+        if not os.path.isfile(xml_file):
+            raise RuntimeError(
+                "Error occurred while running " +
+                config.xml_generator.upper() +
+                ": %s status:%s" %
+                (gccxml_msg, exit_status))
+    else:
+        if gccxml_msg or exit_status or not \
+                os.path.isfile(xml_file):
+            if not os.path.isfile(xml_file):
+                raise RuntimeError(
+                    "Error occurred while running " +
+                    config.xml_generator.upper() +
+                    " xml file does not exist")
+            else:
+                raise RuntimeError(
+                    "Error occurred while running " +
+                    config.xml_generator.upper() +
+                    ": %s status:%s" % (gccxml_msg, exit_status))
@@ -0,0 +1,187 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+sqlite cache implementation.
+
+This module contains the implementation of a cache that stores the cached
+contents in a sqlite database. The database can be shared by several
+processes: each record is read and written in its own transaction, and
+the database uses the write-ahead log journal mode, so that readers do not
+block the writer.
+
+The :class:`parser.sqlite_cache_t` class instance could be passed as the
+`cache` argument of the :func:`parser.parse` function.
+"""
+
+import os
+import sqlite3
+import threading
+
+from . import declarations_cache
+from .. import utils
+
+
+class sqlite_cache_t(declarations_cache.cache_base_t):
+
+    """cache class that stores its data in a sqlite database.
+
+    The `records` table contains one row per record, keyed like the records
+    of :class:`parser.file_cache_t` (see :meth:`record_t.create_key`). The
+    declarations of a record are stored as a pickle (or using the compact
+    format of :mod:`declarations_serializer`), which is only loaded when the
+    record is looked up.
+
+    The `dependencies` table contains the signatures of the files included
+    by each record. It is used to check whether a record is still valid.
+    """
+
+    def __init__(self, name, timeout=60.0, compact=False):
+        """
+        :param name: name of the database file, it is created, if it does
+                     not exist
+
+        :param timeout: number of seconds to wait for another process that
+                        is writing to the database
+
+        :param compact: if `True`, the declarations are stored using the
+                        format of :mod:`declarations_serializer` instead of
+                        pickle
+        """
+
+        declarations_cache.cache_base_t.__init__(self)
+        self.__name = name
+        self.__compact = compact
+
+        # The connection may be used from several threads (for example by
+        # project_reader_t.aread_files), the accesses are serialized.
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(
+            name, timeout=timeout, check_same_thread=False)
+        with self.__lock:
+            self.__create_tables()
+
+    def __create_tables(self):
+        connection = self.__connection
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "source_signature TEXT NOT NULL, "
+                "config_signature TEXT NOT NULL, "
+                "xml_generator TEXT, "
+                "declarations BLOB NOT NULL, "
+                "PRIMARY KEY (source_signature, config_signature))")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS dependencies ("
+                "source_signature TEXT NOT NULL, "
+                "config_signature TEXT NOT NULL, "
+                "file_name TEXT NOT NULL, "
+                "file_signature TEXT)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS dependencies_record "
+                "ON dependencies (source_signature, config_signature)")
+
+    @property
+    def directory(self):
+        if self.__name == ":memory:":
+            return None
+        return os.path.dirname(os.path.abspath(self.__name))
+
+    def flush(self):
+        # The records are written to the database by update()
+        pass
+
+    def close(self):
+        """Close the connection to the database."""
+
+        with self.__lock:
+            self.__connection.close()
+
+    def update(self, source_file, configuration, declarations, included_files):
+        """Replace a cache entry by a new value.
+
+        :param source_file: a C++ source file name.
+        :type source_file: str
+        :param configuration: configuration object.
+        :type configuration: :class:`xml_generator_configuration_t`
+        :param declarations: declarations contained in the `source_file`
+        :type declarations: pickable object
+        :param included_files: included files
+        :type included_files: list of str
+        """
+
+        key = declarations_cache.record_t.create_key(
+            source_file, configuration)
+        if key[0] is None:
+            # The source file does not exist, it can not be cached
+            return
+        dependencies = [
+            key + (name, declarations_cache.file_signature(name))
+            for name in included_files]
+        data = declarations_cache.dumps_declarations(
+            declarations, self.__compact)
+
+        with self.__lock:
+            with self.__connection as connection:
+                self.__remove_record(key)
+                connection.execute(
+                    "INSERT INTO records VALUES (?, ?, ?, ?)",
+                    key + (utils.xml_generator, sqlite3.Binary(data)))
+                connection.executemany(
+                    "INSERT INTO dependencies VALUES (?, ?, ?, ?)",
+                    dependencies)
+
+    def cached_value(self, source_file, configuration):
+        """Return the cached declarations or None.
+
+        :param source_file: Header file name
+        :type source_file: str
+        :param configuration: Configuration object
+        :type configuration: :class:`parser.xml_generator_configuration_t`
+        :rtype: Cached declarations or None
+        """
+
+        key = declarations_cache.record_t.create_key(
+            source_file, configuration)
+
+        with self.__lock:
+            dependencies = self.__connection.execute(
+                "SELECT file_name, file_signature FROM dependencies "
+                "WHERE source_signature = ? AND config_signature = ?",
+                key).fetchall()
+            for name, signature in dependencies:
+                if declarations_cache.file_signature(name) != signature:
+                    # some file has been changed
+                    with self.__connection:
+                        self.__remove_record(key)
+                    return None
+
+            row = self.__connection.execute(
+                "SELECT xml_generator, declarations FROM records "
+                "WHERE source_signature = ? AND config_signature = ?",
+                key).fetchone()
+        if row is None:
+            return None
+
+        xml_generator, data = row
+        if utils.xml_generator is None:
+            # Set the xml_generator to the one read in the cache
+            utils.xml_generator = xml_generator
+        elif utils.xml_generator != xml_generator:
+            msg = (
+                "The %s cache was generated with a different xml " +
+                "generator. Please regenerate it.") % self.__name
+            raise RuntimeError(msg)
+        return declarations_cache.loads_declarations(bytes(data))
+
+    def __remove_record(self, key):
+        self.__connection.execute(
+            "DELETE FROM records "
+            "WHERE source_signature = ? AND config_signature = ?", key)
+        self.__connection.execute(
+            "DELETE FROM dependencies "
+            "WHERE source_signature = ? AND config_signature = ?", key)
@@ -0,0 +1,147 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+from pygccxml import declarations
+
+
+class type_table_t(object):
+
+    """
+    Hash-consing table of the type nodes.
+
+    The xml generators write one element for each type of a translation
+    unit, and the linker creates one node for each of them (and one
+    `declarated_t` node for each declaration used as a type). Structurally
+    identical types, from the same or from different translation units, are
+    distinct objects.
+
+    This table maps the structure of a type to a single shared node: the
+    class of the node, its attributes and the identity of its (already
+    interned) children. After :meth:`intern_declarations`, the types of
+    the tree that are structurally identical are the same object, so the
+    decl strings and the results of the type traits cached on a node are
+    shared, and the pickled trees are smaller.
+
+    The `declarated_t` nodes are keyed by the identity of their
+    declaration: a table should not be used anymore once the tree has been
+    relinked (see :class:`project_reader_t`).
+
+    The shared nodes must not be modified: :func:`remove_alias` and the
+    other type traits clone the types they change.
+    """
+
+    def __init__(self):
+        object.__init__(self)
+        # key -> (shared node, children of the node)
+        self.__nodes = {}
+
+    def __len__(self):
+        return len(self.__nodes)
+
+    def intern(self, type_):
+        """
+        Return the shared node of a type.
+
+        :param type_: the type
+        :type type_: :class:`type_t`
+
+        :rtype: :class:`type_t`
+        """
+
+        return self.__intern(type_, {})
+
+    def intern_declarations(self, decls):
+        """
+        Replace the types used by declarations by their shared node.
+
+        :param decls: all the declarations (see :func:`make_flatten`)
+        :type decls: list of :class:`declaration_t`
+
+        """
+
+        interned = {}
+        intern = self.__intern
+        for decl in decls:
+            if isinstance(decl, (
+                    declarations.typedef_t, declarations.variable_t)):
+                decl.decl_type = intern(decl.decl_type, interned)
+            elif isinstance(decl, declarations.calldef_t):
+                decl.return_type = intern(decl.return_type, interned)
+                for argument in decl.arguments:
+                    argument.decl_type = intern(argument.decl_type, interned)
+                for i, exception in enumerate(decl.exceptions):
+                    if isinstance(exception, declarations.type_t):
+                        decl.exceptions[i] = intern(exception, interned)
+
+    def __intern(self, type_, interned):
+        """
+        Intern a type and its children.
+
+        `interned` maps the id of the nodes already seen during this pass
+        to the node and its shared node. The node is kept so that its id
+        is not reused during the pass.
+
+        """
+
+        if not isinstance(type_, declarations.type_t) or \
+                isinstance(type_, declarations.fundamental_t):
+            # The fundamental types are already shared
+            return type_
+        seen = interned.get(id(type_))
+        if seen is not None:
+            return seen[1]
+
+        # The children are compared by identity, the values by equality
+        values = ()
+        if isinstance(type_, declarations.declarated_t):
+            children = (type_.declaration,)
+        elif isinstance(type_, declarations.member_variable_type_t):
+            type_.base = self.__intern(type_.base, interned)
+            type_.variable_type = self.__intern(
+                type_.variable_type, interned)
+            children = (type_.base, type_.variable_type)
+        elif isinstance(type_, declarations.array_t):
+            type_.base = self.__intern(type_.base, interned)
+            children = (type_.base,)
+            values = (type_.size,)
+        elif isinstance(type_, declarations.compound_t):
+            type_.base = self.__intern(type_.base, interned)
+            children = (type_.base,)
+        elif isinstance(type_, declarations.calldef_type_t):
+            type_.return_type = self.__intern(type_.return_type, interned)
+            type_.arguments_types = [
+                self.__intern(argument_type, interned)
+                for argument_type in type_.arguments_types]
+            children = (type_.return_type,) + tuple(type_.arguments_types)
+            if isinstance(type_, declarations.member_function_type_t):
+                type_.class_inst = self.__intern(type_.class_inst, interned)
+                children += (type_.class_inst,)
+                values = (type_.has_const,)
+        elif isinstance(type_, declarations.dummy_type_t):
+            children = ()
+            values = (type_.decl_string,)
+        elif isinstance(
+                type_, (declarations.unknown_t, declarations.ellipsis_t)):
+            children = ()
+        else:
+            # Unknown type class, it is not shared
+            interned[id(type_)] = (type_, type_)
+            return type_
+
+        key = (
+            type_.__class__,
+            type_.byte_size,
+            type_.byte_align,
+            values,
+            tuple(id(child) for child in children))
+        node = self.__nodes.get(key)
+        if node is None:
+            # The children are kept so that their id is not reused
+            self.__nodes[key] = (type_, children)
+            shared = type_
+        else:
+            shared = node[0]
+        interned[id(type_)] = (type_, shared)
+        return shared
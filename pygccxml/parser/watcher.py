@@ -0,0 +1,339 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Watch mode: keep the declarations of a project up to date.
+
+A :class:`watcher_t` watches the files each file of a :class:`project_t`
+depends on (the files of its declarations, which are also the included
+files recorded by the declarations cache). When some of them are
+modified, it waits until they have not been modified for a short time,
+refreshes the project, which only parses again the affected files, and
+publishes the declarations which have been added, removed and changed.
+
+On Linux, the directories of the files are watched with inotify. On the
+other platforms, or when inotify can not be used (e.g. too many watches),
+the files are polled with `stat`.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from .. import utils
+
+
+class watcher_t(object):
+
+    """
+    Refresh a :class:`project_t` when its files are modified.
+
+    The watcher either runs in a thread (:meth:`start` and :meth:`stop`),
+    or is driven by the caller with :meth:`run_once`. The `callback` is
+    called with the :class:`update_t` of each refresh which parsed files
+    again.
+
+    The declarations tree of the project is modified by the thread of the
+    watcher: the other threads should hold the :attr:`lock` while they use
+    it.
+    """
+
+    def __init__(
+            self,
+            project,
+            callback=None,
+            debounce=0.2,
+            interval=1.0,
+            use_inotify=True):
+        """
+        :param project: the project to keep up to date
+        :type project: :class:`project_t`
+
+        :param callback: function called with each :class:`update_t`
+
+        :param debounce: time, in seconds, without modification after
+                         which the project is refreshed
+        :type debounce: float
+
+        :param interval: period, in seconds, of the polling of the files
+                         when inotify is not used, and of the checks of
+                         :meth:`stop`
+        :type interval: float
+
+        :param use_inotify: use inotify if it is available
+        :type use_inotify: bool
+
+        """
+
+        object.__init__(self)
+        self.logger = utils.loggers.cxx_parser
+        self.project = project
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.__notifier = None
+        if use_inotify:
+            try:
+                self.__notifier = _inotify_t()
+            except (OSError, AttributeError) as error:
+                self.logger.debug(
+                    "inotify is not available, the files are polled: %s",
+                    error)
+        if self.__notifier is None:
+            self.__notifier = _poller_t(interval)
+        self.__notifier.watch(self.__dependencies())
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    @property
+    def uses_inotify(self):
+        """True if the files are watched with inotify."""
+        return isinstance(self.__notifier, _inotify_t)
+
+    def run_once(self, timeout=None):
+        """
+        Wait until files are modified, debounce the modifications and
+        refresh the project.
+
+        An error of the refresh (e.g. a header being edited does not
+        compile) is logged, and the project is left as it was: the files
+        are parsed again at the next modification.
+
+        :param timeout: maximum time to wait for a modification, in
+                        seconds (None=wait forever)
+        :type timeout: float
+
+        :rtype: :class:`update_t`, or None if no file was parsed again
+        """
+
+        if not self.__notifier.wait(timeout):
+            return None
+        while self.__notifier.wait(self.debounce):
+            pass
+        with self.lock:
+            try:
+                update = self.project.update()
+            except Exception:
+                self.logger.exception("The project could not be refreshed")
+                return None
+            if update.files:
+                self.__notifier.watch(self.__dependencies())
+        if not update.files:
+            return None
+        self.logger.info("Project updated: %r", update)
+        if self.callback is not None:
+            self.callback(update)
+        return update
+
+    def start(self):
+        """Watch the files in a thread."""
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the thread started by :meth:`start`."""
+
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def close(self):
+        """Stop watching the files."""
+
+        self.stop()
+        self.__notifier.close()
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            self.run_once(self.interval)
+
+    def __dependencies(self):
+        file_names = set()
+        for prj_file in self.project.files:
+            file_names.update(self.project.dependencies(prj_file))
+        return [os.path.abspath(file_name) for file_name in file_names]
+
+
+class _poller_t(object):
+
+    """Implementation detail: detect the modified files with `stat`."""
+
+    def __init__(self, interval):
+        object.__init__(self)
+        self.__interval = interval
+        # file name -> stat key of the file
+        self.__stats = {}
+
+    def watch(self, file_names):
+        # The files already watched keep their state: a modification made
+        # while the project was refreshed is detected by the next wait
+        stats = {}
+        for file_name in file_names:
+            if file_name in self.__stats:
+                stats[file_name] = self.__stats[file_name]
+            else:
+                stats[file_name] = _stat_key(file_name)
+        self.__stats = stats
+
+    def wait(self, timeout):
+        """Return True if a file is modified before the timeout."""
+
+        start_time = utils.wall_time()
+        while True:
+            if self.__check():
+                return True
+            remaining = self.__interval
+            if timeout is not None:
+                remaining = min(
+                    remaining, start_time + timeout - utils.wall_time())
+                if remaining <= 0:
+                    return False
+            time.sleep(remaining)
+
+    def __check(self):
+        modified = False
+        for file_name, stat_key in self.__stats.items():
+            new_stat_key = _stat_key(file_name)
+            if new_stat_key != stat_key:
+                self.__stats[file_name] = new_stat_key
+                modified = True
+        return modified
+
+    def close(self):
+        pass
+
+
+def _stat_key(file_name):
+    try:
+        file_stat = os.stat(file_name)
+    except OSError:
+        return None
+    return (
+        getattr(file_stat, 'st_mtime_ns', file_stat.st_mtime),
+        file_stat.st_size,
+        file_stat.st_ino)
+
+
+class _inotify_t(object):
+
+    """
+    Implementation detail: detect the modified files with inotify.
+
+    The directories of the files are watched, so that the files replaced
+    by a rename (as most editors save them) are still watched.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+        IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    # struct inotify_event: wd, mask, cookie, len, followed by the name
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        object.__init__(self)
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.__libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.__fd = self.__libc.inotify_init1(
+            self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.__fd < 0:
+            self.__raise()
+        # watch descriptor -> directory
+        self.__directories = {}
+        # directory -> watch descriptor
+        self.__descriptors = {}
+        self.__file_names = set()
+
+    def __raise(self):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+    def watch(self, file_names):
+        self.__file_names = set(file_names)
+        for file_name in self.__file_names:
+            directory = os.path.dirname(file_name)
+            if directory in self.__descriptors:
+                continue
+            path = directory
+            if not isinstance(path, bytes):
+                path = path.encode(sys.getfilesystemencoding())
+            descriptor = self.__libc.inotify_add_watch(
+                self.__fd, path, self.MASK)
+            if descriptor < 0:
+                if ctypes.get_errno() == errno.ENOENT:
+                    continue
+                self.__raise()
+            self.__directories[descriptor] = directory
+            self.__descriptors[directory] = descriptor
+
+    def wait(self, timeout):
+        """Return True if a file is modified before the timeout."""
+
+        start_time = utils.wall_time()
+        while True:
+            remaining = None
+            if timeout is not None:
+                remaining = max(0, start_time + timeout - utils.wall_time())
+            readable = select.select([self.__fd], [], [], remaining)[0]
+            if not readable:
+                return False
+            if self.__read_events():
+                return True
+
+    def __read_events(self):
+        """Return True if one of the events is about a watched file."""
+
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return False
+            raise
+        modified = False
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                modified = True
+                continue
+            directory = self.__directories.get(descriptor)
+            if directory is None:
+                continue
+            if not isinstance(name, str):
+                name = name.decode(sys.getfilesystemencoding())
+            if os.path.join(directory, name) in self.__file_names:
+                modified = True
+        return modified
+
+    def close(self):
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
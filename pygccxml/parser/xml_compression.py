@@ -0,0 +1,138 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Compressed xml files.
+
+The xml files whose name ends with ".gz", ".bz2" or ".xz" are decompressed
+while they are scanned: no decompressed copy is written to the disk. The
+xml files generated with such a name, or kept with the `xml_compression`
+configuration option, are compressed while the xml generator writes them.
+"""
+
+import bz2
+import gzip
+import io
+import shutil
+
+try:
+    import lzma
+except ImportError:
+    # Python 2
+    lzma = None
+
+# Size of the blocks read from and written to the compressed files
+BUFFER_SIZE = 1024 * 1024
+
+COMPRESSIONS = ("gz", "bz2", "xz")
+
+
+def file_compression(file_name):
+    """
+    Return the compression of a file, guessed from its extension.
+
+    :param file_name: path to the file
+    :type file_name: str
+
+    :rtype: "gz", "bz2", "xz" or None
+
+    """
+
+    for compression in COMPRESSIONS:
+        if file_name.endswith("." + compression):
+            return compression
+    return None
+
+
+def xml_file_suffix(config):
+    """
+    Return the suffix of the temporary xml files.
+
+    The files are compressed if they are kept and the `xml_compression`
+    configuration option is set.
+
+    """
+
+    if config.keep_xml and config.xml_compression:
+        return ".xml." + config.xml_compression
+    return ".xml"
+
+
+def open_file(file_name, mode="rb", compression=None):
+    """
+    Open a compressed file.
+
+    The decompressed content is read by blocks of :data:`BUFFER_SIZE`
+    bytes, even if the scanner asks for smaller blocks.
+
+    :param file_name: path to the file
+    :type file_name: str
+
+    :param mode: "rb" or "wb"
+    :type mode: str
+
+    :param compression: the compression, guessed from the extension of the
+                        file if None
+    :type compression: str
+
+    :rtype: file-like object
+
+    """
+
+    if compression is None:
+        compression = file_compression(file_name)
+    if compression == "gz":
+        stream = gzip.GzipFile(file_name, mode)
+    elif compression == "bz2":
+        stream = bz2.BZ2File(file_name, mode)
+    elif compression == "xz":
+        if lzma is None:
+            raise RuntimeError(
+                "The lzma module is needed to open '%s'" % file_name)
+        stream = lzma.LZMAFile(file_name, mode)
+    else:
+        raise RuntimeError(
+            "Unknown compression of '%s': %s" % (file_name, compression))
+
+    if mode == "rb" and hasattr(stream, "readable"):
+        # The bz2 files of Python 2 can not be wrapped, but are buffered
+        stream = io.BufferedReader(stream, BUFFER_SIZE)
+    return stream
+
+
+def write_file(file_name, content):
+    """
+    Write a compressed file.
+
+    :param file_name: path to the file, its extension gives the compression
+    :type file_name: str
+
+    :param content: the content of the file, or a file-like object to copy
+    :type content: bytes
+
+    """
+
+    stream = open_file(file_name, "wb")
+    try:
+        if hasattr(content, "read"):
+            shutil.copyfileobj(content, stream, BUFFER_SIZE)
+        else:
+            stream.write(content)
+    finally:
+        stream.close()
+
+
+def compress_file(file_name):
+    """
+    Compress in place a file that has been written without compression.
+
+    :param file_name: path to the file, its extension gives the compression
+    :type file_name: str
+
+    """
+
+    with open(file_name, "rb") as source:
+        content = source.read()
+    write_file(file_name, content)
@@ -0,0 +1,457 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Persistent parse server.
+
+A :class:`parse_server_t` is a long-lived local process which parses
+header files for its clients, over a Unix socket. It keeps a
+:class:`parser.directory_cache_t` and the last parsed declarations trees
+in memory, with their query optimizer initialized: a tool using a
+:class:`client_t` does not pay for loading the cache and for the
+optimizer on each run.
+
+The server is started with::
+
+    python -m pygccxml.server /path/to/socket --cache /path/to/cache/dir
+
+The messages are pickled: the socket is only accessible to the user who
+started the server, who should not share it with other users.
+"""
+
+import argparse
+import collections
+import os
+import pickle
+import socket
+import struct
+import sys
+import traceback
+
+try:
+    import socketserver
+except ImportError:
+    # Python 2
+    import SocketServer as socketserver
+
+from . import declarations
+from . import parser
+from . import utils
+from .parser import declarations_cache
+
+# Length of the messages
+_length = struct.Struct("!Q")
+
+# The queries answered by the server: the scopedef_t methods returning
+# several declarations
+QUERIES = (
+    "decls",
+    "namespaces",
+    "classes",
+    "variables",
+    "calldefs",
+    "free_functions",
+    "free_operators",
+    "member_functions",
+    "constructors",
+    "member_operators",
+    "casting_operators",
+    "enumerations",
+    "typedefs")
+
+
+def _send(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_length.pack(len(data)) + data)
+
+
+def _receive(sock):
+    size = _length.unpack(_receive_bytes(sock, _length.size))[0]
+    return pickle.loads(_receive_bytes(sock, size))
+
+
+def _receive_bytes(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise RuntimeError("The connection has been closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _tree_t(object):
+
+    """Declarations tree kept by the server, with its dependencies."""
+
+    def __init__(self, decls):
+        object.__init__(self)
+        self.decls = decls
+        for decl in decls:
+            if isinstance(decl, declarations.scopedef_t):
+                decl.init_optimizer()
+        file_names = set()
+        for decl in declarations.make_flatten(decls):
+            if decl.location is not None:
+                file_names.add(decl.location.file_name)
+        self.signatures = [
+            (file_name, declarations_cache.file_signature(file_name))
+            for file_name in file_names]
+
+    def is_up_to_date(self):
+        for file_name, signature in self.signatures:
+            if declarations_cache.file_signature(file_name) != signature:
+                return False
+        return True
+
+
+class parse_server_t(object):
+
+    """
+    Server parsing header files for the :class:`client_t` instances.
+
+    The requests are handled one at a time. The declarations trees of the
+    last `max_trees` requests are kept in memory; a tree is parsed again
+    (using the cache) when one of the files of its declarations has been
+    modified.
+    """
+
+    def __init__(self, socket_path, cache=None, config=None, max_trees=16):
+        """
+        :param socket_path: path to the Unix socket
+        :type socket_path: str
+
+        :param cache: the cache, or the path to a :class:`directory_cache_t`
+                      directory
+        :type cache: :class:`cache_base_t` or str
+
+        :param config: configuration used by the requests that do not
+                       give one
+        :type config: :class:`xml_generator_configuration_t`
+
+        :param max_trees: number of declarations trees kept in memory
+        :type max_trees: int
+
+        """
+
+        object.__init__(self)
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError(
+                "The parse server needs Unix sockets, which are not " +
+                "available on this platform")
+        self.logger = utils.loggers.root
+        self.socket_path = socket_path
+        if utils.is_str(cache):
+            cache = parser.directory_cache_t(directory=cache)
+        self.__cache = cache
+        self.__config = config
+        self.__max_trees = max_trees
+        # request key -> _tree_t, the most recently used last
+        self.__trees = collections.OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__stopped = False
+        self.__server = None
+
+    def serve_forever(self):
+        """Handle the requests until a client asks the server to stop."""
+
+        self.__remove_stale_socket()
+        old_umask = os.umask(0o077)
+        try:
+            self.__server = _unix_server_t(self.socket_path, self)
+        finally:
+            os.umask(old_umask)
+        self.logger.info("Parse server listening on %s", self.socket_path)
+        try:
+            while not self.__stopped:
+                self.__server.handle_request()
+        finally:
+            self.__server.server_close()
+            if self.__cache is not None:
+                self.__cache.flush()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def __remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error:
+            # Left by a server that did not stop properly
+            os.remove(self.socket_path)
+        else:
+            raise RuntimeError(
+                "A server is already listening on %s" % self.socket_path)
+        finally:
+            sock.close()
+
+    def handle(self, request):
+        """
+        Return the response to a request.
+
+        :param request: the command and its arguments
+        :type request: dict
+
+        :rtype: dict
+        """
+
+        command = request["command"]
+        if command == "parse":
+            return {"declarations": self.__tree(request).decls}
+        elif command == "query":
+            return {"declarations": self.__query(request)}
+        elif command == "ping":
+            return {
+                "pid": os.getpid(),
+                "trees": len(self.__trees),
+                "hits": self.__hits,
+                "misses": self.__misses}
+        elif command == "stop":
+            self.__stopped = True
+            return {}
+        raise RuntimeError("Unknown command: %s" % command)
+
+    def __tree(self, request):
+        config = request["config"] or self.__config
+        if config is None:
+            config = parser.xml_generator_configuration_t()
+        key = (
+            tuple(_file_key(prj_file) for prj_file in request["files"]),
+            request["compilation_mode"],
+            declarations_cache.configuration_signature(config),
+            tuple(config.start_with_declarations))
+        tree = self.__trees.pop(key, None)
+        if tree is not None and tree.is_up_to_date():
+            self.__hits += 1
+        else:
+            self.__misses += 1
+            decls = parser.parse(
+                request["files"],
+                config,
+                request["compilation_mode"],
+                self.__cache)
+            tree = _tree_t(decls)
+        self.__trees[key] = tree
+        while len(self.__trees) > self.__max_trees:
+            self.__trees.popitem(last=False)
+        return tree
+
+    def __query(self, request):
+        if request["query"] not in QUERIES:
+            raise RuntimeError("Unknown query: %s" % request["query"])
+        global_ns = declarations.get_global_namespace(
+            self.__tree(request).decls)
+        keywds = dict(request["keywds"])
+        keywds["allow_empty"] = True
+        found = getattr(global_ns, request["query"])(**keywds)
+        return [_declaration_info(decl) for decl in found]
+
+
+def _file_key(prj_file):
+    """
+    Return the part of the key of a tree for a project file. The
+    :class:`file_configuration_t` instances of the requests are new
+    objects, compared by value.
+
+    """
+
+    if isinstance(prj_file, parser.file_configuration_t):
+        return (
+            prj_file.data,
+            prj_file.content_type,
+            tuple(prj_file.start_with_declarations),
+            prj_file.cached_source_file)
+    return prj_file
+
+
+def _declaration_info(decl):
+    """Return the description of a declaration sent to the clients."""
+
+    info = {
+        "name": declarations.full_name(decl),
+        "type": decl.__class__.__name__,
+        "file": None,
+        "line": None}
+    if decl.location is not None:
+        info["file"] = decl.location.file_name
+        info["line"] = decl.location.line
+    return info
+
+
+class _unix_server_t(socketserver.UnixStreamServer):
+
+    """Implementation detail: the socket server of a parse server."""
+
+    def __init__(self, socket_path, parse_server):
+        socketserver.UnixStreamServer.__init__(
+            self, socket_path, _handler_t)
+        self.parse_server = parse_server
+
+
+class _handler_t(socketserver.BaseRequestHandler):
+
+    """Implementation detail: handle the requests of a connection."""
+
+    def handle(self):
+        parse_server = self.server.parse_server
+        request = _receive(self.request)
+        try:
+            response = parse_server.handle(request)
+        except Exception as error:
+            parse_server.logger.exception("Request failed")
+            response = {
+                "error": "%s: %s" % (error.__class__.__name__, error),
+                "traceback": traceback.format_exc()}
+        _send(self.request, response)
+
+
+class client_t(object):
+
+    """
+    Client of a :class:`parse_server_t`.
+
+    The configurations given to the requests are pickled, and must not
+    use objects that can not be pickled (e.g. a lambda as location filter).
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        """
+        :param socket_path: path to the Unix socket of the server
+        :type socket_path: str
+
+        :param timeout: timeout of the requests, in seconds
+        :type timeout: float
+
+        """
+
+        object.__init__(self)
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def parse(
+            self,
+            files,
+            config=None,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE):
+        """
+        Parse header files, like :func:`parser.parse`.
+
+        :param files: the header files
+        :type files: list of str
+
+        :param config: the configuration, the one of the server if None
+        :type config: :class:`xml_generator_configuration_t`
+
+        :param compilation_mode: the compilation mode
+        :type compilation_mode: :class:`COMPILATION_MODE`
+
+        :rtype: list of :class:`declaration_t`
+        """
+
+        return self.__request(
+            command="parse",
+            files=list(files),
+            config=config,
+            compilation_mode=compilation_mode)["declarations"]
+
+    def query(
+            self,
+            files,
+            query,
+            config=None,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE,
+            **keywds):
+        """
+        Query the declarations of header files.
+
+        The query is run by the server, which only sends a description of
+        the declarations found: a dictionary with their full "name", the
+        name of their "type" (e.g. "class_t"), and their location ("file"
+        and "line").
+
+        :param query: one of the scopedef_t methods listed in
+                      :data:`QUERIES`, e.g. "classes"
+        :type query: str
+
+        :param keywds: the arguments of the query, e.g. `name="A"`. The
+                       arguments must be pickled: lambda functions can not
+                       be used.
+
+        :rtype: list of dict
+        """
+
+        return self.__request(
+            command="query",
+            files=list(files),
+            config=config,
+            compilation_mode=compilation_mode,
+            query=query,
+            keywds=keywds)["declarations"]
+
+    def ping(self):
+        """
+        Return the process id of the server and its statistics: number of
+        trees kept in memory, and number of requests served with (hits) or
+        without (misses) one of them.
+
+        :rtype: dict
+        """
+
+        return self.__request(command="ping")
+
+    def stop(self):
+        """Stop the server."""
+
+        self.__request(command="stop")
+
+    def __request(self, **request):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            _send(sock, request)
+            response = _receive(sock)
+        finally:
+            sock.close()
+        if "error" in response:
+            raise RuntimeError(
+                "The parse server failed: %s%s%s" % (
+                    response["error"], os.linesep, response["traceback"]))
+        return response
+
+
+def main(args=None):
+    """Run a parse server, with the options of the command line."""
+
+    argument_parser = argparse.ArgumentParser(
+        description="Parse server keeping the declarations in memory")
+    argument_parser.add_argument("socket", help="path to the Unix socket")
+    argument_parser.add_argument(
+        "--cache", help="directory of the declarations cache")
+    argument_parser.add_argument(
+        "--config", help="xml generator configuration file")
+    argument_parser.add_argument(
+        "--max-trees", type=int, default=16,
+        help="number of declarations trees kept in memory")
+    options = argument_parser.parse_args(args)
+
+    config = None
+    if options.config:
+        config = parser.load_xml_generator_configuration(options.config)
+    parse_server_t(
+        options.socket,
+        options.cache,
+        config,
+        options.max_trees).serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,10 @@ from .utils import get_architecture
 from .utils import loggers
 from .utils import create_temp_file_name
 from .utils import remove_file_no_raise
+from .utils import replace_file
+from .utils import wall_time
+from .utils import cpu_time
+from .utils import file_lock_t
 from .utils import normalize_path
 from .utils import find_xml_generator
 from .utils import get_tr1
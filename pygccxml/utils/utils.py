@@ -7,11 +7,17 @@
 
 import os
 import sys
+import time
 import platform
 import logging
 import tempfile
 import subprocess
 import warnings
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
 
 
 def is_str(string):
@@ -164,6 +170,96 @@ def remove_file_no_raise(file_name, config):
             file_name, str(error))
 
 
+def replace_file(source, destination):
+    """
+    Rename the `source` file to `destination`, replacing the `destination`
+    file if it exists.
+
+    The replacement is atomic, except on Windows with Python 2, where the
+    `destination` file has to be removed first.
+
+    """
+
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+        return
+    try:
+        os.rename(source, destination)
+    except OSError:
+        # Windows does not replace an existing file
+        os.remove(destination)
+        os.rename(source, destination)
+
+
+def wall_time():
+    """
+    Return the value of a clock measuring the elapsed time, in seconds.
+
+    Only the difference between two values is meaningful.
+
+    """
+
+    if hasattr(time, "perf_counter"):
+        return time.perf_counter()
+    return time.time()
+
+
+def cpu_time():
+    """
+    Return the CPU time used by the process, in seconds.
+
+    `time.clock` is not used: it gives the elapsed time on Windows, and it
+    has been removed in Python 3.8.
+
+    """
+
+    if hasattr(time, "process_time"):
+        return time.process_time()
+    user, system = os.times()[:2]
+    return user + system
+
+
+class file_lock_t(object):
+
+    """
+    Advisory, exclusive lock on a file, to be used in a `with` statement.
+
+    The lock file is created if it does not exist. The lock is only
+    respected by the processes that use it.
+
+    """
+
+    def __init__(self, file_name):
+        object.__init__(self)
+        self.__file_name = file_name
+        self.__file = None
+
+    def __enter__(self):
+        self.__file = open(self.__file_name, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.__file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(
+                        self.__file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except IOError:
+                    # LK_LOCK gives up after 10 seconds
+                    time.sleep(0.1)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.__file.seek(0)
+            msvcrt.locking(self.__file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.__file.close()
+        self.__file = None
+
+
 # pylint: disable=W0622
 def create_temp_file_name(suffix, prefix=None, dir=None, directory=None):
     """
@@ -4,7 +4,6 @@
 # See http://www.boost.org/LICENSE_1_0.txt
 
 import os
-import bz2
 import unittest
 import autoconfig
 import parser_test_case
@@ -17,35 +16,20 @@ class Test(parser_test_case.parser_test_case_t):
     def __init__(self, *args):
         parser_test_case.parser_test_case_t.__init__(self, *args)
         self.global_ns = None
-        self.xml_path = None
 
     def setUp(self):
         if not self.global_ns:
 
-            # Extract the xml file from the bz2 archive
+            # The xml file is decompressed while it is read
             bz2_path = os.path.join(
                 autoconfig.data_directory,
                 'ogre.1.7.xml.bz2')
-            self.xml_path = os.path.join(
-                autoconfig.data_directory,
-                'ogre.1.7.xml')
-            with open(self.xml_path, 'wb') as new_file:
-                # bz2.BZ2File can not be used in a with statement in python 2.6
-                bz2_file = bz2.BZ2File(bz2_path, 'rb')
-                for data in iter(lambda: bz2_file.read(100 * 1024), b''):
-                    new_file.write(data)
-                bz2_file.close()
 
             reader = parser.source_reader_t(autoconfig.cxx_parsers_cfg.config)
             self.global_ns = declarations.get_global_namespace(
-                reader.read_xml_file(
-                    self.xml_path))
+                reader.read_xml_file(bz2_path))
             self.global_ns.init_optimizer()
 
-    def tearDown(self):
-        # Delete the extracted xml file
-        os.remove(self.xml_path)
-
     def test(self):
         for x in self.global_ns.typedefs('SettingsMultiMap'):
             self.assertTrue(not declarations.is_noncopyable(x))
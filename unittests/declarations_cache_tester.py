@@ -31,6 +31,30 @@ class decl_cache_tester(parser_test_case.parser_test_case_t):
         self.assertTrue(sig1 == sig1_dup)
         self.assertTrue(sig1 != sig2)
 
+    def test_file_signature_memo(self):
+        file1 = os.path.join(
+            autoconfig.build_directory, 'decl_cache_memo_test.txt')
+        with open(file1, "w") as f:
+            f.write("first version")
+        sig1 = declarations_cache.file_signature(file1)
+        self.assertEqual(
+            declarations_cache._file_signatures[file1][1], sig1)
+
+        # The memoized signature is used while the file is not modified
+        stat_key, _ = declarations_cache._file_signatures[file1]
+        declarations_cache._file_signatures[file1] = (stat_key, "memo")
+        self.assertEqual(declarations_cache.file_signature(file1), "memo")
+
+        # and it is recomputed once the file has changed
+        with open(file1, "w") as f:
+            f.write("second version")
+        sig2 = declarations_cache.file_signature(file1)
+        self.assertNotEqual(sig2, "memo")
+        self.assertNotEqual(sig2, sig1)
+
+        os.remove(file1)
+        self.assertIsNone(declarations_cache.file_signature(file1))
+
     def test_config_signature(self):
         diff_cfg_list = self.build_differing_cfg_list()
         def_cfg = diff_cfg_list[0]
@@ -109,6 +133,51 @@ class decl_cache_tester(parser_test_case.parser_test_case_t):
         cache = declarations_cache.file_cache_t(cache_file)
         self.assertTrue(len(cache._file_cache_t__cache) == 1)
 
+    def test_lazy_loading(self):
+        cache_file = os.path.join(
+            autoconfig.build_directory,
+            'decl_cache_test.test_lazy_loading.cache')
+        file1 = os.path.join(autoconfig.data_directory, 'decl_cache_file1.txt')
+        file2 = os.path.join(autoconfig.data_directory, 'decl_cache_file2.txt')
+        file3 = os.path.join(
+            autoconfig.build_directory, 'decl_cache_lazy_test.txt')
+        with open(file3, "w") as f:
+            f.write("third file")
+        def_cfg = self.build_differing_cfg_list()[0]
+
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+        cache = declarations_cache.file_cache_t(cache_file)
+        cache.update(file1, def_cfg, 1, [])
+        cache.update(file2, def_cfg, 2, [])
+        cache.flush()
+
+        # The declarations are only loaded on a cache hit
+        cache = declarations_cache.file_cache_t(cache_file)
+        self.assertEqual(len(cache._file_cache_t__unloaded), 2)
+        self.assertEqual(cache.cached_value(file1, def_cfg), 1)
+        self.assertEqual(len(cache._file_cache_t__unloaded), 1)
+
+        # Flushing only appends the new entries
+        offsets = dict(cache._file_cache_t__offsets)
+        self.assertEqual(cache.cached_value(file2, def_cfg), 2)
+        cache.update(file3, def_cfg, 3, [])
+        cache.flush()
+        for key, offset in offsets.items():
+            self.assertEqual(cache._file_cache_t__offsets[key], offset)
+        # The new entry is written after the previous index
+        key3 = declarations_cache.record_t.create_key(file3, def_cfg)
+        self.assertTrue(
+            cache._file_cache_t__offsets[key3][0] >
+            max(offset + length for offset, length in offsets.values()))
+
+        cache = declarations_cache.file_cache_t(cache_file)
+        self.assertEqual(cache.cached_value(file1, def_cfg), 1)
+        self.assertEqual(cache.cached_value(file2, def_cfg), 2)
+        self.assertEqual(cache.cached_value(file3, def_cfg), 3)
+        os.remove(file3)
+
     @staticmethod
     def build_differing_cfg_list():
         """ Return a list of configurations that all differ. """
@@ -0,0 +1,49 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+"""
+Compare the speed of the xml scanners on a big xml file.
+
+Usage: python scanner_benchmark.py [xml file] [repeat count]
+"""
+
+import os
+import sys
+import timeit
+
+this_module_dir_path = os.path.abspath(
+    os.path.dirname(sys.modules[__name__].__file__))
+
+sys.path.insert(1, os.path.join(this_module_dir_path, '../../'))
+sys.path.insert(2, os.path.join(this_module_dir_path, '../'))
+
+import autoconfig  # nopep8
+from pygccxml import declarations  # nopep8
+from pygccxml.parser import etree_scanner  # nopep8
+from pygccxml.parser import expat_scanner  # nopep8
+
+
+def scan(scanner_class, xml_file):
+    scanner = scanner_class(
+        xml_file,
+        declarations.decl_factory_t(),
+        autoconfig.cxx_parsers_cfg.config)
+    scanner.read()
+
+
+if __name__ == "__main__":
+    xml_file = os.path.join(autoconfig.data_directory, 'itkImage.xml')
+    if len(sys.argv) > 1:
+        xml_file = sys.argv[1]
+    count = 5
+    if len(sys.argv) > 2:
+        count = int(sys.argv[2])
+
+    for scanner_class in (
+            etree_scanner.ietree_scanner_t,
+            expat_scanner.expat_scanner_t):
+        timer = timeit.Timer(lambda: scan(scanner_class, xml_file))
+        print('%-20s %f seconds' % (
+            scanner_class.__name__, min(timer.repeat(count, 1))))
@@ -77,6 +77,26 @@ import test_function_pointer
 import test_directory_cache
 import test_config
 import deprecation_tester
+import test_parallel_file_by_file
+import test_stream_xml
+import test_async_reader
+import test_batched_compilation
+import test_sqlite_cache
+import test_declarations_serializer
+import test_expat_scanner
+import test_location_filter
+import test_strings_interning
+import test_type_table
+import test_lazy_linking
+import test_pgx_scanner
+import test_xml_compression
+import test_metrics
+import test_parse_server
+import test_precompiled_header
+import test_declarations_joiner
+import test_project
+import test_watcher
+import test_query_optimizer
 
 testers = [
     # , demangled_tester # failing right now
@@ -144,7 +164,27 @@ testers = [
     remove_template_defaults_tester,
     patcher_tester,
     find_container_traits_tester,
-    deprecation_tester
+    deprecation_tester,
+    test_parallel_file_by_file,
+    test_stream_xml,
+    test_async_reader,
+    test_batched_compilation,
+    test_sqlite_cache,
+    test_declarations_serializer,
+    test_expat_scanner,
+    test_location_filter,
+    test_strings_interning,
+    test_type_table,
+    test_lazy_linking,
+    test_pgx_scanner,
+    test_xml_compression,
+    test_metrics,
+    test_parse_server,
+    test_precompiled_header,
+    test_declarations_joiner,
+    test_project,
+    test_watcher,
+    test_query_optimizer
 ]
 
 if platform.system() != 'Windows':
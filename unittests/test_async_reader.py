@@ -0,0 +1,131 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import sys
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = "typedefs1.hpp"
+        self.files = [
+            'separate_compilation/data.h',
+            'separate_compilation/base.h',
+            'separate_compilation/derived.h']
+
+    def run_until_complete(self, coroutine):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        # Before Python 3.8, the child processes are only watched by the
+        # current event loop
+        asyncio.set_event_loop(loop)
+        if sys.version_info < (3, 8):
+            asyncio.get_child_watcher()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_aread_file(self):
+        if sys.version_info < (3, 5):
+            return
+
+        reader = parser.source_reader_t(self.config)
+        decls = reader.read_file(self.header)
+        async_decls = self.run_until_complete(reader.aread_file(self.header))
+        self.assertTrue(
+            decls == async_decls,
+            "There is a difference between declarations")
+
+    def test_aread_string_with_errors(self):
+        if sys.version_info < (3, 5):
+            return
+
+        reader = parser.source_reader_t(self.config)
+        self.assertRaises(
+            RuntimeError,
+            self.run_until_complete,
+            reader.aread_string("abra cadabra " + os.linesep))
+
+    def test_aread_file_stream(self):
+        if sys.version_info < (3, 5):
+            return
+
+        config = self.config.clone()
+        config.stream_xml = True
+        reader = parser.source_reader_t(config)
+        decls = reader.read_file(self.header)
+        async_decls = self.run_until_complete(reader.aread_file(self.header))
+        self.assertTrue(
+            decls == async_decls,
+            "There is a difference between declarations")
+        self.assertRaises(
+            RuntimeError,
+            self.run_until_complete,
+            reader.aread_string("abra cadabra " + os.linesep))
+
+    def test_aread_files_cache(self):
+        if sys.version_info < (3, 5):
+            return
+
+        cache_file = os.path.join(
+            autoconfig.build_directory, 'async_reader.cache')
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        try:
+            prj_reader = parser.project_reader_t(self.config)
+            decls = prj_reader.read_files(self.files)
+            for _ in range(2):
+                prj_reader = parser.project_reader_t(
+                    self.config, cache=parser.file_cache_t(cache_file))
+                async_decls = self.run_until_complete(
+                    prj_reader.aread_files(self.files, concurrency=3))
+                self.assertTrue(
+                    decls == async_decls,
+                    "There is a difference between declarations")
+            self.assertEqual(
+                len(parser.file_cache_t(cache_file)._file_cache_t__cache),
+                len(self.files))
+        finally:
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+    def test_aread_files(self):
+        if sys.version_info < (3, 5):
+            return
+
+        prj_reader = parser.project_reader_t(self.config)
+        decls = prj_reader.read_files(self.files)
+        prj_reader = parser.project_reader_t(self.config)
+        async_decls = self.run_until_complete(
+            prj_reader.aread_files(self.files, concurrency=2))
+        self.assertTrue(
+            decls == async_decls,
+            "There is a difference between declarations")
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,210 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+from pygccxml.parser import project_reader
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.files = [
+            'separate_compilation/data.h',
+            'separate_compilation/base.h',
+            'separate_compilation/derived.h']
+        self.cache_file = os.path.join(
+            autoconfig.build_directory, 'batched_compilation.cache')
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+        for name in self.__batch_files():
+            os.remove(name)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+        for name in self.__batch_files():
+            os.remove(name)
+
+    def __batch_files(self):
+        return sorted(
+            os.path.join(autoconfig.build_directory, name)
+            for name in os.listdir(autoconfig.build_directory)
+            if name.startswith("pygccxml_batch_"))
+
+    def test_same_declarations(self):
+        """
+        The batched mode returns the same tree as the file by file mode.
+
+        """
+
+        prj_reader = parser.project_reader_t(self.config)
+        decls = prj_reader.read_files(
+            self.files,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+        for batch_size in (None, 2):
+            prj_reader = parser.project_reader_t(self.config)
+            batched_decls = prj_reader.read_files(
+                self.files,
+                compilation_mode=parser.COMPILATION_MODE.BATCHED,
+                jobs=2,
+                batch_size=batch_size)
+            self.assertTrue(
+                decls == batched_decls,
+                "There is a difference between declarations")
+
+    def test_start_with_declarations(self):
+        """
+        The batches read the declarations the files would read in the file
+        by file mode.
+
+        """
+
+        config = self.config.clone()
+        config.start_with_declarations.append('typedefs')
+        files = ['typedefs1.hpp', 'typedefs2.hpp']
+        decls = parser.parse(files, config)
+        global_ns = declarations.get_global_namespace(decls)
+        self.assertEqual(len(global_ns.declarations), 1)
+        batched_decls = parser.parse(
+            files,
+            config,
+            compilation_mode=parser.COMPILATION_MODE.BATCHED,
+            jobs=1)
+        self.assertTrue(
+            decls == batched_decls,
+            "There is a difference between declarations")
+        global_ns = declarations.get_global_namespace(batched_decls)
+        self.assertEqual(len(global_ns.declarations), 1)
+
+        # The start declarations of a file configuration are merged with the
+        # ones of the configuration
+        files = [
+            'typedefs1.hpp',
+            parser.file_configuration_t(
+                'bit_fields.hpp', start_with_declarations=['bit_fields'])]
+        batched_decls = parser.parse(
+            files,
+            config,
+            compilation_mode=parser.COMPILATION_MODE.BATCHED,
+            jobs=1)
+        global_ns = declarations.get_global_namespace(batched_decls)
+        self.assertEqual(
+            sorted(decl.name for decl in global_ns.declarations),
+            ['bit_fields', 'typedefs'])
+
+    def test_cached_source_file(self):
+        """
+        The file configurations that are not source files are not batched.
+
+        """
+
+        xml_file = os.path.join(
+            autoconfig.build_directory, 'batched_compilation.xml')
+        if os.path.exists(xml_file):  # pragma: no cover
+            os.remove(xml_file)
+        files = [
+            self.files[0],
+            parser.create_cached_source_fc(self.files[1], xml_file),
+            self.files[2]]
+        try:
+            batched_decls = parser.parse(
+                files,
+                self.config,
+                compilation_mode=parser.COMPILATION_MODE.BATCHED,
+                jobs=1)
+            # The cached source file is compiled on its own
+            self.assertTrue(os.path.exists(xml_file))
+            decls = parser.parse(self.files, self.config)
+            self.assertTrue(
+                decls == batched_decls,
+                "There is a difference between declarations")
+        finally:
+            if os.path.exists(xml_file):
+                os.remove(xml_file)
+
+    def test_cache(self):
+        """
+        The batches are cached like regular source files.
+
+        """
+
+        cache = parser.file_cache_t(self.cache_file)
+        decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.BATCHED,
+            cache=cache,
+            jobs=1,
+            batch_size=2)
+
+        # The batch files are kept in the directory of the cache
+        batch_files = self.__batch_files()
+        self.assertEqual(len(batch_files), 2)
+        mtimes = [os.path.getmtime(name) for name in batch_files]
+
+        cache = parser.file_cache_t(self.cache_file)
+        self.assertEqual(len(cache._file_cache_t__cache), 2)
+        cached_decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.BATCHED,
+            cache=cache,
+            jobs=1,
+            batch_size=2)
+        self.assertTrue(
+            decls == cached_decls,
+            "There is a difference between declarations")
+        # The batch files are not written again
+        self.assertEqual(self.__batch_files(), batch_files)
+        self.assertEqual(
+            [os.path.getmtime(name) for name in batch_files], mtimes)
+
+    def test_split_by_cost(self):
+        files = ['a', 'b', 'c', 'd', 'e']
+        self.assertEqual(
+            project_reader._split_by_cost(files, [10, 1, 1, 1, 7], 2),
+            [['a'], ['b', 'c', 'd', 'e']])
+        self.assertEqual(
+            project_reader._split_by_cost(files, [1, 1, 1, 1, 1], 5),
+            [['a'], ['b'], ['c'], ['d'], ['e']])
+        self.assertEqual(
+            project_reader._split_by_cost(files, [0, 0, 0, 0, 0], 2),
+            [['a', 'b'], ['c', 'd', 'e']])
+        self.assertEqual(
+            project_reader._split_by_cost(files[:4], [1, 1, 1, 100], 2),
+            [['a', 'b', 'c'], ['d']])
+        self.assertEqual(
+            project_reader._split_by_cost(files[:4], [100, 1, 1, 1], 3),
+            [['a'], ['b'], ['c', 'd']])
+        self.assertEqual(
+            project_reader._split_by_cost(files[:2], [1, 1], 4),
+            [['a'], ['b']])
+        self.assertEqual(project_reader._split_by_cost([], [], 4), [])
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -64,6 +64,14 @@ class Test(unittest.TestCase):
         self.assertRaises(
             RuntimeError, lambda: parser.parse_string(code, config))
 
+        # Unknown scanner
+        config = parser.xml_generator_configuration_t(
+            xml_generator_path=generator_path,
+            xml_generator=name,
+            xml_scanner="not_a_scanner")
+        self.assertRaises(
+            RuntimeError, lambda: parser.parse_string(code, config))
+
 
 def create_suite():
     suite = unittest.TestSuite()
@@ -0,0 +1,158 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import shutil
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+from pygccxml.parser import declarations_joiner
+from pygccxml.parser import project_reader
+
+common_header = """
+#ifndef joiner_common_hpp
+#define joiner_common_hpp
+#define OVERLOADS(type) void f(type); void f(type*);
+namespace joiner{
+OVERLOADS(int)
+OVERLOADS(char)
+void g(); void g(int); void g(int, int);
+struct a_t{ void m(); void m() const; static void m(int); };
+enum { first };
+enum { second };
+}
+#endif
+"""
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.directory = os.path.join(
+            autoconfig.build_directory, 'declarations_joiner')
+        self.files = [
+            os.path.join(self.directory, 'joiner_%d.hpp' % index)
+            for index in range(3)]
+
+    def setUp(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, 'common.hpp'), "w") as header:
+            header.write(common_header)
+        for index, file_name in enumerate(self.files):
+            with open(file_name, "w") as header:
+                header.write(
+                    '#include "common.hpp"\n' +
+                    'namespace joiner{ void file_%d(); }\n' % index +
+                    'namespace joiner{ struct derived_%d_t : a_t{}; }\n' %
+                    index +
+                    'void use_%d(joiner::a_t*);\n' % index)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __parse(self, compilation_mode):
+        decls = parser.parse(self.files, self.config, compilation_mode)
+        return declarations.get_global_namespace(decls).namespace("joiner")
+
+    def test_join(self):
+        joined = self.__parse(parser.COMPILATION_MODE.FILE_BY_FILE)
+        self.assertEqual(len(joined.free_functions("f")), 4)
+        self.assertEqual(len(joined.free_functions("g")), 3)
+        self.assertEqual(len(joined.class_("a_t").member_functions("m")), 3)
+        self.assertEqual(len(joined.enumerations(name="")), 2)
+        for index in range(len(self.files)):
+            joined.free_function("file_%d" % index)
+
+        all_at_once = self.__parse(parser.COMPILATION_MODE.ALL_AT_ONCE)
+        self.assertEqual(
+            sorted(str(decl) for decl in joined.declarations),
+            sorted(str(decl) for decl in all_at_once.declarations))
+
+    def test_class_hierarchy(self):
+        """
+        The classes of the files are linked to the classes left in the
+        joined tree.
+
+        """
+
+        decls = parser.parse(self.files, self.config)
+        global_ns = declarations.get_global_namespace(decls)
+        base = global_ns.namespace("joiner").class_("a_t")
+        self.assertEqual(
+            sorted(info.related_class.name for info in base.derived),
+            ["derived_%d_t" % index for index in range(len(self.files))])
+        for index in range(len(self.files)):
+            derived = global_ns.namespace("joiner").class_(
+                "derived_%d_t" % index)
+            self.assertTrue(base.derived[index].related_class is derived)
+            self.assertEqual(len(derived.bases), 1)
+            self.assertTrue(derived.bases[0].related_class is base)
+            argument_type = global_ns.free_function(
+                "use_%d" % index).arguments[0].decl_type
+            self.assertTrue(argument_type.base.declaration is base)
+
+    def test_class_index(self):
+        decls = parser.parse(self.files[:1], self.config)
+        base = declarations.get_global_namespace(decls).namespace(
+            "joiner").class_("a_t")
+        other = parser.parse(self.files[1:2], self.config)
+        other_base = declarations.get_global_namespace(other).namespace(
+            "joiner").class_("a_t")
+
+        index = project_reader._class_index_t()
+        self.assertTrue(index.add(base) is base)
+        self.assertTrue(index.add(other_base) is base)
+        self.assertTrue(index.get(other_base) is base)
+        self.assertTrue(index[other_base] is base)
+        self.assertEqual(len(index), 1)
+        class_declaration = declarations.class_declaration_t("a_t")
+        class_declaration.location = other_base.location
+        self.assertTrue(index.get_by_name(class_declaration) is base)
+
+        self.assertFalse(index.remove(other_base))
+        self.assertTrue(index.remove(base))
+        self.assertIsNone(index.get(other_base))
+        self.assertIsNone(index.get_by_name(class_declaration))
+
+    def test_join_key(self):
+        """
+        The join keys of the declarations of a namespace are equal if and
+        only if the declarations are equal.
+
+        """
+
+        namespace = self.__parse(parser.COMPILATION_MODE.ALL_AT_ONCE)
+        calldefs = list(namespace.free_functions()) + \
+            list(namespace.class_("a_t").member_functions("m"))
+        for decl in calldefs:
+            for other in calldefs:
+                if decl.__class__ is not other.__class__ or \
+                        decl.name != other.name:
+                    continue
+                self.assertEqual(
+                    declarations_joiner._join_key(decl) ==
+                    declarations_joiner._join_key(other),
+                    decl == other)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,187 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import sys
+import shutil
+import unittest
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+from pygccxml.parser import declarations_serializer
+
+
+# The declarations of a custom declarations factory, like the Py++
+# declarations wrappers. The visitors find their visit functions by the
+# name of the class.
+class class_t(declarations.class_t):
+
+    def __init__(self, *arguments, **keywords):
+        declarations.class_t.__init__(self, *arguments, **keywords)
+        self.exposed = True
+
+
+class typedef_t(declarations.typedef_t):
+    pass
+
+
+class wrapper_factory_t(declarations.decl_factory_t):
+
+    def create_class(self, *arguments, **keywords):
+        return class_t(*arguments, **keywords)
+
+    def create_typedef(self, *arguments, **keywords):
+        return typedef_t(*arguments, **keywords)
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = "typedefs1.hpp"
+        self.cache_dir = os.path.join(
+            autoconfig.build_directory, 'serializer_cache')
+
+    def setUp(self):
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def tearDown(self):
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    @staticmethod
+    def print_declarations(decls):
+        lines = []
+        declarations.print_declarations(decls, writer=lines.append)
+        return lines
+
+    def test_declarations(self):
+        decls = parser.parse([self.header], self.config)
+        data = declarations_serializer.dumps(decls)
+        self.assertTrue(declarations_serializer.is_serialized(data))
+        loaded = declarations_serializer.loads(data)
+        self.assertTrue(
+            decls == loaded,
+            "There is a difference between declarations")
+        self.assertEqual(
+            self.print_declarations(decls),
+            self.print_declarations(loaded))
+
+    def test_shared_types(self):
+        ns = declarations.namespace_t("ns")
+        for name in ("a", "b"):
+            ns.adopt_declaration(declarations.variable_t(
+                name, declarations.pointer_t(declarations.int_t())))
+        ns.variables()[0].cache.full_name = "cached name"
+
+        loaded = declarations_serializer.loads(
+            declarations_serializer.dumps(ns))
+        self.assertEqual(loaded, ns)
+        a, b = loaded.variables()
+        self.assertTrue(a.decl_type is b.decl_type)
+        self.assertTrue(a.parent is loaded)
+        # The algorithms caches are not serialized
+        self.assertTrue(a.cache.full_name is None)
+        self.assertEqual(a.decl_type.decl_string, "int *")
+
+    def test_deep_tree(self):
+        ns = declarations.namespace_t("::")
+        parent = ns
+        for i in range(sys.getrecursionlimit() * 2):
+            child = declarations.namespace_t("ns%d" % i)
+            parent.adopt_declaration(child)
+            parent = child
+
+        loaded = declarations_serializer.loads(
+            declarations_serializer.dumps(ns))
+        depth = 0
+        while loaded.declarations:
+            loaded = loaded.declarations[0]
+            depth += 1
+        self.assertEqual(depth, sys.getrecursionlimit() * 2)
+
+    def test_optimized_tree(self):
+        decls = parser.parse([self.header], self.config)
+        global_ns = declarations.get_global_namespace(decls)
+        global_ns.init_optimizer()
+
+        loaded = declarations_serializer.loads(
+            declarations_serializer.dumps(global_ns))
+        self.assertTrue(loaded._optimized)
+        self.assertEqual(
+            len(loaded.decls(allow_empty=True)),
+            len(global_ns.decls(allow_empty=True)))
+
+    def test_decl_factory(self):
+        """
+        The declarations of a custom declarations factory are serialized
+        attribute by attribute, like the pygccxml declarations.
+
+        """
+
+        reader = parser.project_reader_t(
+            self.config, decl_factory=wrapper_factory_t())
+        decls = reader.read_files([self.header])
+        data = declarations_serializer.dumps(decls)
+        self.assertEqual(len(declarations_serializer.loads(data)), len(decls))
+        self.assertEqual(
+            pickle.loads(data[declarations_serializer._header.size:])[2],
+            [])
+
+        loaded = declarations_serializer.loads(data)
+        self.assertTrue(decls == loaded)
+        namespace = declarations.get_global_namespace(loaded).namespace(
+            "typedefs")
+        item = namespace.class_("item_t")
+        self.assertTrue(isinstance(item, class_t))
+        self.assertTrue(item.exposed)
+        for typedef in namespace.typedefs(
+                lambda decl: decl.name.startswith("Item")):
+            self.assertTrue(isinstance(typedef, typedef_t))
+            self.assertTrue(typedef.parent is namespace)
+            self.assertTrue(typedef.decl_type.declaration is item)
+
+    def test_caches(self):
+        caches = [
+            lambda: parser.directory_cache_t(
+                directory=os.path.join(self.cache_dir, 'directory'),
+                compact=True),
+            lambda: parser.file_cache_t(
+                os.path.join(self.cache_dir, 'file.cache'), compact=True),
+            lambda: parser.sqlite_cache_t(
+                os.path.join(self.cache_dir, 'sqlite.cache'), compact=True)]
+        for create_cache in caches:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            decls = parser.parse([self.header], self.config,
+                                 cache=create_cache())
+            cached_decls = parser.parse([self.header], self.config,
+                                        cache=create_cache())
+            self.assertTrue(
+                decls == cached_decls,
+                "There is a difference between declarations")
+            shutil.rmtree(self.cache_dir)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -5,13 +5,23 @@
 
 import os
 import sys
+import time
 import shutil
 import unittest
 import warnings
+import multiprocessing
+import autoconfig
 import parser_test_case
 
 from pygccxml import parser
 from pygccxml import utils
+from pygccxml.parser import directory_cache
+
+
+def _update_cache(cache_dir, config, source_file, value):
+    cache = parser.directory_cache_t(directory=cache_dir)
+    cache.update(source_file, config, value, [])
+    cache.flush()
 
 
 class Test(parser_test_case.parser_test_case_t):
@@ -98,6 +108,154 @@ class Test(parser_test_case.parser_test_case_t):
             lambda: parser.directory_cache_t(directory=self.cache_dir))
         os.remove(self.cache_dir)
 
+    def test_merge_index(self):
+        """
+        The entries added by another cache instance are kept when the index
+        is saved.
+
+        """
+
+        file1 = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file1.txt')
+        file2 = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file2.txt')
+        cache1 = parser.directory_cache_t(directory=self.cache_dir)
+        cache2 = parser.directory_cache_t(directory=self.cache_dir)
+        cache1.update(file1, self.config, 1, [])
+        cache1.flush()
+        cache2.update(file2, self.config, 2, [])
+        cache2.flush()
+        self.assertEqual(cache2.cached_value(file1, self.config), 1)
+
+        # Replacing an entry removes the previous cache file
+        cache1.update(file2, self.config, 3, [])
+        cache1.flush()
+        self.assertEqual(
+            len([name for name in os.listdir(self.cache_dir)
+                 if name.endswith(".cache")]), 2)
+
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        self.assertEqual(cache.cached_value(file1, self.config), 1)
+        self.assertEqual(cache.cached_value(file2, self.config), 3)
+
+    def test_multiple_processes(self):
+        """
+        Several processes can update the same cache directory concurrently.
+
+        """
+
+        files = [
+            os.path.join(autoconfig.data_directory, name) for name in (
+                'decl_cache_file1.txt', 'decl_cache_file2.txt',
+                'typedefs1.hpp', 'typedefs2.hpp')]
+        processes = [
+            multiprocessing.Process(
+                target=_update_cache,
+                args=(self.cache_dir, self.config, source_file, i))
+            for i, source_file in enumerate(files)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        for i, source_file in enumerate(files):
+            self.assertEqual(cache.cached_value(source_file, self.config), i)
+
+    def test_eviction(self):
+        """
+        The least recently used entries are evicted when the index is saved.
+
+        """
+
+        files = [
+            os.path.join(autoconfig.data_directory, name) for name in (
+                'decl_cache_file1.txt', 'decl_cache_file2.txt',
+                'typedefs1.hpp')]
+        cache = parser.directory_cache_t(
+            directory=self.cache_dir, max_entries=2)
+        cache.update(files[0], self.config, 0, [])
+        cache.update(files[1], self.config, 1, [])
+        cache.flush()
+        # Use the first entry, so that the second one is evicted
+        time.sleep(0.01)
+        self.assertEqual(cache.cached_value(files[0], self.config), 0)
+        time.sleep(0.01)
+        cache.update(files[2], self.config, 2, [])
+        cache.flush()
+
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        self.assertEqual(cache.cached_value(files[0], self.config), 0)
+        self.assertIsNone(cache.cached_value(files[1], self.config))
+        self.assertEqual(cache.cached_value(files[2], self.config), 2)
+        self.assertEqual(
+            len([name for name in os.listdir(self.cache_dir)
+                 if name.endswith(".cache")]), 2)
+
+        # A single entry fits in the size limit
+        cache = parser.directory_cache_t(
+            directory=self.cache_dir, max_bytes=1)
+        cache.update(files[1], self.config, 1, [])
+        cache.flush()
+        self.assertEqual(
+            len([name for name in os.listdir(self.cache_dir)
+                 if name.endswith(".cache")]), 0)
+
+    def test_read_only_run(self):
+        """
+        A run which only hits the cache does not write the index, unless
+        the size of the cache is bounded.
+
+        """
+
+        file1 = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file1.txt')
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        cache.update(file1, self.config, 1, [])
+        cache.flush()
+        indexfilename = os.path.join(self.cache_dir, "index.dat")
+        os.utime(indexfilename, (0, 0))
+
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        self.assertEqual(cache.cached_value(file1, self.config), 1)
+        cache.flush()
+        self.assertEqual(os.path.getmtime(indexfilename), 0)
+
+        cache = parser.directory_cache_t(
+            directory=self.cache_dir, max_entries=10)
+        self.assertEqual(cache.cached_value(file1, self.config), 1)
+        cache.flush()
+        self.assertNotEqual(os.path.getmtime(indexfilename), 0)
+
+    def test_gc(self):
+        """
+        gc() removes the orphaned cache files and the unused file names.
+
+        """
+
+        file1 = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file1.txt')
+        cache = parser.directory_cache_t(directory=self.cache_dir)
+        cache.update(file1, self.config, 1, [])
+        cache.flush()
+        orphan = os.path.join(self.cache_dir, "orphan.cache")
+        open(orphan, "w").close()
+
+        # Recent files may belong to another process
+        self.assertEqual(cache.gc(), 0)
+        self.assertTrue(os.path.exists(orphan))
+        self.assertEqual(cache.gc(min_age=0), 1)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertEqual(cache.cached_value(file1, self.config), 1)
+
+        filename_rep = directory_cache.filename_repository_t(True)
+        id1, _ = filename_rep.acquire_filename(file1)
+        id2, _ = filename_rep.acquire_filename("unused.h")
+        filename_rep.set_ref_counts({id1: 1})
+        self.assertEqual(filename_rep.get_filename(id1), file1)
+        self.assertRaises(ValueError, filename_rep.get_filename, id2)
+
 
 def create_suite():
     suite = unittest.TestSuite()
@@ -0,0 +1,62 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import io
+import os
+import unittest
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+from pygccxml.parser import expat_scanner
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.xml_file = os.path.join(
+            autoconfig.data_directory, "core_class_hierarchy.hpp.xml")
+
+    def test_expat_scanner(self):
+        """
+        The expat scanner gives the same declarations as the default
+        scanner.
+
+        """
+
+        decls = parser.parse_xml_file(self.xml_file, self.config)
+
+        config = self.config.clone()
+        config.xml_scanner = "expat"
+        expat_decls = parser.parse_xml_file(self.xml_file, config)
+
+        self.assertTrue(
+            decls == expat_decls,
+            "There is a difference between declarations")
+
+    def test_read_from_stream(self):
+        with open(self.xml_file, "rb") as xml_file:
+            content = xml_file.read()
+        scanner = expat_scanner.expat_scanner_t(
+            io.BytesIO(content), declarations.decl_factory_t(), self.config)
+        scanner.read()
+        self.assertTrue(scanner.declarations())
+        self.assertTrue(scanner.files())
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,133 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import copy
+import pickle
+import unittest
+
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+from pygccxml.parser import project_reader
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = 'declarations_calldef.hpp'
+
+    def __parse(self, lazy_linking):
+        config = self.config.clone()
+        config.lazy_linking = lazy_linking
+        return parser.parse([self.header], config)
+
+    def __functions(self, decls):
+        global_ns = declarations.get_global_namespace(decls)
+        # The constructors and destructors have no return type
+        return global_ns.calldefs(
+            lambda decl: decl._return_type is not None and
+            decl.location.file_name.endswith(self.header))
+
+    def test_placeholders(self):
+        """
+        The types are linked on the first access.
+
+        """
+
+        functions = self.__functions(self.__parse(True))
+        function = functions[0]
+        self.assertTrue(
+            isinstance(function._return_type, declarations.lazy_type_t))
+        self.assertTrue(
+            isinstance(function.return_type, declarations.type_t))
+        self.assertTrue(
+            isinstance(function._return_type, declarations.type_t))
+        for function in functions:
+            for argument in function.arguments:
+                self.assertTrue(
+                    isinstance(argument.decl_type, declarations.type_t))
+
+    def test_same_declarations(self):
+        """
+        The lazily linked declarations are the same as the eagerly linked
+        ones.
+
+        """
+
+        lazy = self.__functions(self.__parse(True))
+        eager = self.__functions(self.__parse(False))
+        self.assertEqual(len(lazy), len(eager))
+        for lazy_function, eager_function in zip(lazy, eager):
+            self.assertEqual(
+                lazy_function.decl_string, eager_function.decl_string)
+            self.assertEqual(
+                lazy_function.return_type.decl_string,
+                eager_function.return_type.decl_string)
+            self.assertEqual(lazy_function, eager_function)
+
+    def test_several_files(self):
+        """
+        The declarations of several files are linked when they are read,
+        and are the same as the eagerly linked ones.
+
+        """
+
+        files = ['typedefs1.hpp', 'typedefs2.hpp']
+        config = self.config.clone()
+        config.lazy_linking = True
+        lazy = declarations.get_global_namespace(
+            parser.parse(files, config)).namespace('typedefs')
+        eager = declarations.get_global_namespace(
+            parser.parse(files, self.config)).namespace('typedefs')
+        types = []
+        for function in lazy.calldefs():
+            types.append(function._return_type)
+            types.extend(
+                argument._decl_type for argument in function.arguments)
+        self.assertNotEqual(len(types), 0)
+        for type_ in types:
+            self.assertFalse(isinstance(type_, declarations.lazy_type_t))
+        self.assertEqual(lazy, eager)
+
+        # No placeholder is created for the files of a project
+        file_config, _ = project_reader._file_configuration(
+            config, files[0], len(files))
+        self.assertFalse(file_config.lazy_linking)
+        file_config, _ = project_reader._file_configuration(
+            config, files[0], 1)
+        self.assertTrue(file_config.lazy_linking)
+
+    def test_pickle(self):
+        """
+        The placeholders are replaced by the linked types when pickled or
+        copied.
+
+        """
+
+        decls = self.__parse(True)
+        for copied in (pickle.loads(pickle.dumps(decls)),
+                       copy.deepcopy(decls)):
+            for function in self.__functions(copied):
+                self.assertTrue(isinstance(
+                    function._return_type, declarations.type_t))
+                for argument in function.arguments:
+                    self.assertTrue(isinstance(
+                        argument._decl_type, declarations.type_t))
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
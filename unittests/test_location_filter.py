@@ -0,0 +1,121 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+from pygccxml.parser import declarations_cache
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.xml_file = os.path.join(
+            autoconfig.data_directory, "itkImage.xml")
+        self.vnl_dir = "/Users/michkapopoff/repo/ITK/Modules/ThirdParty/VNL"
+
+    def test_location_filter(self):
+        """
+        The declarations of the filtered files are not read, unless they
+        are used by the other declarations.
+
+        """
+
+        config = self.config.clone()
+        config.location_filter = parser.location_filter_t(
+            exclude_directories=[self.vnl_dir])
+        decls = parser.parse_xml_file(self.xml_file, config)
+        global_ns = declarations.get_global_namespace(decls)
+
+        vnl_dir = self.vnl_dir + "/"
+        for calldef in global_ns.calldefs():
+            self.assertFalse(
+                calldef.location.file_name.startswith(vnl_dir))
+        # The used vnl classes are kept, without their members
+        vnl_classes = global_ns.classes(
+            lambda c: c.location.file_name.startswith(vnl_dir))
+        self.assertTrue(vnl_classes)
+        for class_ in vnl_classes:
+            self.assertFalse(class_.calldefs(allow_empty=True))
+
+        image = global_ns.class_("Image<itk::RGBPixel<unsigned char>, 2>")
+        self.assertTrue(image.calldefs())
+
+    def test_location_filter_function(self):
+        config = self.config.clone()
+        config.location_filter = \
+            lambda file_name: file_name.endswith("itkImage.cxx")
+        decls = parser.parse_xml_file(self.xml_file, config)
+        global_ns = declarations.get_global_namespace(decls)
+        for calldef in global_ns.calldefs(allow_empty=True):
+            self.assertTrue(
+                calldef.location.file_name.endswith("itkImage.cxx"))
+        self.assertTrue(global_ns.typedefs())
+
+    def test_location_filter_cache(self):
+        """
+        The persistent caches are not used with the filters that are not
+        location_filter_t instances.
+
+        """
+
+        cache_file = os.path.join(
+            autoconfig.build_directory, "location_filter.cache")
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        try:
+            config = self.config.clone()
+            config.location_filter = \
+                lambda file_name: file_name.endswith("typedefs1.hpp")
+            parser.parse(["typedefs1.hpp"], config, cache=cache_file)
+            self.assertEqual(
+                len(parser.file_cache_t(cache_file)._file_cache_t__cache), 0)
+
+            config.location_filter = parser.location_filter_t(
+                include_directories=[autoconfig.data_directory])
+            parser.parse(["typedefs1.hpp"], config, cache=cache_file)
+            self.assertEqual(
+                len(parser.file_cache_t(cache_file)._file_cache_t__cache), 1)
+        finally:
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+    def test_location_filter_t(self):
+        location_filter = parser.location_filter_t(
+            include_directories=["/usr/include"],
+            exclude_directories=["/usr/include/sys"])
+        self.assertTrue(location_filter("/usr/include/stdio.h"))
+        self.assertTrue(location_filter("/usr/include/../include/stdio.h"))
+        self.assertFalse(location_filter("/usr/include/sys/types.h"))
+        self.assertFalse(location_filter("/usr/includes/stdio.h"))
+        self.assertFalse(location_filter("/home/stdio.h"))
+
+        # The filter is part of the configuration signature
+        config = self.config.clone()
+        signature = declarations_cache.configuration_signature(config)
+        config.location_filter = location_filter
+        self.assertNotEqual(
+            declarations_cache.configuration_signature(config), signature)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
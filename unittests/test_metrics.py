@@ -0,0 +1,140 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import pickle
+import unittest
+import threading
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import utils
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.files = ['core_ns_join_1.hpp', 'core_ns_join_2.hpp']
+        self.cache_file = os.path.join(
+            autoconfig.build_directory, 'metrics.cache')
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def __check_files(self, metrics):
+        file_names = [
+            os.path.basename(file_name) for file_name in metrics.files]
+        self.assertEqual(sorted(file_names), sorted(self.files))
+        for file_metrics in metrics.files.values():
+            self.assertTrue(file_metrics.declarations > 0)
+            self.assertTrue(file_metrics.types > 0)
+            self.assertEqual(
+                file_metrics.phases[parser.metrics_t.SCANNING].calls, 1)
+            self.assertTrue(file_metrics.wall_time > 0)
+
+    def test_phases(self):
+        calls = []
+
+        def callback(phase, file_name, wall_time, cpu_time):
+            calls.append((phase, file_name))
+
+        metrics = parser.metrics_t(callback)
+        parser.parse(self.files, self.config, metrics=metrics)
+        self.__check_files(metrics)
+        for phase in (
+                parser.metrics_t.XML_GENERATION,
+                parser.metrics_t.SCANNING,
+                parser.metrics_t.LINKING,
+                parser.metrics_t.PATCHING):
+            self.assertEqual(metrics.phases[phase].calls, 2)
+        for phase in (
+                parser.metrics_t.NAMESPACES_JOINING,
+                parser.metrics_t.CLASS_HIERARCHY_JOINING,
+                parser.metrics_t.RELINKING,
+                parser.metrics_t.CACHE_FLUSH):
+            self.assertEqual(metrics.phases[phase].calls, 1)
+            self.assertIn((phase, None), calls)
+        self.assertEqual(
+            len(calls),
+            sum(phase.calls for phase in metrics.phases.values()))
+        self.assertIn(parser.metrics_t.SCANNING, metrics.report())
+
+    def test_cache(self):
+        parser.parse(self.files, self.config, cache=self.cache_file)
+        metrics = parser.metrics_t()
+        parser.parse(
+            self.files, self.config, cache=self.cache_file, metrics=metrics)
+        # The cache file is loaded, then each file is read from the cache
+        self.assertEqual(metrics.phases[parser.metrics_t.CACHE_LOAD].calls, 3)
+        self.assertEqual(metrics.phases[parser.metrics_t.SCANNING].calls, 0)
+
+    def test_parallel(self):
+        metrics = parser.metrics_t()
+        parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.PARALLEL_FILE_BY_FILE,
+            jobs=2,
+            metrics=metrics)
+        self.__check_files(metrics)
+
+    def test_threads(self):
+        metrics = parser.metrics_t()
+
+        def measure(thread_id):
+            for i in range(1000):
+                metrics.add(
+                    parser.metrics_t.SCANNING, 1.0, 0.0, "f%d" % (i % 10))
+                metrics.count("f%d" % thread_id, 1, 1)
+
+        threads = [
+            threading.Thread(target=measure, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            metrics.phases[parser.metrics_t.SCANNING].calls, 4000)
+        self.assertEqual(len(metrics.files), 10)
+        self.assertEqual(
+            sum(file_metrics.declarations
+                for file_metrics in metrics.files.values()), 4000)
+
+        # The metrics of the worker processes are pickled
+        loaded = pickle.loads(pickle.dumps(metrics))
+        loaded.add(parser.metrics_t.SCANNING, 1.0, 0.0)
+        self.assertEqual(
+            loaded.phases[parser.metrics_t.SCANNING].calls, 4001)
+
+    def test_clocks(self):
+        wall_time = utils.wall_time()
+        cpu_time = utils.cpu_time()
+        sum(range(100000))
+        self.assertTrue(utils.wall_time() >= wall_time)
+        self.assertTrue(utils.cpu_time() >= cpu_time)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,96 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.files = [
+            'separate_compilation/data.h',
+            'separate_compilation/base.h',
+            'separate_compilation/derived.h']
+        self.cache_file = os.path.join(
+            autoconfig.build_directory, 'parallel_file_by_file.cache')
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def test_same_declarations(self):
+        """
+        The parallel mode returns the same tree as the file by file mode.
+
+        """
+
+        prj_reader = parser.project_reader_t(self.config)
+        decls = prj_reader.read_files(
+            self.files,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+        prj_reader = parser.project_reader_t(self.config)
+        parallel_decls = prj_reader.read_files(
+            self.files,
+            compilation_mode=parser.COMPILATION_MODE.PARALLEL_FILE_BY_FILE,
+            jobs=2)
+        self.assertTrue(
+            decls == parallel_decls,
+            "There is a difference between declarations")
+
+    def test_cache_update(self):
+        """
+        The cache updates done in the worker processes are merged.
+
+        """
+
+        cache = parser.file_cache_t(self.cache_file)
+        decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.PARALLEL_FILE_BY_FILE,
+            cache=cache,
+            jobs=2)
+
+        cache = parser.file_cache_t(self.cache_file)
+        reader = parser.source_reader_t(self.config, cache)
+        for header in self.files:
+            self.assertIsNotNone(reader.read_cached_file(header))
+
+        cached_decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.PARALLEL_FILE_BY_FILE,
+            cache=cache,
+            jobs=2)
+        self.assertTrue(
+            decls == cached_decls,
+            "There is a difference between declarations")
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
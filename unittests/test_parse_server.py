@@ -0,0 +1,116 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import shutil
+import socket
+import threading
+import time
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+
+
+@unittest.skipIf(not hasattr(socket, "AF_UNIX"), "Unix sockets are needed")
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.directory = os.path.join(
+            autoconfig.build_directory, 'parse_server')
+        self.socket_path = os.path.join(self.directory, 'socket')
+        self.header = os.path.join(self.directory, 'server.hpp')
+
+    def setUp(self):
+        from pygccxml import server
+
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.__write_header("struct first_t{};")
+        self.server = server.parse_server_t(
+            self.socket_path,
+            os.path.join(self.directory, 'cache'),
+            self.config)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+        self.client = server.client_t(self.socket_path)
+
+    def tearDown(self):
+        self.client.stop()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def __write_header(self, content):
+        with open(self.header, "w") as header:
+            header.write("namespace server{ %s }\n" % content)
+
+    def test_parse(self):
+        decls = self.client.parse([self.header])
+        global_ns = declarations.get_global_namespace(decls)
+        global_ns.namespace("server").class_("first_t")
+        self.client.parse([self.header])
+        stats = self.client.ping()
+        self.assertEqual(stats["pid"], os.getpid())
+        self.assertEqual(stats["trees"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_file_configuration(self):
+        from pygccxml import parser
+
+        for _ in range(2):
+            decls = self.client.parse(
+                [parser.file_configuration_t(self.header)])
+            global_ns = declarations.get_global_namespace(decls)
+            global_ns.namespace("server").class_("first_t")
+        stats = self.client.ping()
+        self.assertEqual(stats["trees"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_modified_file(self):
+        self.client.parse([self.header])
+        # The modification time may not change within the same second
+        time.sleep(1.1)
+        self.__write_header("struct first_t{}; struct second_t{};")
+        decls = self.client.parse([self.header])
+        global_ns = declarations.get_global_namespace(decls)
+        global_ns.namespace("server").class_("second_t")
+        self.assertEqual(self.client.ping()["misses"], 2)
+
+    def test_query(self):
+        found = self.client.query([self.header], "classes", name="first_t")
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0]["name"], "::server::first_t")
+        self.assertEqual(found[0]["type"], "class_t")
+        self.assertEqual(found[0]["file"], self.header)
+        self.assertEqual(found[0]["line"], 1)
+        self.assertEqual(
+            self.client.query([self.header], "classes", name="none_t"), [])
+
+    def test_error(self):
+        self.assertRaises(
+            RuntimeError, self.client.query, [self.header], "unknown")
+        # The server still answers after an error
+        self.client.ping()
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
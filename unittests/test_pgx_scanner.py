@@ -0,0 +1,79 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml.parser import pgx_scanner
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.xml_file = os.path.join(
+            autoconfig.data_directory, "core_class_hierarchy.hpp.xml")
+        self.pgx_file = os.path.join(
+            autoconfig.build_directory, "core_class_hierarchy.hpp.pgx")
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+
+    def tearDown(self):
+        if os.path.exists(self.pgx_file):
+            os.remove(self.pgx_file)
+
+    def test_pgx_file(self):
+        """
+        The declarations read from a .pgx file are the same as the ones
+        read from the xml file.
+
+        """
+
+        pgx_file = parser.create_pgx_file(self.xml_file, self.pgx_file)
+        self.assertEqual(pgx_file, self.pgx_file)
+        self.assertTrue(pgx_scanner.is_pgx_file(pgx_file))
+        self.assertFalse(pgx_scanner.is_pgx_file(self.xml_file))
+
+        decls = parser.parse_xml_file(self.xml_file, self.config)
+        pgx_decls = parser.parse_xml_file(pgx_file, self.config)
+        self.assertTrue(
+            decls == pgx_decls,
+            "There is a difference between declarations")
+
+        # The .pgx files can be used as xml generated files
+        fconfig = parser.create_gccxml_fc(pgx_file)
+        prj_decls = parser.project_reader_t(self.config).read_files(
+            [fconfig], compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+        self.assertTrue(
+            decls == prj_decls,
+            "There is a difference between declarations")
+
+    def test_truncated_file(self):
+        parser.create_pgx_file(self.xml_file, self.pgx_file)
+        with open(self.pgx_file, "rb") as pgx_file:
+            content = pgx_file.read()
+        with open(self.pgx_file, "wb") as pgx_file:
+            pgx_file.write(content[:-2])
+        self.assertRaises(
+            RuntimeError, parser.parse_xml_file, self.pgx_file, self.config)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
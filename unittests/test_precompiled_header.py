@@ -0,0 +1,136 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import platform
+import shutil
+import stat
+import sys
+import time
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+from pygccxml.parser import declarations_cache
+from pygccxml.parser import precompiled_header
+
+# Compiler writing an invalid precompiled header, with its dependencies
+fake_compiler = """#!%s
+import sys
+arguments = sys.argv[1:]
+with open(arguments[arguments.index("-o") + 1], "w") as pch_file:
+    pch_file.write("not a precompiled header")
+with open(arguments[arguments.index("-MF") + 1], "w") as dependencies:
+    dependencies.write("prefix.pch: \\\\\\n  %%s\\n" %% arguments[-1])
+"""
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.directory = os.path.join(
+            autoconfig.build_directory, 'precompiled_header')
+        self.prefix_header = os.path.join(self.directory, 'prefix.hpp')
+        self.header = os.path.join(self.directory, 'source.hpp')
+        self.compiler = os.path.join(self.directory, 'compiler.py')
+
+    def setUp(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        with open(self.prefix_header, "w") as prefix_header:
+            prefix_header.write("struct prefix_t{};\n")
+        with open(self.header, "w") as header:
+            # prefix_t is declared by the prefix header
+            header.write("struct source_t{ prefix_t prefix; };\n")
+        self.config.prefix_header = self.prefix_header
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __check_declarations(self, decls):
+        global_ns = declarations.get_global_namespace(decls)
+        global_ns.class_("prefix_t")
+        global_ns.class_("source_t")
+
+    def test_prefix_header(self):
+        self.__check_declarations(parser.parse([self.header], self.config))
+
+    @unittest.skipIf(
+        platform.system() == 'Windows', "The compiler is a python script")
+    def test_invalid_precompiled_header(self):
+        """
+        The prefix header is included when CastXML can not load the
+        precompiled header.
+
+        """
+
+        if self.config.xml_generator != "castxml":
+            return
+        with open(self.compiler, "w") as compiler:
+            compiler.write(fake_compiler % sys.executable)
+        os.chmod(self.compiler, stat.S_IRWXU)
+        self.config.pch_compiler_path = self.compiler
+        cache = parser.directory_cache_t(
+            directory=os.path.join(self.directory, 'cache'))
+
+        self.__check_declarations(
+            parser.parse([self.header], self.config, cache=cache))
+        key = precompiled_header.precompiled_header_key(self.config)
+        self.assertIsNone(
+            precompiled_header._precompiled_headers[(cache.directory, key)])
+        pch_file = os.path.join(cache.directory, key + ".pch")
+        self.assertTrue(precompiled_header._is_up_to_date(pch_file))
+
+        # The precompiled header is outdated when the prefix header changes
+        mtime = os.path.getmtime(pch_file) + 10
+        os.utime(self.prefix_header, (mtime, mtime))
+        self.assertFalse(precompiled_header._is_up_to_date(pch_file))
+
+    def test_missing_compiler(self):
+        self.config.pch_compiler_path = os.path.join(
+            self.directory, 'missing-clang')
+        self.__check_declarations(parser.parse([self.header], self.config))
+
+    def test_configuration_signature(self):
+        signature = declarations_cache.configuration_signature(self.config)
+        # The modification time may not change within the same second
+        time.sleep(1.1)
+        with open(self.prefix_header, "w") as prefix_header:
+            prefix_header.write("struct other_t{};\n")
+        self.assertNotEqual(
+            signature,
+            declarations_cache.configuration_signature(self.config))
+
+    def test_read_dependencies(self):
+        dependencies_file = os.path.join(self.directory, 'prefix.pch.d')
+        with open(dependencies_file, "w") as dependencies:
+            dependencies.write(
+                "prefix.pch: /include/prefix.hpp \\\n" +
+                "  /include/with\\ space.hpp /include/other.hpp\n")
+        self.assertEqual(
+            precompiled_header._read_dependencies(dependencies_file),
+            [
+                "/include/prefix.hpp",
+                "/include/with space.hpp",
+                "/include/other.hpp"])
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,148 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import shutil
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+
+headers = {
+    "common.hpp": """
+#ifndef project_common_hpp
+#define project_common_hpp
+namespace project{
+struct base_t{ virtual ~base_t(){} };
+typedef base_t base_alias_t;
+void common();
+}
+#endif
+""",
+    "a.hpp": """
+#include "common.hpp"
+namespace project{
+struct a_t : public base_t{ int x; };
+void fa(base_t*);
+}
+""",
+    "b.hpp": """
+#include "common.hpp"
+namespace project{
+struct b_t : public base_t{};
+void fb(base_t*);
+}
+"""}
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.directory = os.path.join(autoconfig.build_directory, 'project')
+        self.files = [
+            os.path.join(self.directory, name) for name in ("a.hpp", "b.hpp")]
+
+    def setUp(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        for name, content in headers.items():
+            self.__write(name, content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __write(self, name, content):
+        with open(os.path.join(self.directory, name), "w") as header:
+            header.write(content)
+
+    def __summary(self, decls):
+        namespace = declarations.get_global_namespace(decls).namespace(
+            "project")
+        return sorted(
+            (decl.__class__.__name__, str(decl))
+            for decl in declarations.make_flatten(namespace))
+
+    def __check(self, project):
+        """The project has the declarations of a new parse of its files."""
+
+        self.assertEqual(
+            self.__summary(project.declarations),
+            self.__summary(parser.parse(self.files, self.config)))
+        namespace = declarations.get_global_namespace(
+            project.declarations).namespace("project")
+        base = namespace.class_("base_t")
+        self.assertEqual(
+            sorted(info.related_class.name for info in base.derived),
+            sorted(class_.name for class_ in namespace.classes()
+                   if class_.bases))
+        for class_ in namespace.classes():
+            for info in class_.bases:
+                self.assertTrue(info.related_class is base)
+        for function in namespace.free_functions(
+                lambda f: f.name.startswith("f")):
+            pointee = function.arguments[0].decl_type.base
+            self.assertTrue(pointee.declaration is base)
+        self.assertEqual(
+            [alias.name for alias in base.aliases], ["base_alias_t"])
+        return namespace
+
+    def test_refresh(self):
+        project = parser.project_t(self.files, self.config)
+        namespace = self.__check(project)
+        base = namespace.class_("base_t")
+        fb = namespace.free_function("fb")
+        self.assertEqual(project.changed_files(), [])
+        self.assertEqual(project.refresh(), [])
+        self.assertIn(
+            os.path.join(self.directory, "common.hpp"),
+            project.dependencies(self.files[0]))
+
+        self.__write("a.hpp", headers["a.hpp"].replace(
+            "void fa(base_t*);", "void fa2(base_t*, int);\nstruct c_t{};"))
+        self.assertEqual(project.changed_files(), [self.files[0]])
+        self.assertEqual(project.refresh(), [self.files[0]])
+        namespace = self.__check(project)
+        # The declarations of the other file are kept
+        self.assertTrue(namespace.class_("base_t") is base)
+        self.assertTrue(namespace.free_function("fb") is fb)
+        namespace.class_("c_t")
+        self.assertEqual(
+            len(namespace.free_functions("fa", allow_empty=True)), 0)
+
+        self.__write("common.hpp", headers["common.hpp"].replace(
+            "void common();", "void common(int);"))
+        self.assertEqual(project.refresh(), self.files)
+        namespace = self.__check(project)
+        self.assertEqual(len(namespace.free_function("common").arguments), 1)
+
+    def test_optimizer(self):
+        project = parser.project_t(self.files, self.config)
+        global_ns = declarations.get_global_namespace(project.declarations)
+        global_ns.init_optimizer()
+        self.__write("b.hpp", headers["b.hpp"].replace("fb", "fb2"))
+        project.refresh()
+        self.assertTrue(global_ns._optimized)
+        global_ns.free_function("fb2")
+        self.assertEqual(
+            len(global_ns.free_functions("fb", allow_empty=True)), 0)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,136 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import unittest
+
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+
+code = """
+namespace optimizer{
+struct a_t{ int x; void m(); struct nested_t{ int y; }; };
+struct b_t{};
+void f(); void f(int);
+namespace inner{ void g(); struct c_t{ int z; }; }
+}
+"""
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def setUp(self):
+        decls = parser.parse_string(code, self.config)
+        self.global_ns = declarations.get_global_namespace(decls)
+        self.global_ns.init_optimizer()
+        self.namespace = self.global_ns.namespace("optimizer")
+
+    def __indexes(self):
+        """Return the query optimizer indexes of each scope, by identity."""
+
+        def ids(decls):
+            return sorted(id(decl) for decl in decls)
+
+        def name_ids(name2decls):
+            return dict(
+                (name, ids(decls)) for name, decls in name2decls.items())
+
+        indexes = {}
+        for scope in declarations.make_flatten(self.global_ns):
+            if not isinstance(scope, declarations.scopedef_t):
+                continue
+            self.assertTrue(scope._optimized)
+            indexes[id(scope)] = (
+                ids(scope._all_decls),
+                ids(scope._all_decls_not_recursive),
+                dict((type_, ids(decls))
+                     for type_, decls in scope._type2decls.items()),
+                dict((type_, ids(decls))
+                     for type_, decls in scope._type2decls_nr.items()),
+                dict((type_, name_ids(name2decls))
+                     for type_, name2decls in scope._type2name2decls.items()),
+                dict((type_, name_ids(name2decls))
+                     for type_, name2decls in
+                     scope._type2name2decls_nr.items()))
+        return indexes
+
+    def __check(self):
+        """The indexes are those a new initialization builds."""
+
+        indexes = self.__indexes()
+        self.global_ns.init_optimizer()
+        self.assertEqual(indexes, self.__indexes())
+
+    def test_adopt_declaration(self):
+        function = declarations.free_function_t(name="added")
+        self.namespace.adopt_declaration(function)
+        self.assertTrue(self.global_ns.free_function("added") is function)
+
+        class_ = declarations.class_t(name="added_t")
+        class_.adopt_declaration(
+            declarations.variable_t(name="member"),
+            declarations.ACCESS_TYPES.PUBLIC)
+        self.namespace.namespace("inner").adopt_declaration(class_)
+        self.global_ns.class_("added_t").variable("member")
+
+        self.namespace.class_("a_t").adopt_declaration(
+            declarations.variable_t(name="added_member"),
+            declarations.ACCESS_TYPES.PRIVATE)
+        self.namespace.class_("a_t").variable("added_member")
+        self.__check()
+
+    def test_remove_declaration(self):
+        a_t = self.namespace.class_("a_t")
+        a_t.remove_declaration(a_t.variable("x"))
+        self.assertEqual(len(a_t.variables("x", allow_empty=True)), 0)
+        self.namespace.remove_declaration(a_t)
+        self.assertEqual(
+            len(self.global_ns.classes("nested_t", allow_empty=True)), 0)
+        self.namespace.remove_declaration(self.namespace.namespace("inner"))
+        self.assertEqual(
+            len(self.global_ns.free_functions("g", allow_empty=True)), 0)
+        self.__check()
+
+    def test_rename(self):
+        self.namespace.class_("b_t").name = "renamed_t"
+        self.global_ns.class_("renamed_t")
+        self.assertEqual(
+            len(self.global_ns.classes("b_t", allow_empty=True)), 0)
+        self.namespace.free_function(arg_types=["int"]).name = "h"
+        self.assertEqual(len(self.namespace.free_functions("f")), 1)
+        self.namespace.free_function("h")
+        self.__check()
+
+    def test_declarations(self):
+        inner = self.namespace.namespace("inner")
+        other = declarations.namespace_t(name="other")
+        self.global_ns.adopt_declaration(other)
+        other.take_parenting(inner)
+        self.assertEqual(len(inner.declarations), 0)
+        self.assertTrue(self.global_ns.free_function("g").parent is other)
+        self.assertEqual(len(inner.decls(allow_empty=True)), 0)
+        self.__check()
+
+        self.namespace.declarations = [
+            decl for decl in self.namespace.declarations
+            if decl.name != "f"]
+        self.assertEqual(
+            len(self.global_ns.free_functions("f", allow_empty=True)), 0)
+        self.__check()
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,124 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+import multiprocessing
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+
+
+def _update_cache(cache_file, config, source_file, value):
+    cache = parser.sqlite_cache_t(cache_file)
+    cache.update(source_file, config, value, [source_file])
+    cache.close()
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = "typedefs1.hpp"
+        self.cache_file = os.path.join(
+            autoconfig.build_directory, 'sqlite_cache_test.db')
+        self.source_file = os.path.join(
+            autoconfig.build_directory, 'sqlite_cache_test.hpp')
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        self.tearDown()
+
+    def tearDown(self):
+        for name in (self.cache_file, self.source_file):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(name + suffix):
+                    os.remove(name + suffix)
+
+    def test_cache_interface(self):
+        data_file = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file1.txt')
+        data_file_dup = os.path.join(
+            autoconfig.data_directory, 'decl_cache_file1_duplicate.txt')
+        with open(self.source_file, "w") as f:
+            f.write("// version 1")
+
+        cache = parser.sqlite_cache_t(self.cache_file)
+        self.assertIsNone(cache.cached_value(data_file, self.config))
+        cache.update(data_file, self.config, 1, [self.source_file])
+        self.assertEqual(cache.cached_value(data_file, self.config), 1)
+
+        # The records are keyed on the content of the files
+        self.assertEqual(cache.cached_value(data_file_dup, self.config), 1)
+        cache.update(data_file_dup, self.config, 2, [self.source_file])
+        self.assertEqual(cache.cached_value(data_file, self.config), 2)
+        cache.close()
+
+        # Test reading again
+        cache = parser.sqlite_cache_t(self.cache_file)
+        self.assertEqual(cache.cached_value(data_file, self.config), 2)
+
+        # Modifying an included file invalidates the record
+        with open(self.source_file, "w") as f:
+            f.write("// version 2")
+        self.assertIsNone(cache.cached_value(data_file, self.config))
+        cache.close()
+
+    def test_multiple_processes(self):
+        """
+        Several processes can update the same cache concurrently.
+
+        """
+
+        sources = []
+        for i in range(4):
+            source = os.path.join(
+                autoconfig.build_directory, 'sqlite_cache_test%d.hpp' % i)
+            with open(source, "w") as f:
+                f.write("// file %d" % i)
+            sources.append(source)
+
+        processes = [
+            multiprocessing.Process(
+                target=_update_cache,
+                args=(self.cache_file, self.config, source, i))
+            for i, source in enumerate(sources)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        cache = parser.sqlite_cache_t(self.cache_file)
+        for i, source in enumerate(sources):
+            self.assertEqual(cache.cached_value(source, self.config), i)
+            os.remove(source)
+        cache.close()
+
+    def test_parse(self):
+        cache = parser.sqlite_cache_t(self.cache_file)
+        decls = parser.parse([self.header], self.config, cache=cache)
+        cached_decls = parser.parse([self.header], self.config, cache=cache)
+        self.assertTrue(
+            decls == cached_decls,
+            "There is a difference between declarations")
+        cache.close()
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,60 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+import parser_test_case
+
+from pygccxml import parser
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = "typedefs1.hpp"
+
+    def test_stream_xml(self):
+        """
+        Reading CastXML output from a pipe gives the same declarations
+        as reading it from a file.
+
+        """
+
+        if self.config.xml_generator != "castxml":
+            return
+
+        decls = parser.parse([self.header], self.config)
+
+        config = self.config.clone()
+        config.stream_xml = True
+        streamed_decls = parser.parse([self.header], config)
+
+        self.assertTrue(
+            decls == streamed_decls,
+            "There is a difference between declarations")
+
+    def test_stream_xml_on_input_with_errors(self):
+        config = self.config.clone()
+        config.stream_xml = True
+        self.assertRaises(
+            RuntimeError,
+            parser.parse_string,
+            "abra cadabra " + os.linesep,
+            config)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,107 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.files = ['typedefs1.hpp', 'typedefs2.hpp']
+        self.cache_file = os.path.join(
+            autoconfig.build_directory, 'strings_interning.cache')
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def __check_shared_strings(self, decls):
+        strings = {}
+        for decl in declarations.make_flatten(decls):
+            values = [decl.name]
+            if decl.location is not None:
+                values.append(decl.location.file_name)
+            for value in values:
+                first = strings.setdefault(value, value)
+                self.assertTrue(
+                    first is value, "'%s' is not interned" % value)
+
+    def test_strings_interning(self):
+        """
+        The equal strings of the files read with the same table are the same
+        object.
+
+        """
+
+        reader = parser.source_reader_t(self.config, strings={})
+        decls = []
+        for header in self.files:
+            decls.extend(reader.read_file(header))
+        self.__check_shared_strings(decls)
+
+    def test_strings_interning_from_cache(self):
+        """
+        The strings of the cached declarations are interned.
+
+        """
+
+        cache = parser.file_cache_t(self.cache_file)
+        parser.source_reader_t(self.config, cache).read_file(self.files[0])
+        cache.flush()
+
+        # The first file is loaded from the cache, the second one is parsed
+        cache = parser.file_cache_t(self.cache_file)
+        reader = parser.source_reader_t(self.config, cache, strings={})
+        decls = []
+        for header in self.files:
+            decls.extend(reader.read_file(header))
+        self.assertIsNotNone(reader.read_cached_file(self.files[0]))
+        self.__check_shared_strings(decls)
+
+    def test_strings_table(self):
+        """
+        The scanner fills the strings table given to the reader.
+
+        """
+
+        strings = {}
+        reader = parser.source_reader_t(self.config, strings=strings)
+        reader.read_file(self.files[0])
+        self.assertIn("typedefs_base.hpp", [
+            os.path.basename(value) for value in strings])
+
+        decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+        self.__check_shared_strings(decls)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
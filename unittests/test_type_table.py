@@ -0,0 +1,99 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import unittest
+
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml import declarations
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.files = [
+            'separate_compilation/data.h',
+            'separate_compilation/base.h',
+            'separate_compilation/derived.h']
+
+    def __check_shared_types(self, decls):
+        types = {}
+        for decl in declarations.make_flatten(decls):
+            if isinstance(decl, (
+                    declarations.typedef_t, declarations.variable_t)):
+                decl_types = [decl.decl_type]
+            elif isinstance(decl, declarations.calldef_t):
+                decl_types = [decl.return_type] + [
+                    argument.decl_type for argument in decl.arguments]
+            else:
+                continue
+            for type_ in decl_types:
+                if not isinstance(type_, declarations.compound_t):
+                    continue
+                first = types.setdefault(type_.decl_string, type_)
+                self.assertTrue(
+                    first is type_, "'%s' is not shared" % type_.decl_string)
+        self.assertTrue(types)
+
+    def test_intern(self):
+        table = parser.type_table_t()
+        int_ = declarations.int_t()
+        type1 = declarations.pointer_t(declarations.const_t(int_))
+        type2 = declarations.pointer_t(declarations.const_t(int_))
+        type3 = declarations.reference_t(declarations.const_t(int_))
+        self.assertTrue(table.intern(type1) is type1)
+        self.assertTrue(table.intern(type2) is type1)
+        self.assertTrue(table.intern(type3).base is type1.base)
+        self.assertEqual(len(table), 3)
+
+        class_ = declarations.class_t("A")
+        declarated1 = declarations.declarated_t(class_)
+        declarated2 = declarations.declarated_t(class_)
+        self.assertTrue(table.intern(declarated2) is table.intern(declarated1))
+        other = declarations.declarated_t(declarations.class_t("A"))
+        self.assertTrue(table.intern(other) is other)
+
+    def test_shared_types(self):
+        """
+        The types of the files of a project are shared.
+
+        """
+
+        decls = parser.parse(
+            self.files,
+            self.config,
+            compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+        self.__check_shared_types(decls)
+
+        # The return types of the methods declared in different files
+        global_ns = declarations.get_global_namespace(decls)
+        base = global_ns.class_("base_t").member_function("get_data")
+        derived = global_ns.class_("derived_t").member_function("get_data")
+        self.assertTrue(base.return_type is derived.return_type)
+
+    def test_remove_alias(self):
+        decls = parser.parse(self.files[:1], self.config)
+        global_ns = declarations.get_global_namespace(decls)
+        for typedef in global_ns.typedefs(allow_empty=True):
+            type_ = typedef.decl_type
+            decl_string = type_.decl_string
+            declarations.remove_alias(type_)
+            self.assertEqual(type_.decl_string, decl_string)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,137 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import shutil
+import threading
+import unittest
+
+import autoconfig
+import parser_test_case
+
+from pygccxml import declarations
+from pygccxml import parser
+
+common_header = """
+#ifndef watcher_common_hpp
+#define watcher_common_hpp
+namespace watcher{
+struct base_t{ int x; };
+void common();
+}
+#endif
+"""
+
+header = """
+#include "common.hpp"
+namespace watcher{
+struct %s_t : public base_t{};
+void %s_function();
+}
+"""
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.directory = os.path.join(autoconfig.build_directory, 'watcher')
+        self.files = [
+            os.path.join(self.directory, name) for name in ("a.hpp", "b.hpp")]
+
+    def setUp(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.__write("common.hpp", common_header)
+        for name in ("a", "b"):
+            self.__write(name + ".hpp", header % (name, name))
+        self.project = parser.project_t(self.files, self.config)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __write(self, name, content):
+        file_name = os.path.join(self.directory, name)
+        # Editors save the files by replacing them
+        with open(file_name + ".tmp", "w") as new_file:
+            new_file.write(content)
+        os.rename(file_name + ".tmp", file_name)
+
+    def __namespace(self):
+        return declarations.get_global_namespace(
+            self.project.declarations).namespace("watcher")
+
+    def __test_update(self, use_inotify):
+        watcher = parser.watcher_t(
+            self.project, debounce=0.1, interval=0.05,
+            use_inotify=use_inotify)
+        try:
+            self.assertEqual(watcher.uses_inotify, use_inotify)
+            self.assertIsNone(watcher.run_once(0.2))
+
+            self.__write("a.hpp", header.replace(
+                "void %s_function();", "int %s_variable;") % ("a", "a"))
+            update = watcher.run_once(10)
+            self.assertEqual(update.files, [self.files[0]])
+            self.assertEqual(
+                [decl.name for decl in update.added], ["a_variable"])
+            self.assertEqual(
+                [decl.name for decl in update.removed], ["a_function"])
+            self.assertEqual(update.changed, [])
+            self.__namespace().variable("a_variable")
+
+            self.__write(
+                "common.hpp", common_header.replace("int x;", "int y;"))
+            update = watcher.run_once(10)
+            self.assertEqual(update.files, self.files)
+            self.assertEqual(
+                [(old.name, new.name) for old, new in update.changed],
+                [("base_t", "base_t")])
+            self.__namespace().class_("base_t").variable("y")
+        finally:
+            watcher.close()
+
+    def test_polling(self):
+        self.__test_update(False)
+
+    @unittest.skipUnless(
+        os.path.exists("/proc/sys/fs/inotify"), "inotify is not available")
+    def test_inotify(self):
+        self.__test_update(True)
+
+    def test_thread(self):
+        updates = []
+        updated = threading.Event()
+
+        def callback(update):
+            updates.append(update)
+            updated.set()
+
+        watcher = parser.watcher_t(
+            self.project, callback, debounce=0.1, interval=0.05)
+        watcher.start()
+        try:
+            self.__write("b.hpp", header % ("b", "b2"))
+            self.assertTrue(updated.wait(10))
+            with watcher.lock:
+                self.__namespace().free_function("b2_function")
+        finally:
+            watcher.close()
+        self.assertEqual(len(updates), 1)
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
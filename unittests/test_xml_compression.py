@@ -0,0 +1,106 @@
+# Copyright 2014-2017 Insight Software Consortium.
+# Copyright 2004-2009 Roman Yakovenko.
+# Distributed under the Boost Software License, Version 1.0.
+# See http://www.boost.org/LICENSE_1_0.txt
+
+import os
+import unittest
+import autoconfig
+import parser_test_case
+
+from pygccxml import parser
+from pygccxml.parser import xml_compression
+
+
+class Test(parser_test_case.parser_test_case_t):
+
+    def __init__(self, *args):
+        parser_test_case.parser_test_case_t.__init__(self, *args)
+        self.header = "core_class_hierarchy.hpp"
+        self.xml_file = os.path.join(
+            autoconfig.data_directory, "core_class_hierarchy.hpp.xml")
+        self.compressions = ["gz", "bz2"]
+        if xml_compression.lzma is not None:
+            self.compressions.append("xz")
+        self.files = []
+
+    def setUp(self):
+        if not os.path.isdir(autoconfig.build_directory):
+            os.makedirs(autoconfig.build_directory)
+
+    def tearDown(self):
+        for file_name in self.files:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def __compressed_file(self, compression):
+        file_name = os.path.join(
+            autoconfig.build_directory,
+            "core_class_hierarchy.hpp.xml." + compression)
+        self.files.append(file_name)
+        return file_name
+
+    def test_read_compressed_xml_file(self):
+        """
+        The compressed xml files are read like the xml files.
+
+        """
+
+        decls = parser.parse_xml_file(self.xml_file, self.config)
+        for compression in self.compressions:
+            compressed_file = self.__compressed_file(compression)
+            with open(self.xml_file, "rb") as xml_file:
+                xml_compression.write_file(compressed_file, xml_file)
+
+            for scanner in ("etree", "expat"):
+                config = self.config.clone()
+                config.xml_scanner = scanner
+                self.assertTrue(
+                    decls == parser.parse_xml_file(compressed_file, config),
+                    "There is a difference between declarations")
+
+            fconfig = parser.create_gccxml_fc(compressed_file)
+            prj_decls = parser.project_reader_t(self.config).read_files(
+                [fconfig],
+                compilation_mode=parser.COMPILATION_MODE.FILE_BY_FILE)
+            self.assertTrue(
+                decls == prj_decls,
+                "There is a difference between declarations")
+
+    def test_create_compressed_xml_file(self):
+        """
+        The xml generator output is compressed when the name of the xml file
+        has a compressed extension.
+
+        """
+
+        reader = parser.source_reader_t(self.config)
+        decls = reader.read_file(self.header)
+        compressed_file = self.__compressed_file("gz")
+        reader.create_xml_file(self.header, compressed_file)
+        with open(compressed_file, "rb") as xml_file:
+            self.assertEqual(xml_file.read(2), b"\x1f\x8b")
+        self.assertTrue(
+            decls == reader.read_xml_file(compressed_file),
+            "There is a difference between declarations")
+
+    def test_xml_file_suffix(self):
+        config = self.config.clone()
+        config.xml_compression = "bz2"
+        self.assertEqual(xml_compression.xml_file_suffix(config), ".xml")
+        config.keep_xml = True
+        self.assertEqual(xml_compression.xml_file_suffix(config), ".xml.bz2")
+
+
+def create_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(Test))
+    return suite
+
+
+def run_suite():
+    unittest.TextTestRunner(verbosity=2).run(create_suite())
+
+
+if __name__ == "__main__":
+    run_suite()